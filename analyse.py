@@ -1,91 +1,503 @@
 import pandas as pd
 import numpy as np
-import re
+import hashlib
+import os
+import argparse
+import tracemalloc
+from store import STORE_DIR, list_partitions, read_partition, write_csv_atomic
+from tables import table_path, write_table, TableAppender
+from fields import split_temps, wind_levels
+from weather_types import encode_weather, count_weather_days
+import profiling
+from profiling import step
 
-# 读取数据
-df = pd.read_csv('dalian_weather_2022_2024.csv', encoding='utf-8')
-df_2025 = pd.read_csv('dalian_weather_2025_1_6.csv', encoding='utf-8')
+# 默认数据源中与分区存储一起读取的原始CSV文件；同一 (城市, 月份) 两边都有时以分区为准
+HISTORY_FILES = ['dalian_weather_2022_2024.csv']
+RECENT_FILES = ['dalian_weather_2025_1_6.csv']
 
-# 去除空行
-df = df.dropna(subset=['日期', '气温', '风力风向', '天气状况'])
+# 增量统计时保存可合并中间状态的目录
+STATE_DIR = 'agg_state'
+TEMP_COLUMNS = ['平均气温', '最高气温', '最低气温']
+RAW_COLUMNS = ['日期', '天气状况', '气温', '风力风向']
+# analyse.py 输出的统计表（tables.TABLES 中的其余表由预测脚本输出）
+OUTPUT_TABLES = ['daily', 'monthly', 'wind', 'weather']
 
-# 提取日期
-df['日期'] = df['日期'].str.replace('年', '-').str.replace('月', '-').str.replace('日', '')
-df['日期'] = pd.to_datetime(df['日期'], format='%Y-%m-%d')
+# 分块统计时，每行原始数据在处理过程中实际占用的内存约为原始数据和清洗后数据之和的这么多倍
+CHUNK_MEMORY_FACTOR = 4
+MIN_CHUNK_ROWS = 1000
 
-df_2025['日期'] = df_2025['日期'].str.replace('年', '-').str.replace('月', '-').str.replace('日', '')
-df_2025['日期'] = pd.to_datetime(df_2025['日期'], format='%Y-%m-%d')
 
-def extract_temps(temp_str):
+class NoRawData(FileNotFoundError):
+    """所选的城市和月份范围内没有原始数据"""
+
+
+def city_from_filename(path):
+    """旧的CSV文件没有城市列，从 dalian_weather_xxx.csv 这样的文件名中取城市"""
+    return os.path.basename(path).split('_')[0]
+
+
+def store_months(sources):
+    """数据源中分区目录已有的 (城市, YYYYMM)；CSV文件中这些月份的行以分区为准，不重复统计"""
+    return {(city, ym) for source in sources if os.path.isdir(source) for city, ym, _ in list_partitions(source)}
+
+
+def drop_covered(df, covered):
+    """去掉分区存储中已有的 (城市, 月份) 的行"""
+    if not covered or df.empty:
+        return df
+    keys = pd.MultiIndex.from_arrays([df['城市'].astype(str), df['月份'].astype(str)])
+    return df[~keys.isin(list(covered))]
+
+
+def read_csv_source(path, covered=(), **kwargs):
+    """读取一个CSV数据源（kwargs 中有 chunksize 时逐批返回），补上城市列并去掉分区中已有的月份"""
+    def fix(df):
+        if '城市' not in df.columns:
+            df['城市'] = city_from_filename(path)
+        return drop_covered(df, covered)
+    result = pd.read_csv(path, encoding='utf-8', dtype={'月份': str}, **kwargs)
+    return (fix(df) for df in result) if 'chunksize' in kwargs else fix(result)
+
+
+def load_raw(sources, cities=None, start=None, end=None):
+    """一次读取任意多个原始数据源
+
+    sources 中的每一项可以是 data_pull.py 写入的分区存储目录，也可以是单个CSV文件；
+    cities、start、end（YYYYMM，含）用于筛选城市和月份。分区目录和CSV文件中有同一
+    (城市, 月份) 时只使用分区中的数据。
+    """
+    covered = store_months(sources)
+    frames = []
+    for source in sources:
+        if os.path.isdir(source):
+            frames.extend(read_partition(path) for _, _, path in list_partitions(source, cities, start, end))
+            continue
+        frames.append(read_csv_source(source, covered))
+    if not frames:
+        raise NoRawData(f"没有找到原始数据: {', '.join(map(str, sources))}")
+    return filter_raw(pd.concat(frames, ignore_index=True), cities, start, end)
+
+
+def filter_raw(raw, cities=None, start=None, end=None):
+    if cities is not None:
+        raw = raw[raw['城市'].isin(cities)]
+    if start:
+        raw = raw[raw['月份'] >= start]
+    if end:
+        raw = raw[raw['月份'] <= end]
+    return raw
+
+
+def iter_raw_chunks(sources, chunk_rows, cities=None, start=None, end=None):
+    """按批读取原始数据，每批不超过约 chunk_rows 行
+
+    CSV文件用 read_csv 的 chunksize 分块读取；分区目录按顺序把若干个月份分区攒成一批。
+    与 load_raw 相同，CSV文件中分区已有的 (城市, 月份) 不再读取。
+    """
+    covered = store_months(sources)
+    for source in sources:
+        if os.path.isdir(source):
+            batch, batch_rows = [], 0
+            for _, _, path in list_partitions(source, cities, start, end):
+                df = read_partition(path)
+                if batch and batch_rows + len(df) > chunk_rows:
+                    yield filter_raw(pd.concat(batch, ignore_index=True), cities, start, end)
+                    batch, batch_rows = [], 0
+                batch.append(df)
+                batch_rows += len(df)
+            if batch:
+                yield filter_raw(pd.concat(batch, ignore_index=True), cities, start, end)
+            continue
+        for df in read_csv_source(source, covered, chunksize=chunk_rows):
+            yield filter_raw(df, cities, start, end)
+
+
+def prepare(raw):
+    """清洗原始数据：去除空行，解析日期、气温和风力等级"""
+    # 去除空行
+    df = raw.dropna(subset=['日期', '气温', '风力风向', '天气状况']).copy()
+
+    # 提取日期
+    df['日期'] = df['日期'].str.replace('年', '-').str.replace('月', '-').str.replace('日', '')
+    df['日期'] = pd.to_datetime(df['日期'], format='%Y-%m-%d')
+    df['月份'] = df['日期'].dt.to_period('M')
+
+    df[['最高气温', '最低气温']] = split_temps(df['气温'])
+    df['平均气温'] = df[['最高气温', '最低气温']].mean(axis=1)
+    df['风力等级'] = wind_levels(df['风力风向'])
+    return df
+
+
+def temp_sums(df):
+    """每月各气温列的和、有效天数以及最高、最低值，可以在不同批次之间直接相加合并"""
+    grouped = df.groupby(['城市', '月份'])
+    temps = grouped[TEMP_COLUMNS].agg(['sum', 'count'])
+    temps.columns = [f'{col}_{"和" if stat == "sum" else "天数"}' for col, stat in temps.columns]
+    temps['最高气温_最大'] = grouped['最高气温'].max()
+    temps['最低气温_最小'] = grouped['最低气温'].min()
+    temps['天数'] = grouped.size()
+    temps = temps.reset_index()
+    temps['月份'] = temps['月份'].astype(str)
+    return temps
+
+
+def wind_days(df):
+    """每月各风力等级出现的天数"""
+    wind_count = df.groupby(['城市', '月份', '风力等级']).size().reset_index(name='天数')
+    wind_count['月份'] = wind_count['月份'].astype(str)
+    return wind_count
+
+
+def weather_days(df):
+    """每月各天气状况（白天/夜晚）出现的天数"""
+    # 天气类型编码为整数后按 (城市, 月份) 计数（如晴/多云算晴和多云各一天，相同只算一次）
+    codes, vocab = encode_weather(df['天气状况'])
+    grouped = df.groupby(['城市', '月份'])
+    counts = count_weather_days(grouped.ngroup().to_numpy(), codes, grouped.ngroups, len(vocab))
+
+    group_idx, type_idx = np.nonzero(counts)
+    keys = grouped.size().index.to_frame(index=False)
+    weather_count = pd.DataFrame({
+        '城市': keys['城市'].to_numpy()[group_idx],
+        '月份': keys['月份'].astype(str).to_numpy()[group_idx],
+        '天气类型': np.array(vocab, dtype=object)[type_idx],
+        '天数': counts[group_idx, type_idx],
+    })
+    return weather_count.sort_values(['城市', '月份', '天气类型'], ignore_index=True)
+
+
+def partial_aggregates(df):
+    """计算一批已清洗数据的部分统计量，不同批次的部分统计量可以用 merge_partials 合并"""
+    return {
+        'temps': temp_sums(df),
+        'wind': wind_days(df),
+        'weather': weather_days(df),
+    }
+
+
+def merge_partials(parts):
+    """合并多批部分统计量：和与天数相加，最高、最低值取极值"""
+    parts = list(parts)
+    temps = pd.concat([part['temps'] for part in parts], ignore_index=True)
+    agg = {col: 'sum' for col in temps.columns if col not in ('城市', '月份')}
+    agg['最高气温_最大'] = 'max'
+    agg['最低气温_最小'] = 'min'
+    wind = pd.concat([part['wind'] for part in parts], ignore_index=True)
+    weather = pd.concat([part['weather'] for part in parts], ignore_index=True)
+    return {
+        'temps': temps.groupby(['城市', '月份']).agg(agg).reset_index(),
+        'wind': wind.groupby(['城市', '月份', '风力等级'])['天数'].sum().reset_index(),
+        'weather': weather.groupby(['城市', '月份', '天气类型'])['天数'].sum().reset_index(),
+    }
+
+
+def filter_partials(partials, cities=None, start=None, end=None):
+    """按城市和月份（YYYYMM，含）筛选部分统计量"""
+    filtered = {}
+    for name, table in partials.items():
+        mask = pd.Series(True, index=table.index)
+        if cities is not None:
+            mask &= table['城市'].isin(cities)
+        if start:
+            mask &= table['月份'] >= f'{start[:4]}-{start[4:]}'
+        if end:
+            mask &= table['月份'] <= f'{end[:4]}-{end[4:]}'
+        filtered[name] = table[mask].reset_index(drop=True)
+    return filtered
+
+
+def finalize(partials):
+    """由部分统计量得到最终的每月气温、风力等级天数和天气状况天数表"""
+    temps = partials['temps']
+    monthly_avg = temps[['城市', '月份']].copy()
+    monthly_avg['平均气温'] = (temps['平均气温_和'] / temps['平均气温_天数']).round(2)
+    monthly_avg['平均最高气温'] = (temps['最高气温_和'] / temps['最高气温_天数']).round(2)
+    monthly_avg['平均最低气温'] = (temps['最低气温_和'] / temps['最低气温_天数']).round(2)
+    return {
+        'monthly': monthly_avg,
+        'wind': partials['wind'],
+        'weather': partials['weather'],
+    }
+
+
+def analyse(sources, cities=None, start=None, end=None):
+    """读取所有数据源并计算全部统计结果，返回内存中的表
+
+    返回字典：daily 为每天平均气温，monthly 为每月气温，wind 为每月风力等级天数，
+    weather 为每月天气状况天数。
+    """
+    with step('读取原始数据') as s:
+        raw = load_raw(sources, cities, start, end)
+        s['rows'] = len(raw)
+    if raw.empty:
+        raise NoRawData(f"所选范围内没有原始数据: {', '.join(map(str, sources))}")
+    with step('解析字段', rows=len(raw)):
+        df = prepare(raw)
+    with step('统计', rows=len(df)):
+        return {
+            'daily': df[['城市', '日期', '平均气温']].reset_index(drop=True),
+            **finalize(partial_aggregates(df)),
+        }
+
+
+# ================== 分块统计 ==================
+# 数据量超过内存时按批读取，每批只保留可合并的部分统计量，内存占用由批大小决定而与总数据量无关
+
+def estimate_chunk_rows(sources, max_memory_mb):
+    """用一小批样本估算每行占用的内存，换算出在 max_memory_mb 以内的批大小"""
+    sample = next(iter_raw_chunks(sources, MIN_CHUNK_ROWS), None)
+    if sample is None or sample.empty:
+        return MIN_CHUNK_ROWS
+    bytes_per_row = (sample.memory_usage(deep=True).sum()
+                     + prepare(sample).memory_usage(deep=True).sum()) / len(sample)
+    return max(MIN_CHUNK_ROWS, int(max_memory_mb * 1024 * 1024 / (bytes_per_row * CHUNK_MEMORY_FACTOR)))
+
+
+def analyse_chunked(sources, cities=None, start=None, end=None, chunk_rows=None,
+                    max_memory_mb=None, daily_paths=()):
+    """分块读取并统计，结果与 analyse 相同
+
+    chunk_rows 指定每批行数；只给出 max_memory_mb 时按样本估算批大小。每天的平均气温
+    不保留在内存中，逐批追加写入 daily_paths 中的各个文件。返回的字典中不含 daily，
+    另外带有 peak_memory_mb（统计过程中Python分配内存的峰值）和 chunk_rows。
+    """
+    if chunk_rows is None:
+        chunk_rows = estimate_chunk_rows(sources, max_memory_mb) if max_memory_mb else 100000
+
+    tracemalloc.start()
     try:
-        day, night = temp_str.replace('℃', '').split('/')
-        return float(day), float(night)
-    except:
-        return np.nan, np.nan
-
-df[['最高气温', '最低气温']] = df['气温'].apply(lambda x: pd.Series(extract_temps(x)))
-df['平均气温'] = df[['最高气温', '最低气温']].mean(axis=1)
-
-df_2025[['最高气温', '最低气温']] = df_2025['气温'].apply(lambda x: pd.Series(extract_temps(x)))
-df_2025['平均气温'] = df_2025[['最高气温', '最低气温']].mean(axis=1)
-
-# 计算每月平均气温、平均最高气温、平均最低气温
-df['月份'] = df['日期'].dt.to_period('M')
-monthly_avg = df.groupby('月份').agg({
-    '平均气温': 'mean',
-    '最高气温': 'mean',
-    '最低气温': 'mean'
-}).reset_index()
-monthly_avg['平均气温'] = monthly_avg['平均气温'].round(2)
-monthly_avg['平均最高气温'] = monthly_avg['最高气温'].round(2)
-monthly_avg['平均最低气温'] = monthly_avg['最低气温'].round(2)
-monthly_avg['月份'] = monthly_avg['月份'].astype(str)
-monthly_avg = monthly_avg[['月份', '平均气温', '平均最高气温', '平均最低气温']]
-
-df_2025['月份'] = df_2025['日期'].dt.to_period('M')
-monthly_avg_2025 = df_2025.groupby('月份').agg({
-    '平均气温': 'mean',
-    '最高气温': 'mean',
-    '最低气温': 'mean'
-}).reset_index()
-monthly_avg_2025['平均气温'] = monthly_avg_2025['平均气温'].round(2)
-monthly_avg_2025['平均最高气温'] = monthly_avg_2025['最高气温'].round(2)
-monthly_avg_2025['平均最低气温'] = monthly_avg_2025['最低气温'].round(2)
-monthly_avg_2025['月份'] = monthly_avg_2025['月份'].astype(str)
-monthly_avg_2025 = monthly_avg_2025[['月份', '平均气温', '平均最高气温', '平均最低气温']]
-
-# ================== 风力等级统计 ==================
-def extract_wind_level(wind_str):
-    match = re.search(r'(\d+-\d+级|\d+级)', wind_str)
-    return match.group(1) if match else None
-
-df['风力等级'] = df['风力风向'].apply(extract_wind_level)
-wind_count = df.groupby(['月份', '风力等级']).size().reset_index(name='天数')
-
-# ================== 天气状况统计（白天/夜晚） ==================
-def extract_weather_types(weather_str):
-    if pd.isna(weather_str):
-        return []
-    types = str(weather_str).split('/')
-    if len(types) == 2 and types[0] == types[1]:
-        return [types[0]]
-    return list(set(types))
-
-df['天气类型列表'] = df['天气状况'].apply(extract_weather_types)
-
-# 展开每一天的所有天气类型（如晴/多云算晴和多云各一天，相同只算一次）
-weather_expanded = df[['月份', '天气类型列表']].explode('天气类型列表')
-weather_expanded = weather_expanded.dropna(subset=['天气类型列表'])
-
-# 按月份和天气类型统计天数
-weather_count = weather_expanded.groupby(['月份', '天气类型列表']).size().reset_index(name='天数')
-weather_count = weather_count.rename(columns={'天气类型列表': '天气类型'})
-
-# 保存结果
-df[['日期', '平均气温']].to_csv('daily_avg_temp.csv', index=False, encoding='utf-8-sig')
-monthly_avg.to_csv('monthly_avg_temp.csv', index=False, encoding='utf-8-sig')
-monthly_avg_2025.to_csv('2025_monthly_avg_temp.csv', index=False, encoding='utf-8-sig')
-wind_count.to_csv('monthly_wind_level_days.csv', index=False, encoding='utf-8-sig')
-weather_count.to_csv('monthly_weather_days.csv', index=False, encoding='utf-8-sig')
-
-print("每天和每月平均气温、平均最高气温、平均最低气温、每月风力等级及每月天气状况（白天/夜晚）出现天数已计算并保存。")
\ No newline at end of file
+        merged = None
+        chunks = 0
+        daily_sinks = [TableAppender(path) for path in daily_paths]
+        with step('分块统计') as s:
+            s['rows'] = 0
+            for raw in iter_raw_chunks(sources, chunk_rows, cities, start, end):
+                if raw.empty:
+                    continue
+                s['rows'] += len(raw)
+                df = prepare(raw)
+                del raw
+                part = partial_aggregates(df)
+                merged = part if merged is None else merge_partials([merged, part])
+                for sink in daily_sinks:
+                    sink.write(df[['城市', '日期', '平均气温']])
+                chunks += 1
+                del df, part
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    if merged is None:
+        raise NoRawData(f"所选范围内没有原始数据: {', '.join(map(str, sources))}")
+    for sink in daily_sinks:
+        sink.close()
+
+    result = finalize(merged)
+    result['peak_memory_mb'] = peak / 1024 / 1024
+    result['chunk_rows'] = chunk_rows
+    print(f"分块统计: {chunks} 批，每批最多 {chunk_rows} 行，峰值内存 {result['peak_memory_mb']:.1f} MB"
+          + (f"（上限 {max_memory_mb} MB）" if max_memory_mb else ""))
+    return result
+
+
+# ================== 增量统计 ==================
+# 状态目录中保存每个源文件、每个 (城市, 月份) 的部分统计量和原始行的哈希。
+# 每次只读取大小或修改时间变化了的文件，并且只重新计算其中行哈希变化了的月份。
+
+def source_files(sources):
+    """把数据源展开为具体文件：分区目录展开为每个月份的分区文件"""
+    files = []
+    for source in sources:
+        if os.path.isdir(source):
+            files.extend(path for _, _, path in list_partitions(source))
+        else:
+            files.append(source)
+    return files
+
+
+def file_signature(path, covered=()):
+    """文件的 大小:修改时间；CSV数据源再加上分区已有月份的摘要，分区新增月份时重新读取"""
+    stat = os.stat(path)
+    signature = f'{stat.st_size}:{stat.st_mtime_ns}'
+    if covered:
+        signature += ':' + hashlib.sha1(repr(sorted(covered)).encode('utf-8')).hexdigest()[:12]
+    return signature
+
+
+def cell_hashes(df):
+    """每个 (城市, 月份) 原始行的哈希，行顺序不影响结果"""
+    hashes = pd.DataFrame({
+        '城市': df['城市'].values,
+        '月份': df['月份'].astype(str).values,
+        '哈希': pd.util.hash_pandas_object(df[RAW_COLUMNS], index=False).values,
+    })
+    hashes = hashes.groupby(['城市', '月份'])['哈希'].sum().reset_index()
+    hashes['哈希'] = hashes['哈希'].map('{:016x}'.format)
+    return hashes
+
+
+def load_state(state_dir=STATE_DIR):
+    """读取增量统计状态，没有状态时返回空表"""
+    state = {}
+    columns = {
+        'files': ['文件', '签名'],
+        'cells': ['文件', '城市', '月份', '哈希'],
+        'temps': ['文件', '城市', '月份'],
+        'wind': ['文件', '城市', '月份', '风力等级', '天数'],
+        'weather': ['文件', '城市', '月份', '天气类型', '天数'],
+    }
+    for name, cols in columns.items():
+        path = os.path.join(state_dir, f'{name}.csv')
+        if os.path.exists(path):
+            state[name] = pd.read_csv(path, encoding='utf-8', dtype={'月份': str, '哈希': str, '签名': str})
+        else:
+            state[name] = pd.DataFrame(columns=cols)
+    return state
+
+
+def save_state(state, state_dir=STATE_DIR):
+    for name, table in state.items():
+        write_csv_atomic(table, os.path.join(state_dir, f'{name}.csv'))
+
+
+def update_state(sources, state_dir=STATE_DIR):
+    """用新增或变化的原始数据更新增量统计状态
+
+    返回 (合并后的部分统计量, 本次重新计算的 [(城市, 月份)])。
+    """
+    state = load_state(state_dir)
+    files = source_files(sources)
+    # 分区文件本身不做筛选，其他CSV文件去掉分区中已有的月份
+    covered = store_months(sources)
+    partition_files = {path for source in sources if os.path.isdir(source) for _, _, path in list_partitions(source)}
+    covered_for = {path: () if path in partition_files else covered for path in files}
+    signatures = {path: file_signature(path, covered_for[path]) for path in files}
+    known = dict(zip(state['files']['文件'], state['files']['签名']))
+    changed = [path for path in files if known.get(path) != signatures[path]]
+    removed = set(known) - set(signatures)
+
+    touched = set()
+    drop_keys = []    # 需要从状态中删除的 (文件, 城市, 月份)
+    new_parts = []
+    new_cells = []
+    for path in changed:
+        df = prepare(read_csv_source(path, covered_for[path]))
+        hashes = cell_hashes(df)
+        old = state['cells'][state['cells']['文件'] == path]
+        old_hashes = dict(zip(zip(old['城市'], old['月份']), old['哈希']))
+        new_hashes = dict(zip(zip(hashes['城市'], hashes['月份']), hashes['哈希']))
+
+        dirty = {key for key, h in new_hashes.items() if old_hashes.get(key) != h}
+        gone = set(old_hashes) - set(new_hashes)
+        touched |= dirty | gone
+        drop_keys.extend((path, city, month) for city, month in dirty | gone)
+        if dirty:
+            month_str = df['月份'].astype(str)
+            in_dirty = pd.Series(list(zip(df['城市'], month_str)), index=df.index).isin(dirty)
+            part = partial_aggregates(df[in_dirty])
+            for table in part.values():
+                table.insert(0, '文件', path)
+            new_parts.append(part)
+            new_cells.append(hashes[[key in dirty for key in zip(hashes['城市'], hashes['月份'])]].assign(文件=path))
+
+    for path in removed:
+        cells = state['cells'][state['cells']['文件'] == path]
+        touched |= set(zip(cells['城市'], cells['月份']))
+        drop_keys.extend((path, city, month) for city, month in zip(cells['城市'], cells['月份']))
+
+    drop_keys = set(drop_keys)
+    for name in ('cells', 'temps', 'wind', 'weather'):
+        table = state[name]
+        keep = [key not in drop_keys for key in zip(table['文件'], table['城市'], table['月份'])]
+        added = new_cells if name == 'cells' else [part[name] for part in new_parts]
+        frames = [frame for frame in [table[keep], *added] if len(frame)]
+        state[name] = pd.concat(frames, ignore_index=True) if frames else table.iloc[:0]
+
+    state['files'] = pd.DataFrame({'文件': list(signatures), '签名': list(signatures.values())})
+    save_state(state, state_dir)
+
+    partials = {name: state[name].drop(columns='文件') for name in ('temps', 'wind', 'weather')}
+    if partials['temps'].empty:
+        return partials, sorted(touched)
+    return merge_partials([partials]), sorted(touched)
+
+
+def write_outputs(result, output_dir='.', prefix='', tables=None, formats=('parquet',)):
+    """保存统计结果，tables 指定只保存其中几张表，formats 可同时包含 parquet 和 csv"""
+    for name in tables or OUTPUT_TABLES:
+        for fmt in formats:
+            with step(f'保存{prefix}{name}表', rows=len(result[name])):
+                write_table(result[name], table_path(name, prefix, output_dir, fmt))
+
+
+def main(sources=None, cities=None, incremental=False, state_dir=STATE_DIR,
+         chunk_rows=None, max_memory_mb=None, formats=('parquet',)):
+    # 每项为 (文件名前缀, 起始月份, 结束月份, 保存的表)
+    described = sources
+    if sources is None:
+        # data_pull.py 写入的分区和原来的CSV文件一起读取，同一月份以分区为准
+        described = [STORE_DIR, *HISTORY_FILES, *RECENT_FILES]
+        sources = [path for path in described if os.path.exists(path)]
+        cities = cities or ['dalian']
+        outputs = [('', '202201', '202412', None), ('2025_', '202501', '202506', ['monthly'])]
+    else:
+        outputs = [('', None, None, None)]
+
+    if incremental:
+        # 增量模式只重新计算变化的月份，不输出每天的平均气温
+        with step('增量更新状态') as s:
+            partials, touched = update_state(sources, state_dir)
+            s['rows'] = len(touched)
+        print(f"增量统计: 重新计算了 {len(touched)} 个 (城市, 月份)")
+
+    # 某个输出的月份范围内没有原始数据时，三种模式都跳过这个输出；全部输出都没有数据时报错
+    written = 0
+    for prefix, start, end, tables in outputs:
+        try:
+            if incremental:
+                with step('统计'):
+                    filtered = filter_partials(partials, cities, start, end)
+                    if filtered['temps'].empty:
+                        raise NoRawData(f"所选范围内没有原始数据: {', '.join(map(str, sources))}")
+                    result = finalize(filtered)
+                write_outputs(result, prefix=prefix, tables=tables or list(result), formats=formats)
+            elif chunk_rows or max_memory_mb:
+                tables = tables or OUTPUT_TABLES
+                daily_paths = [table_path('daily', prefix, fmt=fmt) for fmt in formats] if 'daily' in tables else []
+                result = analyse_chunked(sources, cities, start, end, chunk_rows, max_memory_mb, daily_paths)
+                write_outputs(result, prefix=prefix, tables=[name for name in tables if name != 'daily'],
+                              formats=formats)
+            else:
+                write_outputs(analyse(sources, cities, start, end), prefix=prefix, tables=tables, formats=formats)
+        except NoRawData as e:
+            print(f"{start or '最早'}-{end or '最新'} 跳过{'（' + prefix + '）' if prefix else ''}: {e}")
+            continue
+        written += 1
+    if not written:
+        raise NoRawData(f"没有找到原始数据: {', '.join(map(str, described))}")
+
+    print("每天和每月平均气温、平均最高气温、平均最低气温、每月风力等级及每月天气状况（白天/夜晚）出现天数已计算并保存。")
+
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="计算每天、每月的气温、风力和天气状况统计")
+    parser.add_argument("sources", nargs="*",
+                        help="原始数据：CSV文件或分区存储目录，可以有多个；不指定时使用默认的大连数据")
+    parser.add_argument("--cities", nargs="+", help="只统计这些城市")
+    parser.add_argument("--incremental", action="store_true",
+                        help="使用保存的中间状态，只重新计算数据有变化的月份")
+    parser.add_argument("--state-dir", default=STATE_DIR, help="增量统计状态目录")
+    parser.add_argument("--chunk-rows", type=int, help="分块统计，每批读取的行数")
+    parser.add_argument("--max-memory", type=float, metavar="MB",
+                        help="分块统计，按内存上限（MB）自动确定每批行数")
+    parser.add_argument("--csv", action="store_true",
+                        help="除Parquet外再输出一份原来格式的CSV文件")
+    parser.add_argument("--profile", action="store_true", help="记录各步骤的用时和内存，写出JSON报告")
+    args = parser.parse_args(argv)
+    profiling.enable('analyse', args.profile)
+    main(args.sources or None, args.cities, args.incremental, args.state_dir,
+         args.chunk_rows, args.max_memory, ('parquet', 'csv') if args.csv else ('parquet',))
+
+
+if __name__ == "__main__":
+    cli()
\ No newline at end of file
@@ -0,0 +1,202 @@
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from forecast import (METRICS, ORDER, SEASONAL_ORDER, MODEL_CACHE_DIR,
+                      read_monthly, monthly_series, fit_sarimax, spec_label)
+from tables import write_table
+
+# 滚动起点回测：预测起点从第 MIN_TRAIN 个月开始逐月后移，每个起点用之前的全部数据拟合模型，
+# 预测之后 HORIZON 个月，再和实际值比较。起点分成几段连续的区间并行计算，每段内下一个起点
+# 用上一个起点拟合的参数热启动。误差、RMSE和区间覆盖率对全部起点和步长一次性向量化计算。
+# 用法: python backtest.py --metrics 平均最高气温 --specs 1,1,1,1,1,1,12 0,1,1,0,1,1,12
+
+MIN_TRAIN = 24
+HORIZON = 6
+BACKTEST_FORECAST_FILE = 'backtest_forecasts.parquet'
+BACKTEST_METRICS_FILE = 'backtest_metrics.csv'
+
+
+def load_history(metrics, cities=None):
+    """读取全部月份（历史表和2025年表）的月平均气温，没有2025年表时只用历史表"""
+    frames = [read_monthly(metrics, cities=cities),
+              read_monthly(metrics, prefix='2025_', cities=cities, missing_ok=True)]
+    hist = pd.concat([f for f in frames if not f.empty], ignore_index=True)
+    hist['城市'] = hist['城市'].astype(str)
+    return hist.drop_duplicates(['城市', '月份'], keep='last')
+
+
+def parse_spec(text):
+    """'1,1,1,1,1,1,12' -> ((1, 1, 1), (1, 1, 1, 12))"""
+    values = tuple(int(v) for v in text.split(','))
+    if len(values) != 7:
+        raise argparse.ArgumentTypeError(f'模型设定应为 p,d,q,P,D,Q,s 七个整数: {text}')
+    return values[:3], values[3:]
+
+
+def backtest_chunk(y, origins, order, seasonal_order, horizon=HORIZON, cache_dir=MODEL_CACHE_DIR):
+    """依次在一段连续的起点上拟合和预测
+
+    origins 为训练数据的长度（即预测起点在序列中的位置）。返回 (预测值, 下限, 上限) 三个
+    len(origins) × horizon 的数组。
+    """
+    mean = np.full((len(origins), horizon), np.nan)
+    lower = np.full((len(origins), horizon), np.nan)
+    upper = np.full((len(origins), horizon), np.nan)
+    params = None
+    for i, t in enumerate(origins):
+        results, _ = fit_sarimax(y.iloc[:t], order, seasonal_order, cache_dir=cache_dir, start_params=params)
+        params = results.params.values
+        forecast = results.get_forecast(steps=horizon)
+        pred_ci = forecast.conf_int()
+        mean[i] = forecast.predicted_mean.values
+        lower[i] = pred_ci.iloc[:, 0].values
+        upper[i] = pred_ci.iloc[:, 1].values
+    return mean, lower, upper
+
+
+def _backtest_job(args):
+    """一段起点的回测，出错时返回 (None, 错误信息)，不影响其他段"""
+    try:
+        return backtest_chunk(*args), ''
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}'
+
+
+def actual_matrix(y, origins, horizon=HORIZON):
+    """每个起点之后 horizon 个月的实际值，超出数据范围的为NaN"""
+    values = np.concatenate([y.to_numpy(dtype=float), np.full(horizon, np.nan)])
+    return values[np.asarray(origins)[:, None] + np.arange(horizon)]
+
+
+def score(mean, lower, upper, actual):
+    """按步长计算 MAE、RMSE 和区间覆盖率，最后一行为全部步长合计"""
+    valid = ~np.isnan(actual)
+    err = np.where(valid, mean - actual, 0.0)
+    covered = valid & (actual >= lower) & (actual <= upper)
+    n = valid.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        by_step = pd.DataFrame({
+            '步长': np.arange(1, actual.shape[1] + 1).astype(str),
+            'MAE': np.abs(err).sum(axis=0) / n,
+            'RMSE': np.sqrt((err ** 2).sum(axis=0) / n),
+            '覆盖率': covered.sum(axis=0) / n,
+            '样本数': n,
+        })
+        total = n.sum()
+        overall = pd.DataFrame({
+            '步长': ['全部'],
+            'MAE': [np.abs(err).sum() / total],
+            'RMSE': [np.sqrt((err ** 2).sum() / total)],
+            '覆盖率': [covered.sum() / total],
+            '样本数': [total],
+        })
+    return pd.concat([by_step, overall], ignore_index=True)
+
+
+def run_backtest(series, specs, horizon=HORIZON, min_train=MIN_TRAIN, workers=0, cache_dir=MODEL_CACHE_DIR):
+    """对 {(城市, 指标): 序列} 中每条序列、specs 中每个模型设定做滚动起点回测
+
+    返回 (逐起点预测表, 误差指标表, [(城市, 指标, 模型, 错误)])；有任何一段起点出错的序列和设定不计入结果。
+    """
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    tasks = [(key, y, spec) for key, y in series.items() for spec in specs if len(y) > min_train]
+    # 每条序列的起点分成若干段，任务总数大致和进程数相当；段越长热启动的效果越好
+    n_chunks = max(1, math.ceil(workers / max(1, len(tasks))))
+
+    jobs, owners = [], []
+    for task_id, (key, y, (order, seasonal_order)) in enumerate(tasks):
+        origins = np.arange(min_train, len(y))
+        for chunk in np.array_split(origins, min(n_chunks, len(origins))):
+            jobs.append((y, chunk, order, seasonal_order, horizon, cache_dir))
+            owners.append(task_id)
+
+    if workers == 1:
+        outputs = [_backtest_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outputs = list(pool.map(_backtest_job, jobs))
+
+    forecast_frames, metric_frames, failures = [], [], []
+    for task_id, ((city, metric), y, (order, seasonal_order)) in enumerate(tasks):
+        parts = [out for owner, out in zip(owners, outputs) if owner == task_id]
+        spec = spec_label(order, seasonal_order)
+        errors = [error for result, error in parts if result is None]
+        if errors:
+            failures.append((city, metric, spec, errors[0]))
+            continue
+        mean, lower, upper = (np.vstack(arrays) for arrays in zip(*(result for result, _ in parts)))
+        origins = np.arange(min_train, len(y))
+        actual = actual_matrix(y, origins, horizon)
+
+        metrics = score(mean, lower, upper, actual)
+        metrics.insert(0, '模型', spec)
+        metrics.insert(0, '指标', metric)
+        metrics.insert(0, '城市', city)
+        metric_frames.append(metrics)
+
+        # 起点为训练数据的最后一个月，日期为预测的月份
+        steps = np.tile(np.arange(1, horizon + 1), len(origins))
+        origin_months = y.index[np.repeat(origins, horizon) - 1].to_period('M')
+        forecast_frames.append(pd.DataFrame({
+            '城市': city,
+            '指标': metric,
+            '模型': spec,
+            '起点': origin_months.to_timestamp(),
+            '步长': steps,
+            '日期': (origin_months + steps).to_timestamp(),
+            '预测值': mean.ravel(),
+            '下限': lower.ravel(),
+            '上限': upper.ravel(),
+            '实际值': actual.ravel(),
+        }))
+    if not metric_frames:
+        return pd.DataFrame(), pd.DataFrame(), failures
+    return pd.concat(forecast_frames, ignore_index=True), pd.concat(metric_frames, ignore_index=True), failures
+
+
+def main(metrics=METRICS, cities=None, specs=((ORDER, SEASONAL_ORDER),), horizon=HORIZON,
+         min_train=MIN_TRAIN, workers=0, cache_dir=MODEL_CACHE_DIR):
+    hist = load_history(metrics, cities)
+    series = {(city, metric): monthly_series(hist, city, metric).astype(float)
+              for city in sorted(hist['城市'].unique()) for metric in metrics}
+
+    started = time.perf_counter()
+    forecasts, scores, failures = run_backtest(series, specs, horizon, min_train, workers, cache_dir)
+    for city, metric, spec, error in failures:
+        print(f"  回测失败 {city} {metric} {spec}: {error}")
+    if scores.empty:
+        if not failures:
+            print(f"没有长度超过 {min_train} 个月的序列，无法回测")
+        return
+    write_table(forecasts, BACKTEST_FORECAST_FILE)
+    scores.to_csv(BACKTEST_METRICS_FILE, index=False, encoding='utf-8-sig')
+
+    n_origins = forecasts.groupby(['城市', '指标', '模型'], observed=True)['起点'].nunique().sum()
+    print(f"共 {len(series)} 条序列、{len(specs)} 个模型设定、{n_origins} 次拟合，"
+          f"用时 {time.perf_counter() - started:.1f} 秒")
+    print(scores[scores['步长'] == '全部'].to_string(index=False))
+    print(f"逐起点预测已保存到 {BACKTEST_FORECAST_FILE}，误差指标已保存到 {BACKTEST_METRICS_FILE}")
+
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="SARIMAX滚动起点回测")
+    parser.add_argument("--cities", nargs="+", help="回测的城市，默认为数据中的全部城市")
+    parser.add_argument("--metrics", nargs="+", default=METRICS, help="回测的指标")
+    parser.add_argument("--specs", nargs="+", type=parse_spec, default=[(ORDER, SEASONAL_ORDER)],
+                        help="比较的模型设定，每个写成 p,d,q,P,D,Q,s")
+    parser.add_argument("--horizon", type=int, default=HORIZON, help="每个起点预测的月数")
+    parser.add_argument("--min-train", type=int, default=MIN_TRAIN, help="第一个起点的训练月数")
+    parser.add_argument("--workers", type=int, default=0, help="并行进程数，0 表示使用全部CPU核心")
+    parser.add_argument("--no-cache", action="store_true", help="不读写模型缓存")
+    args = parser.parse_args(argv)
+    main(args.metrics, args.cities, args.specs, args.horizon, args.min_train, args.workers,
+         None if args.no_cache else MODEL_CACHE_DIR)
+
+
+if __name__ == "__main__":
+    cli()
\ No newline at end of file
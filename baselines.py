@@ -0,0 +1,219 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from forecast import (METRICS, STEPS, TRAIN_START, TRAIN_END, FORECAST_CHART_DIR, read_monthly, plot_batch)
+from tables import table_path, read_table, write_table
+
+# 轻量的基准预测方法：季节朴素、按一年中的位置（日或月）平滑的气候平均、Holt-Winters加法模型。
+# 所有序列先对齐成一个 (序列数 × 时间) 的二维数组，每种方法对全部序列一次性向量化计算，
+# 输出与 forecast.py 批量预测相同的表结构（城市, 指标, 日期, 预测值, 下限, 上限, 模型）。
+# 月度预测可以用 forecast.py 的图表展示，逐日预测只输出表。
+# 用法: python baselines.py --freq daily --horizon 30
+
+Z95 = 1.959964
+FREQS = {
+    # 频率: (pandas频率, 季节长度, 默认预测步数)
+    'monthly': ('MS', 12, STEPS),
+    'daily': ('D', 365, 30),
+}
+MODELS = ['seasonal_naive', 'climatology', 'holt_winters']
+MODEL_NAMES = {'seasonal_naive': '季节朴素', 'climatology': '气候平均', 'holt_winters': 'Holt-Winters'}
+# 气候平均的循环平滑窗口（前后各几个时间点）。月度不平滑，否则最冷、最热的月份会被拉向年平均；
+# 逐日每个日子只有几年的样本，平滑前后各半个月
+CLIMATOLOGY_WINDOW = {'monthly': 0, 'daily': 15}
+HW_ALPHAS = (0.1, 0.2, 0.4, 0.6)
+HW_BETAS = (0.0, 0.01, 0.05)
+HW_GAMMAS = (0.05, 0.1, 0.3)
+
+
+def load_matrix(freq='monthly', metrics=METRICS, cities=None):
+    """读取训练数据，返回 (二维数组, [(城市, 指标)], 时间索引)，缺失的时间点为NaN"""
+    pandas_freq = FREQS[freq][0]
+    if freq == 'monthly':
+        data = read_monthly(metrics, start=TRAIN_START, end=TRAIN_END, cities=cities).rename(columns={'月份': '日期'})
+        end = pd.Timestamp(TRAIN_END)
+    else:
+        metrics = ['平均气温']  # 逐日表只有平均气温
+        filters = [('日期', '>=', pd.Timestamp(TRAIN_START)), ('日期', '<', pd.Timestamp(TRAIN_END) + pd.offsets.MonthBegin(1))]
+        if cities:
+            filters.append(('城市', 'in', list(cities)))
+        data = read_table(table_path('daily'), columns=['城市', '日期', '平均气温'], filters=filters)
+        end = pd.Timestamp(TRAIN_END) + pd.offsets.MonthEnd(0)
+    data['城市'] = data['城市'].astype(str)
+    index = pd.date_range(TRAIN_START, end, freq=pandas_freq)
+    wide = data.pivot_table(index='日期', columns='城市', values=metrics, aggfunc='mean').reindex(index)
+    keys = [(city, metric) for city in sorted(data['城市'].unique()) for metric in metrics]
+    values = np.stack([wide[(metric, city)].to_numpy(dtype=float) for city, metric in keys]) if keys \
+        else np.empty((0, len(index)))
+    return values, keys, index
+
+
+def season_phase(index, freq):
+    """每个时间点在一年中的位置：月度为0-11，逐日为0-364（2月29日并入2月28日）"""
+    if freq == 'monthly':
+        return index.month.to_numpy() - 1
+    doy = index.dayofyear.to_numpy() - 1
+    leap_shift = index.is_leap_year & ((index.month > 2) | ((index.month == 2) & (index.day == 29)))
+    return np.where(leap_shift, doy - 1, doy)
+
+
+def seasonal_naive(Y, season, horizon):
+    """每一步取上一个季节同一位置的最近一个观测值；区间宽度随经过的季节数增大"""
+    n, T = Y.shape
+    last = np.full((n, season), np.nan)
+    # 从最近一个季节往前找，每个位置取最近的非缺失值
+    for start in range(T - season, -season, -season):
+        block = Y[:, max(start, 0):start + season]
+        if start < 0:
+            block = np.concatenate([np.full((n, -start), np.nan), block], axis=1)
+        last = np.where(np.isnan(last), block, last)
+        if not np.isnan(last).any():
+            break
+    steps = np.arange(horizon)
+    # last 的第 i 列是时间 T-season+i，与时间 T+i 处在季节的同一位置
+    mean = last[:, steps % season]
+    resid = Y[:, season:] - Y[:, :-season]
+    sigma = np.sqrt(np.nanmean(resid ** 2, axis=1))
+    width = Z95 * sigma[:, None] * np.sqrt(steps // season + 1)[None, :]
+    return mean, mean - width, mean + width
+
+
+def circular_smooth(values, window):
+    """沿最后一维做首尾相接的滑动求和，窗口为前后各 window 个点"""
+    if window <= 0:
+        return values
+    padded = np.concatenate([values[:, -window:], values, values[:, :window]], axis=1)
+    csum = np.cumsum(np.pad(padded, ((0, 0), (1, 0))), axis=1)
+    return csum[:, 2 * window + 1:] - csum[:, :-(2 * window + 1)]
+
+
+def climatology(Y, phase, future_phase, n_phases, window):
+    """按一年中的位置求多年平均并循环平滑，区间来自相对气候平均的距平标准差"""
+    observed = ~np.isnan(Y)
+    onehot = np.zeros((Y.shape[1], n_phases))
+    onehot[np.arange(Y.shape[1]), phase] = 1.0
+    sums = circular_smooth(np.where(observed, Y, 0.0) @ onehot, window)
+    counts = circular_smooth(observed.astype(float) @ onehot, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        clim = sums / counts
+    anomaly = Y - clim[:, phase]
+    sigma = np.sqrt(np.nanmean(anomaly ** 2, axis=1))
+    mean = clim[:, future_phase]
+    width = Z95 * sigma[:, None]
+    return mean, mean - width, mean + width
+
+
+def holt_winters(Y, season, horizon, alphas=HW_ALPHAS, betas=HW_BETAS, gammas=HW_GAMMAS):
+    """加法Holt-Winters（误差修正形式），对全部序列和全部平滑参数组合同时递推
+
+    每条序列选一步预测误差平方和最小的参数组合。缺失的观测不更新状态。
+    """
+    n, T = Y.shape
+    grid = np.array([(a, b, g) for a in alphas for b in betas for g in gammas])
+    alpha, beta, gamma = (grid[:, i][:, None] for i in range(3))  # (参数组合, 1)
+
+    # 初始状态：第一个季节的均值为水平，前两个季节均值之差为趋势，第一个季节的偏差为季节项
+    first = Y[:, :season]
+    level0 = np.nan_to_num(np.nanmean(first, axis=1))
+    trend0 = np.zeros(n)
+    if T >= 2 * season:
+        trend0 = np.nan_to_num((np.nanmean(Y[:, season:2 * season], axis=1) - level0) / season)
+    level = np.broadcast_to(level0, (len(grid), n)).copy()
+    trend = np.broadcast_to(trend0, (len(grid), n)).copy()
+    seasonal = np.broadcast_to(np.nan_to_num(first - level0[:, None]), (len(grid), n, season)).copy()
+
+    sse = np.zeros((len(grid), n))
+    count = np.zeros(n)
+    for t in range(T):
+        s = t % season
+        y = Y[:, t]
+        observed = ~np.isnan(y)
+        err = np.where(observed, y - (level + trend + seasonal[:, :, s]), 0.0)
+        if t >= season:
+            sse += err ** 2
+            count += observed
+        level = level + trend + alpha * err
+        trend = trend + beta * err
+        seasonal[:, :, s] += gamma * err
+
+    best = np.argmin(sse, axis=0)
+    rows = np.arange(n)
+    steps = np.arange(1, horizon + 1)
+    seasonal_idx = (T + steps - 1) % season
+    mean = (level[best, rows][:, None] + trend[best, rows][:, None] * steps[None, :]
+            + seasonal[best, rows][:, seasonal_idx])
+
+    # 预测方差 σ²[1 + Σ_{j<h} (α + βj + γ·[j是季节长度的倍数])²]
+    sigma2 = sse[best, rows] / np.maximum(count, 1)
+    a, b, g = alpha[best, 0][:, None], beta[best, 0][:, None], gamma[best, 0][:, None]
+    j = np.arange(1, horizon)[None, :]
+    c2 = (a + b * j + g * (j % season == 0)) ** 2
+    var = sigma2[:, None] * (1 + np.concatenate([np.zeros((n, 1)), np.cumsum(c2, axis=1)], axis=1))
+    width = Z95 * np.sqrt(var)
+    return mean, mean - width, mean + width
+
+
+def run_baselines(Y, keys, index, freq='monthly', models=MODELS, horizon=None):
+    """对全部序列运行指定的基准方法，返回与 forecast.py 批量预测相同结构的表"""
+    pandas_freq, season, default_horizon = FREQS[freq]
+    horizon = horizon or default_horizon
+    future = pd.date_range(index[-1], periods=horizon + 1, freq=pandas_freq)[1:]
+    n_phases = 12 if freq == 'monthly' else 365
+    frames = []
+    for model in models:
+        if model == 'seasonal_naive':
+            mean, lower, upper = seasonal_naive(Y, season, horizon)
+        elif model == 'climatology':
+            mean, lower, upper = climatology(Y, season_phase(index, freq), season_phase(future, freq),
+                                             n_phases, CLIMATOLOGY_WINDOW[freq])
+        elif model == 'holt_winters':
+            mean, lower, upper = holt_winters(Y, season, horizon)
+        else:
+            raise ValueError(f'未知的基准方法: {model}')
+        frames.append(pd.DataFrame({
+            '城市': np.repeat([city for city, _ in keys], horizon),
+            '指标': np.repeat([metric for _, metric in keys], horizon),
+            '日期': np.tile(future, len(keys)),
+            '预测值': mean.ravel(),
+            '下限': lower.ravel(),
+            '上限': upper.ravel(),
+            '模型': MODEL_NAMES[model],
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def main(freq='monthly', models=MODELS, metrics=METRICS, cities=None, horizon=None, charts=False, workers=0):
+    Y, keys, index = load_matrix(freq, metrics, cities)
+    started = time.perf_counter()
+    table = run_baselines(Y, keys, index, freq, models, horizon)
+    elapsed = time.perf_counter() - started
+    path = table_path('baseline', prefix='daily_' if freq == 'daily' else '')
+    write_table(table, path)
+    print(f"共 {len(keys)} 条序列 × {len(models)} 种方法，计算用时 {elapsed:.3f} 秒，结果已保存到 {path}")
+
+    if charts:
+        if freq != 'monthly':
+            print("逐日预测没有对应的图表，跳过绘图")
+            return
+        for model in models:
+            output_dir = f'{FORECAST_CHART_DIR}/{model}'
+            paths = plot_batch(table[table['模型'] == MODEL_NAMES[model]], workers, output_dir)
+            print(f"{MODEL_NAMES[model]}: 已绘制 {len(paths)} 条序列的预测图，保存在 {output_dir}")
+
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="向量化基准预测")
+    parser.add_argument("--freq", choices=list(FREQS), default='monthly', help="预测月度或逐日数据")
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=MODELS, help="使用的基准方法")
+    parser.add_argument("--metrics", nargs="+", default=METRICS, help="月度预测的指标")
+    parser.add_argument("--cities", nargs="+", help="预测的城市，默认为数据中的全部城市")
+    parser.add_argument("--horizon", type=int, help="预测步数，默认月度6个月、逐日30天")
+    parser.add_argument("--charts", action="store_true", help="为月度预测绘制与 forecast.py 相同的图表")
+    parser.add_argument("--workers", type=int, default=0, help="绘图进程数，0 表示使用全部CPU核心")
+    args = parser.parse_args(argv)
+    main(args.freq, args.models, args.metrics, args.cities, args.horizon, args.charts, args.workers)
+
+
+if __name__ == "__main__":
+    cli()
\ No newline at end of file
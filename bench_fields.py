@@ -0,0 +1,112 @@
+import argparse
+import re
+import time
+import numpy as np
+import pandas as pd
+from fields import split_temps, wind_levels
+
+# 比较逐行 apply 与向量化字段解析的速度，并校验两者结果一致。逐行版本是最初 analyse.py 中的写法，
+# 只在这里作参照；analyse.py 使用 fields.py 中的向量化版本
+# 用法: python bench_fields.py --rows 200000
+
+WEATHER = ['晴', '多云', '阴', '小雨', '中雨', '雷阵雨', '小雪', '雨夹雪']
+WIND = ['北风1-2级', '南风3-4级', '东北风4-5级', '西风3级', '微风']
+
+
+# ========== 逐行参照实现 ==========
+def extract_temps(temp_str):
+    try:
+        day, night = temp_str.replace('℃', '').split('/')
+        return float(day), float(night)
+    except:
+        return np.nan, np.nan
+
+
+def extract_wind_level(wind_str):
+    match = re.search(r'(\d+-\d+级|\d+级)', wind_str)
+    return match.group(1) if match else None
+
+
+def extract_weather_types(weather_str):
+    if pd.isna(weather_str):
+        return []
+    types = str(weather_str).split('/')
+    if len(types) == 2 and types[0] == types[1]:
+        return [types[0]]
+    return list(set(types))
+
+
+def explode_weather_types(weather):
+    """把天气状况拆成每天每种类型一行，返回以原行号为索引的Series
+
+    如 '晴/多云' 算晴和多云各一天，'晴/晴' 只算一次，与 extract_weather_types 加 explode 的结果相同。
+    """
+    parts = weather.dropna().astype(str).str.split('/', expand=True)
+    stacked = parts.stack().dropna()
+    pairs = pd.DataFrame({'行': stacked.index.get_level_values(0), '天气类型': stacked.values})
+    pairs = pairs.drop_duplicates()
+    return pd.Series(pairs['天气类型'].values, index=pairs['行'].values, name='天气类型')
+
+
+def make_columns(n, seed=0):
+    """生成原始格式的三列数据，夹杂少量格式错误的行"""
+    rng = np.random.default_rng(seed)
+    high = rng.integers(-10, 35, n)
+    low = high - rng.integers(0, 12, n)
+    temp = pd.Series([f'{h}℃/{l}℃' for h, l in zip(high, low)])
+    weather = pd.Series([f'{a}/{b}' for a, b in zip(rng.choice(WEATHER, n), rng.choice(WEATHER, n))])
+    wind = pd.Series([f'{a}/{b}' for a, b in zip(rng.choice(WIND, n), rng.choice(WIND, n))])
+    bad = rng.choice(n, max(1, n // 1000), replace=False)
+    temp.iloc[bad] = ['--', '5℃', '3℃/x℃', '1/2/3'] * (len(bad) // 4) + ['--'] * (len(bad) % 4)
+    return temp, weather, wind
+
+
+def per_row(temp, weather, wind):
+    temps = temp.apply(lambda x: pd.Series(extract_temps(x)))
+    temps.columns = ['最高气温', '最低气温']
+    levels = wind.apply(extract_wind_level)
+    types = weather.apply(extract_weather_types).explode().dropna()
+    return temps, levels, types
+
+
+def vectorized(temp, weather, wind):
+    return split_temps(temp), wind_levels(wind), explode_weather_types(weather)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main(rows=100000):
+    temp, weather, wind = make_columns(rows)
+    print(f"共 {rows} 行")
+
+    slow_time, (slow_temps, slow_levels, slow_types) = timed(per_row, temp, weather, wind)
+    fast_time, (fast_temps, fast_levels, fast_types) = timed(vectorized, temp, weather, wind)
+
+    # 天气类型的展开顺序不同，按 (行号, 类型) 排序后比较
+    def sorted_pairs(types):
+        return sorted(zip(types.index, types.astype(str)))
+
+    checks = {
+        '气温': slow_temps.astype(float).equals(fast_temps),
+        '风力等级': slow_levels.fillna('').tolist() == fast_levels.fillna('').tolist(),
+        '天气类型': sorted_pairs(slow_types) == sorted_pairs(fast_types),
+    }
+
+    print(f"逐行apply: {slow_time:.3f} 秒")
+    print(f"向量化:    {fast_time:.3f} 秒")
+    print(f"加速比:    {slow_time / fast_time:.1f}x")
+    for name, ok in checks.items():
+        print(f"{name}: {'一致' if ok else '不一致'}")
+    if not all(checks.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="字段解析基准测试")
+    parser.add_argument("--rows", type=int, default=100000, help="生成的数据行数")
+    args = parser.parse_args()
+    main(args.rows)
\ No newline at end of file
@@ -0,0 +1,58 @@
+import argparse
+import glob
+import os
+import time
+from data_pull import CACHE_DIR, parse_weather_table, parse_weather_table_bs4
+
+# 用已保存的页面比较两种表格解析方式的速度，并校验两者输出完全一致
+# 用法: python bench_parse.py [页面目录] --repeat 3
+
+
+def time_parser(parser, pages, repeat):
+    """返回 (最快一轮的总耗时, 最后一轮的解析结果)"""
+    best = float("inf")
+    results = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [parser(html) for html in pages]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def main(page_dir=CACHE_DIR, repeat=3):
+    paths = sorted(glob.glob(os.path.join(page_dir, "**", "*.html"), recursive=True))
+    if not paths:
+        print(f"{page_dir} 下没有保存的页面，请先运行 data_pull.py")
+        return
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    size_mb = sum(len(html.encode("utf-8")) for html in pages) / 1024 / 1024
+    print(f"共 {len(pages)} 个页面，{size_mb:.1f} MB，每种解析方式运行 {repeat} 轮取最快一轮")
+
+    bs4_time, bs4_rows = time_parser(parse_weather_table_bs4, pages, repeat)
+    fast_time, fast_rows = time_parser(parse_weather_table, pages, repeat)
+
+    mismatched = [path for path, a, b in zip(paths, bs4_rows, fast_rows) if a != b]
+    total_rows = sum(len(rows) for rows in bs4_rows if rows)
+
+    print(f"{'解析方式':<12}{'总耗时(秒)':>12}{'页/秒':>10}{'行/秒':>12}")
+    for name, elapsed in [("BeautifulSoup", bs4_time), ("lxml片段", fast_time)]:
+        print(f"{name:<12}{elapsed:>12.3f}{len(pages) / elapsed:>10.0f}{total_rows / elapsed:>12.0f}")
+    print(f"加速比: {bs4_time / fast_time:.1f}x")
+
+    if mismatched:
+        print(f"输出不一致的页面 {len(mismatched)} 个:")
+        for path in mismatched[:10]:
+            print(f"  {path}")
+        raise SystemExit(1)
+    print(f"{len(pages)} 个页面、{total_rows} 行输出完全一致")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="天气表格解析基准测试")
+    parser.add_argument("page_dir", nargs="?", default=CACHE_DIR, help="保存页面的目录，默认为页面缓存目录")
+    parser.add_argument("--repeat", type=int, default=3, help="每种解析方式运行的轮数")
+    args = parser.parse_args()
+    main(args.page_dir, args.repeat)
\ No newline at end of file
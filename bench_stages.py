@@ -0,0 +1,140 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import warnings
+import pandas as pd
+import analyse
+import baselines
+import draw
+import forecast
+import synth
+from climatology import ClimatologyCube
+from store import STORE_DIR
+from tables import table_path, read_table
+
+# 各阶段随数据量增长的基准测试。用 synth.py 在临时目录中生成 1×、10×、100× 个城市的合成原始数据
+# （每个城市3年逐日数据），依次计时：生成、统计（analyse）、绘图数据准备（气候立方体、整理数据和
+# 指纹，不含渲染；渲染的耗时只与图表数量有关，用 --render 单独计时第一个城市）、SARIMAX批量预测
+# （不使用模型缓存）和向量化基准预测。全程不访问网络，同样的参数总是得到同样的数据。
+# 用法: python bench_stages.py --scales 1 10 100 --repeat 3
+
+SCALES = (1, 10, 100)
+BENCH_RESULT_FILE = 'bench_stages.csv'
+
+
+def timed(func, repeat=1):
+    """运行 repeat 次，返回 (最快一次的耗时, 最后一次的结果)"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def bench_analyse():
+    result = analyse.analyse([STORE_DIR])
+    analyse.write_outputs(result)
+    return len(result['daily'])
+
+
+def bench_draw():
+    """全部城市的气候立方体，以及每个城市的绘图任务和指纹"""
+    cube = ClimatologyCube()
+    cube.update(read_table(table_path('monthly')), read_table(table_path('wind')), read_table(table_path('weather')))
+    charts = 0
+    for city in cube.cities:
+        monthly_avg, wind_count, weather_count = draw.load_tables(city)
+        jobs = draw.build_jobs(monthly_avg, wind_count, weather_count, cube, city)
+        charts += len(draw.stale_jobs(jobs, {}))
+    return charts
+
+
+def bench_render(city):
+    draw.setup_style()
+    monthly_avg, wind_count, weather_count = draw.load_tables(city)
+    cube = ClimatologyCube()
+    cube.update(monthly_avg.assign(城市=city), wind_count.assign(城市=city), weather_count.assign(城市=city))
+    jobs = draw.build_jobs(monthly_avg, wind_count, weather_count, cube, city)
+    return len(draw.render(jobs))
+
+
+def bench_forecast(workers):
+    hist = forecast.read_monthly(forecast.METRICS, start=forecast.TRAIN_START, end=forecast.TRAIN_END)
+    series = {(city, metric): forecast.monthly_series(hist, city, metric).astype(float)
+              for city in sorted(hist['城市'].astype(str).unique()) for metric in forecast.METRICS}
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        forecast.run_batch(series, workers, cache_dir=None)
+    return len(series)
+
+
+def bench_baselines():
+    Y, keys, index = baselines.load_matrix('monthly')
+    baselines.run_baselines(Y, keys, index, 'monthly')
+    return len(keys)
+
+
+def run_scale(scale, work_dir, base_cities=1, repeat=1, workers=0, render=False, skip_forecast=False):
+    """在 work_dir 中生成 scale 倍的数据并计时各阶段，返回 [(阶段, 单位, 数量, 秒)]"""
+    cities = synth.city_names(base_cities * scale)
+    os.makedirs(work_dir, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        results = []
+        elapsed, rows = timed(lambda: synth.write_store(cities), 1)
+        results.append(('生成数据', '行', rows, elapsed))
+        elapsed, rows = timed(bench_analyse, repeat)
+        results.append(('统计', '行', rows, elapsed))
+        elapsed, charts = timed(bench_draw, repeat)
+        results.append(('绘图数据准备', '张图', charts, elapsed))
+        if render:
+            elapsed, charts = timed(lambda: bench_render(cities[0]), 1)
+            results.append(('渲染（一个城市）', '张图', charts, elapsed))
+        if not skip_forecast:
+            elapsed, n = timed(lambda: bench_forecast(workers), repeat)
+            results.append(('SARIMAX预测', '条序列', n, elapsed))
+        elapsed, n = timed(bench_baselines, repeat)
+        results.append(('基准预测', '条序列', n, elapsed))
+        return results
+    finally:
+        os.chdir(cwd)
+
+
+def main(scales=SCALES, base_cities=1, repeat=1, workers=0, render=False, skip_forecast=False,
+         work_dir=None, keep=False):
+    root = work_dir or tempfile.mkdtemp(prefix='weather_bench_')
+    rows = []
+    try:
+        for scale in scales:
+            print(f"{scale}×: {base_cities * scale} 个城市 × {synth.YEARS} 年")
+            for stage, unit, amount, elapsed in run_scale(scale, os.path.join(root, f'x{scale}'), base_cities,
+                                                          repeat, workers, render, skip_forecast):
+                rows.append({'规模': f'{scale}×', '阶段': stage, '数量': amount, '单位': unit,
+                             '用时(秒)': round(elapsed, 3), '每秒': round(amount / elapsed, 1) if elapsed else None})
+                print(f"  {stage}: {amount} {unit}，{elapsed:.3f} 秒，每秒 {rows[-1]['每秒']} {unit}")
+    finally:
+        if not keep and work_dir is None:
+            shutil.rmtree(root, ignore_errors=True)
+    report = pd.DataFrame(rows)
+    report.to_csv(BENCH_RESULT_FILE, index=False, encoding='utf-8-sig')
+    print(report.pivot_table(index='阶段', columns='规模', values='每秒', sort=False).to_string())
+    print(f"结果已保存到 {BENCH_RESULT_FILE}" + (f"，数据保存在 {root}" if keep or work_dir else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="各阶段随数据量增长的基准测试（合成数据，不访问网络）")
+    parser.add_argument("--scales", nargs="+", type=int, default=list(SCALES), help="数据规模倍数")
+    parser.add_argument("--base-cities", type=int, default=1, help="1× 规模的城市个数")
+    parser.add_argument("--repeat", type=int, default=1, help="每个阶段运行的次数，取最快一次")
+    parser.add_argument("--workers", type=int, default=0, help="SARIMAX批量预测的进程数，0 表示使用全部CPU核心")
+    parser.add_argument("--render", action="store_true", help="另外计时渲染第一个城市的全部图表")
+    parser.add_argument("--skip-forecast", action="store_true", help="不计时SARIMAX预测（大规模时最慢）")
+    parser.add_argument("--work-dir", help="生成数据的目录，默认为临时目录，结束后删除")
+    parser.add_argument("--keep", action="store_true", help="保留临时目录中的数据")
+    args = parser.parse_args()
+    main(args.scales, args.base_cities, args.repeat, args.workers, args.render, args.skip_forecast,
+         args.work_dir, args.keep)
\ No newline at end of file
@@ -0,0 +1,106 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from cli import COMMANDS
+
+# 启动时间基准测试：在新的解释器中计时 python cli.py <子命令> --help（只导入该子命令的模块、
+# 解析参数后退出），与目标比较；同时在一个空的临时目录中导入每个模块，检查导入过程没有读写
+# 工作目录中的任何文件，也没有加载用不到的重量级库。超过目标、有文件访问或多加载了库时返回码为1。
+# 用法: python bench_startup.py --repeat 5
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# 目标（秒），包含解释器本身的启动时间。绘图的子命令需要 pandas 和 matplotlib.pyplot，
+# 其余子命令只需要 pandas；时间与机器有关，下面的重量级库检查与机器无关
+STARTUP_TARGETS = {
+    'cli.py --help': 0.2,
+    'pull': 0.8,
+    'analyse': 0.8,
+    'draw': 1.5,
+    'forecast': 0.8,
+    'backtest': 0.8,
+    'baselines': 0.8,
+    'climatology': 0.8,
+    'pipeline': 0.2,
+    'synth': 0.8,
+    'serve': 0.8,
+}
+# 导入时不应加载的库（只在拟合、浏览器回退或绘图时才需要）；列出的子命令允许在导入时加载 matplotlib
+HEAVY_MODULES = ['statsmodels', 'selenium', 'bs4', 'matplotlib', 'aiohttp', 'lxml']
+MATPLOTLIB_COMMANDS = {'draw'}
+# 在子进程中记录导入模块时对工作目录的文件访问
+IO_CHECK = """
+import json, os, sys
+sys.path.pop(0)
+cwd = os.getcwd()
+touched = []
+def hook(event, args):
+    if event in ('open', 'os.listdir', 'os.scandir', 'os.mkdir', 'os.remove', 'os.rename', 'os.replace') \\
+            and args and isinstance(args[0], (str, bytes, os.PathLike)):
+        path = os.path.abspath(os.fsdecode(args[0]))
+        if path == cwd or path.startswith(cwd + os.sep):
+            touched.append(f'{event} {path}')
+sys.addaudithook(hook)
+import %s
+heavy = [name for name in %r if name in sys.modules]
+print(json.dumps([touched, heavy]))
+"""
+
+
+def time_command(args, repeat, cwd=None):
+    """在新的解释器中运行 repeat 次，返回最快一次的秒数"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       check=True)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def import_check(module, work_dir):
+    """在 work_dir 中导入模块，返回 (访问的工作目录文件, 加载的重量级库)"""
+    env = {**os.environ, 'PYTHONPATH': SCRIPT_DIR}
+    out = subprocess.run([sys.executable, '-c', IO_CHECK % (module, HEAVY_MODULES)], cwd=work_dir, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(repeat=5):
+    cli_path = os.path.join(SCRIPT_DIR, 'cli.py')
+    interpreter = time_command(['-c', 'pass'], repeat)
+    print(f"解释器本身启动: {interpreter:.3f} 秒")
+    rows = [('cli.py --help', time_command([cli_path, '--help'], repeat), [], [])]
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, (module, _) in COMMANDS.items():
+            elapsed = time_command([cli_path, name, '--help'], repeat, cwd=work_dir)
+            touched, heavy = import_check(module, work_dir)
+            extra = [lib for lib in heavy if not (lib == 'matplotlib' and name in MATPLOTLIB_COMMANDS)]
+            rows.append((name, elapsed, touched, extra))
+        leftovers = os.listdir(work_dir)
+
+    failed = bool(leftovers)
+    print(f"{'子命令':<14}{'用时(秒)':>10}{'目标':>8}  结果")
+    for name, elapsed, touched, extra in rows:
+        target = STARTUP_TARGETS.get(name)
+        ok = (target is None or elapsed <= target) and not touched and not extra
+        failed |= not ok
+        print(f"{name:<16}{elapsed:>10.3f}{target or float('nan'):>8.1f}  {'通过' if ok else '未通过'}")
+        for event in touched:
+            print(f"    导入时访问了工作目录: {event}")
+        if extra:
+            print(f"    导入时加载了: {', '.join(extra)}")
+    if leftovers:
+        print(f"导入后工作目录中多出了文件: {', '.join(leftovers)}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="命令行启动时间和导入副作用检查")
+    parser.add_argument("--repeat", type=int, default=5, help="每个命令运行的次数，取最快一次")
+    args = parser.parse_args()
+    main(args.repeat)
\ No newline at end of file
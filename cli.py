@@ -0,0 +1,47 @@
+import importlib
+import sys
+
+# 统一的命令行入口: python cli.py <子命令> [参数]，子命令的参数与直接运行对应脚本时相同。
+# 先只解析子命令名，选定之后才导入对应的模块，因此 --help 和轻量的子命令不会加载
+# statsmodels、matplotlib 或 selenium。各模块导入时不读写文件。
+# 用法: python cli.py analyse --incremental
+#       python cli.py forecast --batch --charts
+
+COMMANDS = {
+    # 子命令: (模块, 说明)
+    'pull': ('data_pull', '抓取历史天气数据'),
+    'analyse': ('analyse', '计算每天、每月的气温、风力和天气状况统计'),
+    'draw': ('draw', '绘制天气统计图表'),
+    'forecast': ('forecast', 'SARIMAX月度气温预测'),
+    'backtest': ('backtest', 'SARIMAX滚动起点回测'),
+    'baselines': ('baselines', '向量化基准预测'),
+    'climatology': ('climatology', '更新多年平均立方体并查询'),
+    'pipeline': ('pipeline', '按依赖关系运行抓取、统计、绘图和预测'),
+    'synth': ('synth', '生成与抓取结果格式相同的合成天气数据'),
+    'serve': ('query_service', '统计结果的本地HTTP/JSON查询服务'),
+}
+
+
+def usage():
+    width = max(len(name) for name in COMMANDS)
+    lines = ['用法: python cli.py <子命令> [参数]', '', '子命令:']
+    lines += [f'  {name:<{width}}  {description}' for name, (_, description) in COMMANDS.items()]
+    lines += ['', '查看子命令的参数: python cli.py <子命令> --help']
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return 0
+    name, *rest = argv
+    if name not in COMMANDS:
+        print(f'未知的子命令: {name}\n\n{usage()}', file=sys.stderr)
+        return 2
+    module = importlib.import_module(COMMANDS[name][0])
+    return module.cli(rest, prog=f'cli.py {name}')
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,208 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from tables import table_path, read_table
+
+# 预先计算的多年平均（气候）立方体。按 (城市, 年, 月, 键) 保存每个月的统计值，键为气温指标、
+# 风力等级或天气类型；同时保存 (城市, 月, 键) 上的多年合计和实际参与的年数。
+# 新数据到来时只覆盖变化的 (城市, 年, 月)、去掉表中已经没有的 (城市, 年, 月)，并只重新合计受影响的 (城市, 月)；
+# 查询某城市某月某个键的多年平均是O(1)的数组下标访问，不再假设固定的年数。
+
+CLIMATOLOGY_FILE = 'climatology.npz'
+TEMP_KEYS = ['平均气温', '平均最高气温', '平均最低气温']
+KINDS = ['气温', '风力等级', '天气类型']
+
+
+def _long_frame(monthly=None, wind=None, weather=None):
+    """把三张月度统计表转换成 (城市, 月份, 类别, 名称, 值) 的长表"""
+    parts = []
+    if monthly is not None:
+        temps = [col for col in TEMP_KEYS if col in monthly.columns]
+        part = monthly.melt(id_vars=['城市', '月份'], value_vars=temps, var_name='名称', value_name='值')
+        parts.append(part.assign(类别='气温'))
+    if wind is not None:
+        parts.append(wind[['城市', '月份', '风力等级', '天数']]
+                     .rename(columns={'风力等级': '名称', '天数': '值'}).assign(类别='风力等级'))
+    if weather is not None:
+        parts.append(weather[['城市', '月份', '天气类型', '天数']]
+                     .rename(columns={'天气类型': '名称', '天数': '值'}).assign(类别='天气类型'))
+    parts = [part.astype({'城市': str, '名称': str}) for part in parts if not part.empty]
+    if not parts:
+        return pd.DataFrame(columns=['城市', '月份', '类别', '名称', '值'])
+    long = pd.concat(parts, ignore_index=True)
+    long['月份'] = pd.to_datetime(long['月份'])
+    return long
+
+
+class ClimatologyCube:
+    """城市 × 年 × 月 × 键 的月度统计，以及城市 × 月 × 键 的多年合计和参与年数"""
+
+    def __init__(self):
+        self.cities, self.years, self.keys = [], [], []
+        self.values = np.zeros((0, 0, 12, 0), dtype=np.float32)  # 气温缺失为NaN，天数没有出现为0
+        self.present = np.zeros((0, 0, 12), dtype=bool)          # 该城市该年该月是否有数据
+        self.total = np.zeros((0, 12, 0))
+        self.n_years = np.zeros((0, 12, 0), dtype=np.int16)
+        self._reindex()
+
+    def _reindex(self):
+        self.city_index = {city: i for i, city in enumerate(self.cities)}
+        self.year_index = {year: i for i, year in enumerate(self.years)}
+        self.key_index = {key: i for i, key in enumerate(self.keys)}
+
+    def _grow(self, cities, years, keys):
+        """加入新的城市、年份和键，已有的数据保持不变"""
+        new_cities = [c for c in dict.fromkeys(cities) if c not in self.city_index]
+        new_years = [y for y in dict.fromkeys(years) if y not in self.year_index]
+        new_keys = [k for k in dict.fromkeys(keys) if k not in self.key_index]
+        if not (new_cities or new_years or new_keys):
+            return
+        C, Y, K = len(self.cities) + len(new_cities), len(self.years) + len(new_years), len(self.keys) + len(new_keys)
+        old = (slice(0, len(self.cities)), slice(0, len(self.years)))
+        values = np.zeros((C, Y, 12, K), dtype=np.float32)
+        values[..., [i for i, (kind, _) in enumerate(self.keys + new_keys) if kind == '气温']] = np.nan
+        values[old[0], old[1], :, :len(self.keys)] = self.values
+        present = np.zeros((C, Y, 12), dtype=bool)
+        present[old[0], old[1]] = self.present
+        total = np.zeros((C, 12, K))
+        total[:len(self.cities), :, :len(self.keys)] = self.total
+        n_years = np.zeros((C, 12, K), dtype=np.int16)
+        n_years[:len(self.cities), :, :len(self.keys)] = self.n_years
+        self.cities += new_cities
+        self.years += new_years
+        self.keys += new_keys
+        self.values, self.present, self.total, self.n_years = values, present, total, n_years
+        self._reindex()
+
+    def update(self, monthly=None, wind=None, weather=None):
+        """用月度统计表更新立方体，返回数据有变化的 (城市, 年, 月) 个数
+
+        表中出现的每个 (城市, 年, 月) 的对应类别整体替换为表中的值（没有出现的风力等级、天气类型为0天）；
+        值没有变化的月份不做任何修改。表中出现的城市以表为准：该城市在表中没有出现的 (年, 月)
+        从立方体中去掉，不再参与多年平均。
+        """
+        long = _long_frame(monthly, wind, weather)
+        if long.empty:
+            return 0
+        keys = list(zip(long['类别'], long['名称']))
+        self._grow(long['城市'].tolist(), long['月份'].dt.year.tolist(), keys)
+
+        ci = long['城市'].map(self.city_index).to_numpy()
+        yi = long['月份'].dt.year.map(self.year_index).to_numpy()
+        mi = long['月份'].dt.month.to_numpy() - 1
+        ki = np.array([self.key_index[key] for key in keys])
+
+        cells, cell_id = np.unique(np.stack([ci, yi, mi], axis=1), axis=0, return_inverse=True)
+        cell_id = cell_id.ravel()
+        c, y, m = cells.T
+        kinds = np.array([kind for kind, _ in self.keys])
+        replaced = np.isin(kinds, long['类别'].unique())
+        old = self.values[c, y, m]
+        new = old.copy()
+        new[:, replaced] = np.where(kinds[replaced] == '气温', np.nan, 0.0)
+        new[cell_id, ki] = long['值'].to_numpy(dtype=np.float32)
+
+        same = ((old == new) | (np.isnan(old) & np.isnan(new))).all(axis=1) & self.present[c, y, m]
+        changed = ~same
+
+        # 输入中的城市在表中已经没有的 (年, 月)
+        input_cities = np.unique(c)
+        stale = self.present[input_cities].copy()
+        stale[np.searchsorted(input_cities, c), y, m] = False
+        sc, sy, sm = np.nonzero(stale)
+        sc = input_cities[sc]
+        if not changed.any() and not len(sc):
+            return 0
+        c, y, m = c[changed], y[changed], m[changed]
+        self.values[c, y, m] = new[changed]
+        self.present[c, y, m] = True
+        self.values[sc, sy, sm] = np.where(kinds == '气温', np.nan, 0.0)
+        self.present[sc, sy, sm] = False
+
+        # 只重新合计受影响的 (城市, 月)
+        cm = np.unique(np.stack([np.concatenate([c, sc]), np.concatenate([m, sm])], axis=1), axis=0)
+        vals = self.values[cm[:, 0], :, cm[:, 1]]                       # (受影响个数, 年, 键)
+        contrib = self.present[cm[:, 0], :, cm[:, 1]][:, :, None] & ~np.isnan(vals)
+        self.total[cm[:, 0], cm[:, 1]] = np.where(contrib, vals, 0.0).sum(axis=1)
+        self.n_years[cm[:, 0], cm[:, 1]] = contrib.sum(axis=1)
+        return int(changed.sum()) + len(sc)
+
+    def lookup(self, city, month, kind, name):
+        """返回 (多年平均, 参与的年数)，没有数据时为 (NaN, 0)"""
+        c = self.city_index.get(city)
+        k = self.key_index.get((kind, name))
+        if c is None or k is None:
+            return np.nan, 0
+        n = int(self.n_years[c, month - 1, k])
+        return (self.total[c, month - 1, k] / n if n else np.nan), n
+
+    def month_frame(self, city, month, kind):
+        """某城市某月一个类别下全部键的多年平均，列为 名称, 平均值, 年数"""
+        c = self.city_index.get(city)
+        idx = [i for i, (k, _) in enumerate(self.keys) if k == kind]
+        if c is None or not idx:
+            return pd.DataFrame({'名称': pd.Series(dtype=str), '平均值': pd.Series(dtype=float),
+                                 '年数': pd.Series(dtype=int)})
+        n = self.n_years[c, month - 1, idx]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n > 0, self.total[c, month - 1, idx] / n, np.nan)
+        return pd.DataFrame({'名称': [self.keys[i][1] for i in idx], '平均值': mean, '年数': n.astype(int)})
+
+    def save(self, path=CLIMATOLOGY_FILE):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f,
+                     cities=np.array(self.cities, dtype=str),
+                     years=np.array(self.years, dtype=np.int32),
+                     key_kinds=np.array([kind for kind, _ in self.keys], dtype=str),
+                     key_names=np.array([name for _, name in self.keys], dtype=str),
+                     values=self.values, present=self.present, total=self.total, n_years=self.n_years)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=CLIMATOLOGY_FILE):
+        """读取保存的立方体，文件不存在时返回空立方体"""
+        cube = cls()
+        if not os.path.exists(path):
+            return cube
+        with np.load(path) as data:
+            cube.cities = data['cities'].tolist()
+            cube.years = data['years'].tolist()
+            cube.keys = list(zip(data['key_kinds'].tolist(), data['key_names'].tolist()))
+            cube.values, cube.present = data['values'], data['present']
+            cube.total, cube.n_years = data['total'], data['n_years']
+        cube._reindex()
+        return cube
+
+
+def update_from_tables(path=CLIMATOLOGY_FILE, prefix='', cities=None):
+    """读取 analyse.py 输出的月度统计表更新保存的立方体，返回 (立方体, 变化的月份数)"""
+    filters = [('城市', 'in', list(cities))] if cities else None
+    cube = ClimatologyCube.load(path)
+    changed = cube.update(
+        read_table(table_path('monthly', prefix), columns=['城市', '月份', *TEMP_KEYS], filters=filters),
+        read_table(table_path('wind', prefix), columns=['城市', '月份', '风力等级', '天数'], filters=filters),
+        read_table(table_path('weather', prefix), columns=['城市', '月份', '天气类型', '天数'], filters=filters),
+    )
+    if changed or not os.path.exists(path):
+        cube.save(path)
+    return cube, changed
+
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="更新多年平均立方体并查询")
+    parser.add_argument("--path", default=CLIMATOLOGY_FILE, help="立方体文件")
+    parser.add_argument("--cities", nargs="+", help="只更新这些城市")
+    parser.add_argument("--city", help="查询的城市")
+    parser.add_argument("--month", type=int, help="查询的月份（1-12）")
+    parser.add_argument("--kind", choices=KINDS, default='气温', help="查询的类别")
+    args = parser.parse_args(argv)
+    cube, changed = update_from_tables(args.path, cities=args.cities)
+    print(f"{len(cube.cities)} 个城市、{len(cube.years)} 年、{len(cube.keys)} 个键，本次更新了 {changed} 个月份")
+    if args.city and args.month:
+        print(cube.month_frame(args.city, args.month, args.kind).to_string(index=False))
+
+
+if __name__ == "__main__":
+    cli()
\ No newline at end of file
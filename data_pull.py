@@ -1,91 +1,403 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
 import pandas as pd
+import asyncio
+import argparse
+import os
+import random
+import re
 import time
+from datetime import datetime
+from urllib.parse import urlsplit
+from store import STORE_DIR, partition_path, write_partition
+import profiling
+from profiling import step
 
-def main():
+BASE_URL = "https://www.tianqihoubao.com/lishi/"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+}
+CONCURRENCY = 4  # 同时进行的HTTP请求数
+TIMEOUT = 15     # 单页超时时间（秒），与原先的WebDriverWait保持一致
+CACHE_DIR = "page_cache"  # 原始页面缓存目录，按 城市/YYYYMM.html 存放
+RATE = 1.0       # 每个站点每秒允许的请求数，代替原先每页之后的 time.sleep(1)
+RETRIES = 3      # 请求失败后的重试次数
+BACKOFF = 2.0    # 第一次重试前等待的秒数，之后每次翻倍
+STATUS_FILE = "scrape_status.csv"
+
+# 快速解析用：定位 class 中含 weather-table 的 <table> 开始标签，以及所有 table 开闭标签
+WEATHER_TABLE_START = re.compile(
+    r"""<table\b[^>]*\bclass\s*=\s*(["'])(?:[^"'>]*\s)?weather-table(?:\s[^"'>]*)?\1""", re.I)
+TABLE_TAG = re.compile(r"<(/?)table\b", re.I)
+WEATHER_TABLE_XPATH = "//table[contains(concat(' ', normalize-space(@class), ' '), ' weather-table ')]"
+
+
+def parse_weather_table_bs4(html):
+    """从页面HTML中提取天气表格的行，页面中没有天气表格时返回None
+
+    用BeautifulSoup解析整个页面，是 parse_weather_table 的参照实现，bench_parse.py 用它校验结果。
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "lxml")
+    table = soup.find("table", class_="weather-table")
+    if not table:
+        return None
+
+    rows = []
+    for tr in table.find_all("tr")[1:]:  # 跳过表头行
+        tds = tr.find_all("td")
+        if len(tds) < 4:  # 确保有足够的数据列
+            continue
+
+        # 提取日期、天气状况、气温、风力风向
+        date = tds[0].get_text().strip()
+        weather = tds[1].get_text().strip().replace("\n", "").replace(" ", "")
+        temp = tds[2].get_text().strip().replace("\n", "").replace(" ", "")
+        wind = tds[3].get_text().strip().replace("\n", "").replace(" ", "")
+
+        rows.append([date, weather, temp, wind])
+    return rows
+
+
+def extract_table_html(html):
+    """截取页面中天气表格的HTML片段，按开闭标签计数处理嵌套表格，找不到时返回None"""
+    start = WEATHER_TABLE_START.search(html)
+    if not start:
+        return None
+    depth = 0
+    for tag in TABLE_TAG.finditer(html, start.start()):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            return html[start.start():html.find(">", tag.end()) + 1]
+    return html[start.start():]  # 表格没有闭合时交给lxml容错处理
+
+
+def parse_weather_table(html):
+    """从页面HTML中提取天气表格的行，页面中没有天气表格时返回None
+
+    只把天气表格所在的片段交给lxml解析，用XPath取行和单元格，输出与 parse_weather_table_bs4 相同。
+    """
+    from lxml import html as lxml_html
+    fragment = extract_table_html(html)
+    if fragment is not None:
+        table = lxml_html.fragment_fromstring(fragment)
+    else:
+        # 开始标签写法特殊、正则没有匹配上时，退回解析整个页面
+        if "weather-table" not in html:
+            return None
+        tables = lxml_html.document_fromstring(html).xpath(WEATHER_TABLE_XPATH)
+        if not tables:
+            return None
+        table = tables[0]
+
+    rows = []
+    for tr in table.xpath(".//tr")[1:]:  # 跳过表头行
+        tds = tr.xpath(".//td")
+        if len(tds) < 4:  # 确保有足够的数据列
+            continue
+
+        # 提取日期、天气状况、气温、风力风向
+        rows.append([
+            tds[0].text_content().strip(),
+            tds[1].text_content().strip().replace("\n", "").replace(" ", ""),
+            tds[2].text_content().strip().replace("\n", "").replace(" ", ""),
+            tds[3].text_content().strip().replace("\n", "").replace(" ", ""),
+        ])
+    return rows
+
+
+def rows_to_frame(rows, ym, city):
+    df = pd.DataFrame(rows, columns=["日期", "天气状况", "气温", "风力风向"])
+    df["月份"] = ym
+    df["城市"] = city
+    return df
+
+
+def month_range(start, end):
+    """生成 start 到 end（含）之间的所有 YYYYMM"""
+    year, month = int(start[:4]), int(start[4:])
+    months = []
+    while f"{year}{month:02d}" <= end:
+        months.append(f"{year}{month:02d}")
+        year, month = year + month // 12, month % 12 + 1
+    return months
+
+
+def month_url(base_url, city, ym):
+    return f"{base_url}{city}/month/{ym}.html"
+
+
+def cache_path(city, ym, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, city, f"{ym}.html")
+
+
+def month_end(ym):
+    """返回该月结束的时刻（即下个月1日0点）"""
+    year, month = int(ym[:4]), int(ym[4:])
+    return datetime(year + month // 12, month % 12 + 1, 1)
+
+
+def load_cached_page(city, ym, cache_dir=CACHE_DIR):
+    """读取已完整抓取的月份页面
+
+    只有在该月结束之后抓取的页面才算完整；当前月份以及月中抓取的缓存返回None，需要重新抓取。
+    """
+    path = cache_path(city, ym, cache_dir)
+    if not os.path.exists(path):
+        return None
+    if os.path.getmtime(path) < month_end(ym).timestamp():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def save_cached_page(city, ym, html, cache_dir=CACHE_DIR):
+    """先写临时文件再替换，中途中断也不会留下半个页面"""
+    path = cache_path(city, ym, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(html)
+    os.replace(tmp_path, path)
+
+
+class TokenBucket:
+    """令牌桶限速器：按 rate 个/秒补充令牌，最多攒 capacity 个，同一站点的所有任务共享"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RetryableError(Exception):
+    """服务器限流或临时错误，可以稍后重试"""
+
+
+async def fetch_html(session, bucket, url):
+    await bucket.acquire()
+    async with session.get(url) as resp:
+        if resp.status == 429 or resp.status >= 500:
+            raise RetryableError(f"HTTP {resp.status}")
+        resp.raise_for_status()
+        return await resp.text(errors="replace")
+
+
+async def run_jobs(jobs, rate=RATE, concurrency=CONCURRENCY, retries=RETRIES,
+                   timeout=TIMEOUT, cache_dir=CACHE_DIR, store_dir=STORE_DIR):
+    """通过一个共享调度器执行所有 (城市, 月份) 抓取任务
+
+    jobs 为 [(city, ym, url)]。每个站点一个令牌桶，总吞吐量由 rate 决定而不是串行等待；
+    网络错误、超时、429 和 5xx 按指数退避重试。解析成功的页面立即写入缓存和分区存储，
+    不在内存中保留，运行中断后再次运行会从缓存继续。
+
+    返回 {(city, ym): 状态字典}，原始HTML中没有天气表格的任务状态为 no_table。
+    """
+    import aiohttp
+    buckets = {}
+    status = {}
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession(
+        connector=connector,
+        headers=HEADERS,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    ) as session:
+
+        async def run_one(city, ym, url):
+            host = urlsplit(url).netloc
+            if host not in buckets:
+                buckets[host] = TokenBucket(rate)
+            started = time.monotonic()
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    async with semaphore:
+                        html = await fetch_html(session, buckets[host], url)
+                    break
+                except (aiohttp.ClientError, asyncio.TimeoutError, RetryableError) as e:
+                    error = str(e) or type(e).__name__
+                    retryable = not isinstance(e, aiohttp.ClientResponseError) or e.status == 429
+                    if not retryable or attempt > retries:
+                        print(f"[失败] {city} {ym}: {error}（共尝试 {attempt} 次）")
+                        status[(city, ym)] = job_status("failed", attempt, started, error=error)
+                        return
+                    delay = BACKOFF * 2 ** (attempt - 1) * (1 + random.random() / 2)
+                    print(f"[重试] {city} {ym}: {error}，{delay:.1f} 秒后第 {attempt + 1} 次尝试")
+                    await asyncio.sleep(delay)
+
+            rows = parse_weather_table(html)
+            if rows:
+                save_cached_page(city, ym, html, cache_dir)
+                write_partition(rows_to_frame(rows, ym, city), city, ym, store_dir)
+                status[(city, ym)] = job_status("ok", attempt, started, rows=len(rows))
+                print(f"[完成] {city} {ym}: {len(rows)} 条")
+            else:
+                status[(city, ym)] = job_status("no_table", attempt, started)
+
+        await asyncio.gather(*(run_one(city, ym, url) for city, ym, url in jobs))
+    return status
+
+
+def job_status(state, attempts=0, started=None, rows=0, error=""):
+    return {
+        "状态": state,
+        "尝试次数": attempts,
+        "条数": rows,
+        "耗时": round(time.monotonic() - started, 2) if started is not None else 0.0,
+        "错误": error,
+    }
+
+
+# selenium 和 BeautifulSoup 只在浏览器回退和参照解析中用到，用到时才导入，平时抓取不需要加载；
+# aiohttp 和 lxml 在抓取和解析时才导入，--help 和只读缓存的命令不需要加载
+def create_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
     options = Options()
     options.add_argument("--headless")
     options.add_argument("--disable-gpu")
     options.add_argument("--window-size=1920,1080")
-    driver = webdriver.Chrome(options=options)
-
-    base_url = "https://www.tianqihoubao.com/lishi/dalian/"
-    
-    # 生成2022-2024年的所有月份链接
-    data_links = []
-    # for year in range(2022, 2025):  # 包括2022,2023,2024
-    #     for month in range(1, 13):
-    #         ym = f"{year}{month:02d}"  # 格式化为YYYYMM
-    #         url = f"{base_url}month/{ym}.html"
-    #         data_links.append((ym, url))
-
-    for month in range(1,7):
-        ym = f"2025{month:02d}"
-        url = f"{base_url}month/{ym}.html" 
-        data_links.append((ym, url))
-        
-
-    print(f"共生成 {len(data_links)} 个月份的天气链接")
-
-    all_data = []
-    for ym, link in data_links:
-        print(f"抓取 {ym} 月数据: {link}")
-        try:
-            driver.get(link)
-            # 等待天气表格加载完成
-            WebDriverWait(driver, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "table.weather-table"))
-            )
-            
-            # 解析页面内容
-            soup = BeautifulSoup(driver.page_source, "lxml")
-            table = soup.find("table", class_="weather-table")
-            
-            if not table:
-                print(f"警告：{link} 页面未找到天气表格")
+    return webdriver.Chrome(options=options)
+
+
+def fetch_with_browser(driver, link):
+    """回退路径：用浏览器渲染页面后再提取表格"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    driver.get(link)
+    # 等待天气表格加载完成
+    WebDriverWait(driver, TIMEOUT).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, "table.weather-table"))
+    )
+    return driver.page_source
+
+
+def main(cities=("dalian",), start="202501", end="202506", base_url=BASE_URL,
+         rate=RATE, concurrency=CONCURRENCY, retries=RETRIES, cache_dir=CACHE_DIR,
+         store_dir=STORE_DIR):
+    months = month_range(start, end)
+    jobs = [(city, ym, month_url(base_url, city, ym)) for city in cities for ym in months]
+    print(f"共生成 {len(cities)} 个城市、{len(months)} 个月份，合计 {len(jobs)} 个抓取任务")
+
+    # 已完整抓取过的历史月份直接读缓存，不再发请求；分区缺失时从缓存补写
+    status = {}
+    pending = []
+    with step("读取缓存页面") as s:
+        for city, ym, url in jobs:
+            html = load_cached_page(city, ym, cache_dir)
+            rows = parse_weather_table(html) if html else None
+            if not rows:
+                pending.append((city, ym, url))
                 continue
-                
-            # 处理表格数据
-            rows = []
-            for tr in table.find_all("tr")[1:]:  # 跳过表头行
-                tds = tr.find_all("td")
-                if len(tds) < 4:  # 确保有足够的数据列
-                    continue
-                
-                # 提取日期、天气状况、气温、风力风向
-                date = tds[0].get_text().strip()
-                weather = tds[1].get_text().strip().replace("\n", "").replace(" ", "")
-                temp = tds[2].get_text().strip().replace("\n", "").replace(" ", "")
-                wind = tds[3].get_text().strip().replace("\n", "").replace(" ", "")
-                
-                rows.append([date, weather, temp, wind])
-            
-            # 转换为DataFrame
-            df = pd.DataFrame(rows, columns=["日期", "天气状况", "气温", "风力风向"])
-            df["月份"] = ym
-            all_data.append(df)
-            
-            print(f"成功抓取 {len(rows)} 条数据")
-            time.sleep(1)  # 避免请求过快
-            
+            if not os.path.exists(partition_path(city, ym, store_dir)):
+                write_partition(rows_to_frame(rows, ym, city), city, ym, store_dir)
+            status[(city, ym)] = job_status("cached", rows=len(rows))
+        s["rows"] = sum(st["条数"] for st in status.values())
+    print(f"缓存命中 {len(status)} 个任务，需要抓取 {len(pending)} 个任务")
+
+    # 先用HTTP直接抓取原始HTML，表格是静态内容，不需要浏览器
+    if pending:
+        started = time.monotonic()
+        with step("HTTP抓取") as s:
+            fetched = asyncio.run(run_jobs(pending, rate, concurrency, retries,
+                                           cache_dir=cache_dir, store_dir=store_dir))
+            s["rows"] = sum(st["条数"] for st in fetched.values())
+        status.update(fetched)
+        print(f"HTTP抓取 {len(pending)} 个任务用时 {time.monotonic() - started:.1f} 秒")
+
+    # 原始HTML中没有表格的页面才交给浏览器逐页处理
+    fallback = [(city, ym, url) for city, ym, url in pending if status[(city, ym)]["状态"] == "no_table"]
+    if fallback:
+        print(f"{len(fallback)} 个页面未在原始HTML中找到天气表格，改用浏览器抓取")
+        try:
+            with step("启动浏览器"):
+                driver = create_driver()
         except Exception as e:
-            print(f"抓取 {link} 失败: {str(e)}")
+            print(f"浏览器启动失败，跳过这些页面: {str(e)}")
+            fallback = []
+            driver = None
+        try:
+            for city, ym, url in fallback:
+                print(f"抓取 {city} {ym} 月数据: {url}")
+                started = time.monotonic()
+                try:
+                    with step("浏览器加载页面") as s:
+                        html = fetch_with_browser(driver, url)
+                        rows = parse_weather_table(html)
+                        s["rows"] = len(rows or [])
+                    if rows is None:
+                        print(f"警告：{url} 页面未找到天气表格")
+                        continue
+                    if rows:
+                        save_cached_page(city, ym, html, cache_dir)
+                        write_partition(rows_to_frame(rows, ym, city), city, ym, store_dir)
+                    status[(city, ym)] = job_status("browser", 1, started, rows=len(rows))
+                    print(f"成功抓取 {len(rows)} 条数据")
+                except Exception as e:
+                    print(f"抓取 {url} 失败: {str(e)}")
+                    status[(city, ym)] = job_status("failed", 1, started, error=str(e))
+        finally:
+            if driver is not None:
+                driver.quit()
 
-    driver.quit()
+    # 每个任务的状态写入报告，失败的任务下次运行会自动重新抓取
+    report = pd.DataFrame(
+        [{"城市": city, "月份": ym, **status[(city, ym)]} for city, ym, _ in jobs]
+    )
+    report.to_csv(STATUS_FILE, index=False, encoding="utf-8-sig")
+    print(report.groupby(["城市", "状态"]).size().unstack(fill_value=0).to_string())
+    failed = report[~report["状态"].isin(["ok", "cached", "browser"])]
+    if not failed.empty:
+        print(f"{len(failed)} 个任务未取得数据，下次运行会自动重新抓取，详见 {STATUS_FILE}")
+
+    # 每个月份在解析后已立即写入分区，这里只汇总
+    for city, counts in report.groupby("城市", sort=False)["条数"]:
+        if counts.sum():
+            print(f"{city} 数据已保存到 {os.path.join(store_dir, city)}，合计 {counts.sum()} 条记录")
+        else:
+            print(f"{city} 未抓取到任何数据")
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="抓取历史天气数据")
+    parser.add_argument("--cities", nargs="+", default=["dalian"],
+                        help="城市拼音，例如 dalian beijing")
+    parser.add_argument("--start", default="202501", help="起始月份 YYYYMM")
+    parser.add_argument("--end", default="202506", help="结束月份 YYYYMM（含）")
+    parser.add_argument("--base-url", default=BASE_URL,
+                        help="历史天气页面的根地址，可指向本地保存页面的测试服务器")
+    parser.add_argument("--rate", type=float, default=RATE,
+                        help="每个站点每秒允许的请求数")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="同时进行的HTTP请求数")
+    parser.add_argument("--retries", type=int, default=RETRIES,
+                        help="请求失败后的重试次数")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help="原始页面缓存目录")
+    parser.add_argument("--store-dir", default=STORE_DIR,
+                        help="按 城市/年/月 分区保存抓取结果的目录")
+    parser.add_argument("--profile", action="store_true",
+                        help="记录各步骤的用时和内存，写出JSON报告")
+    args = parser.parse_args(argv)
+    profiling.enable("data_pull", args.profile)
+    main(args.cities, args.start, args.end, args.base_url,
+         args.rate, args.concurrency, args.retries, args.cache_dir, args.store_dir)
 
-    # 合并并保存数据
-    if all_data:
-        result = pd.concat(all_data, ignore_index=True)
-        # result.to_csv("dalian_weather_2022_2024.csv", index=False, encoding="utf-8")
-        result.to_csv("dalian_weather_2025_1_6.csv", index=False, encoding="utf-8")
-        print(f"数据已保存，合计 {len(result)} 条记录")
-    else:
-        print("未抓取到任何数据")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
\ No newline at end of file
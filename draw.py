@@ -1,389 +1,565 @@
 import pandas as pd
 import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import hashlib
+import inspect
+import json
 import os
+from weather_types import weather_colors
+from tables import table_path, read_table
+from climatology import ClimatologyCube, CLIMATOLOGY_FILE
+import profiling
+from profiling import step
+
+# 绘制的城市，读取时按城市筛选
+CITY = 'dalian'
+WIND_CHART_DIR = '.'
+WEATHER_CHART_DIR = 'monthly_weather_charts'
+RENDER_MANIFEST = 'render_manifest.json'
+STYLE = 'seaborn-v0_8-darkgrid'  # 使用更美观的主题
+FONT_SETTINGS = {
+    'font.sans-serif': ['Microsoft YaHei', 'SimHei'],  # 更好的中文字体支持
+    'axes.unicode_minus': False,
+}
+
+# 每张图是一个独立的任务 (绘图函数, 参数)，可以在进程池中并行渲染。
+# 绘图函数只依赖传入的数据，使用非交互的Agg后端，串行与并行生成的文件完全相同。
+# 每张图的指纹记录在 render_manifest.json 中，数据切片和样式都没有变化的图不再重新渲染。
+
+
+def setup_style():
+    """设置后端和全局样式，串行运行时调用一次，并行时在每个工作进程启动时调用"""
+    matplotlib.use('Agg')
+    plt.style.use(STYLE)
+    plt.rcParams.update(FONT_SETTINGS)
+
+
+def wind_level_key(level):
+    """风力等级排序键，'3-4级' 和 '3级' 都按3排序，相同时再按名称排序，保证顺序（和颜色）不随运行变化"""
+    return int(level.rstrip('级').split('-')[0]), level
 
-# 设置全局样式
-plt.style.use('seaborn-v0_8-darkgrid')  # 使用更美观的主题
-plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei']  # 更好的中文字体支持
-plt.rcParams['axes.unicode_minus'] = False
 
-# 读取月平均气温数据
-monthly_avg = pd.read_csv('monthly_avg_temp.csv', encoding='utf-8')
+def period_text(months):
+    return f"{months.min():%Y-%m} 至 {months.max():%Y-%m}"
+
+
+def load_tables(city=CITY):
+    """读取绘图需要的三张统计表，只取用到的列和指定城市的行"""
+    city_filter = [('城市', '==', city)]
+    monthly_avg = read_table(table_path('monthly'),
+                             columns=['月份', '平均气温', '平均最高气温', '平均最低气温'],
+                             filters=city_filter)
+    wind_count = read_table(table_path('wind'), columns=['月份', '风力等级', '天数'], filters=city_filter)
+    weather_count = read_table(table_path('weather'), columns=['月份', '天气类型', '天数'], filters=city_filter)
+    return monthly_avg, wind_count, weather_count
+
 
 # ========== 近三年月平均气温变化图 ==========
-plt.figure(figsize=(14, 7), facecolor='#f8f9fa')  # 添加浅色背景
-ax = plt.gca()
-ax.set_facecolor('#f0f2f6')  # 设置坐标区背景色
-
-# 绘制折线图
-plt.plot(monthly_avg['月份'], monthly_avg['平均气温'], 
-         marker='o', markersize=8, markerfacecolor='white', markeredgewidth=2,
-         color='#2c7bb6', linewidth=3, alpha=0.9, label='月平均气温')
-
-# 美化标题和标签
-plt.title('近三年月平均气温变化趋势', fontsize=22, pad=20, fontweight='bold')
-plt.xlabel('月份', fontsize=16, labelpad=12)
-plt.ylabel('平均气温 (℃)', fontsize=16, labelpad=12)
-
-# 坐标轴美化
-plt.xticks(rotation=45, fontsize=13)
-plt.yticks(fontsize=13)
-ax.xaxis.set_minor_locator(MultipleLocator(1))  # 添加次要刻度
-ax.yaxis.set_minor_locator(MultipleLocator(1))
-ax.tick_params(axis='both', which='both', length=6, width=1.5)
-
-# 网格和边框处理
-ax.grid(which='major', linestyle='-', linewidth=1.2, alpha=0.7)
-ax.grid(which='minor', linestyle=':', linewidth=0.8, alpha=0.4)
-for spine in ax.spines.values():
-    spine.set_visible(True)
-    spine.set_linewidth(1.8)
-    spine.set_color('#333333')
-
-# 添加数据标签
-for i, temp in enumerate(monthly_avg['平均气温']):
-    plt.annotate(f'{temp:.1f}℃', 
-                 (monthly_avg['月份'][i], temp),
-                 textcoords="offset points", 
-                 xytext=(0,10), 
-                 ha='center', 
-                 fontsize=11,
-                 color='#2c5a82')
-
-# 图例和布局
-plt.legend(fontsize=14, loc='best', frameon=True, shadow=True)
-plt.tight_layout(pad=3.0)
-plt.savefig('monthly_avg_temp_trend.png', dpi=300, bbox_inches='tight')
+def plot_monthly_trend(monthly_avg, path):
+    month_labels = monthly_avg['月份'].dt.strftime('%Y-%m')
 
-# ========== 一年中气温变化趋势图 ==========
-monthly_avg['月'] = monthly_avg['月份'].str[5:7].astype(int)
-avg_by_month = monthly_avg.groupby('月').agg({
-    '平均最高气温': 'mean',
-    '平均最低气温': 'mean'
-}).reset_index()
-avg_by_month = avg_by_month.sort_values('月')
-
-plt.figure(figsize=(12, 6.5), facecolor='#f8f9fa')
-ax = plt.gca()
-ax.set_facecolor('#f0f2f6')
-
-# 绘制高低气温区间填充
-plt.fill_between(avg_by_month['月'], 
-                 avg_by_month['平均最低气温'], 
-                 avg_by_month['平均最高气温'], 
-                 color='#d1e5f0', alpha=0.8, label='温度区间')
-
-# 绘制高低气温线
-plt.plot(avg_by_month['月'], avg_by_month['平均最高气温'], 
-         marker='^', markersize=10, markerfacecolor='white', markeredgewidth=2,
-         color='#d7191c', linewidth=3, alpha=0.9, label='平均最高气温')
-plt.plot(avg_by_month['月'], avg_by_month['平均最低气温'], 
-         marker='v', markersize=10, markerfacecolor='white', markeredgewidth=2,
-         color='#2c7bb6', linewidth=3, alpha=0.9, label='平均最低气温')
-
-# 美化标题和标签
-plt.title('一年中气温变化趋势（近三年平均）', fontsize=22, pad=20, fontweight='bold')
-plt.xlabel('月份', fontsize=16, labelpad=12)
-plt.ylabel('气温 (℃)', fontsize=16, labelpad=12)
-
-# 坐标轴美化
-plt.xticks(avg_by_month['月'], [f"{m}月" for m in avg_by_month['月']], fontsize=13)
-plt.yticks(fontsize=13)
-ax.xaxis.set_minor_locator(MultipleLocator(0.5))
-ax.yaxis.set_minor_locator(MultipleLocator(1))
-ax.tick_params(axis='both', which='both', length=6, width=1.5)
-
-# 网格和边框处理
-ax.grid(which='major', linestyle='-', linewidth=1.2, alpha=0.7)
-ax.grid(which='minor', linestyle=':', linewidth=0.8, alpha=0.4)
-for spine in ax.spines.values():
-    spine.set_visible(True)
-    spine.set_linewidth(1.8)
-    spine.set_color('#333333')
-
-# 添加数据标签
-for i, row in avg_by_month.iterrows():
-    plt.annotate(f'{row["平均最高气温"]:.1f}℃', 
-                 (row['月'], row['平均最高气温']), 
-                 textcoords="offset points", 
-                 xytext=(0,10), 
-                 ha='center', 
-                 fontsize=11,
-                 color='#a50f15')
-    plt.annotate(f'{row["平均最低气温"]:.1f}℃', 
-                 (row['月'], row['平均最低气温']), 
-                 textcoords="offset points", 
-                 xytext=(0,-15), 
-                 ha='center', 
-                 fontsize=11,
-                 color='#1a4f72')
-
-# 图例和布局
-plt.legend(fontsize=14, loc='best', frameon=True, shadow=True)
-plt.tight_layout(pad=3.0)
-plt.savefig('yearly_month_high_low_temp_trend.png', dpi=300, bbox_inches='tight')
+    plt.figure(figsize=(14, 7), facecolor='#f8f9fa')  # 添加浅色背景
+    ax = plt.gca()
+    ax.set_facecolor('#f0f2f6')  # 设置坐标区背景色
 
-# ========== 风力等级分布饼图 ==========
-plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei']  # 更好的中文字体支持
-plt.rcParams['axes.unicode_minus'] = False
-
-# 读取风力等级统计数据
-wind_count = pd.read_csv('monthly_wind_level_days.csv', encoding='utf-8')
-
-# 提取月份数字
-wind_count['月'] = wind_count['月份'].str[5:7].astype(int)
-
-# 按风力等级和月份统计三年平均天数
-avg_wind = wind_count.groupby(['月', '风力等级'])['天数'].mean().reset_index()
-
-# 获取所有唯一的风力等级并排序
-all_wind_levels = sorted(avg_wind['风力等级'].unique(), key=lambda x: int(x.split('-')[0]) if '-' in x else int(x))
-
-# 创建风力等级到颜色的映射
-# 使用从浅蓝到深红的渐变表示风力强度
-colors = plt.cm.YlGnBu(np.linspace(0.2, 0.8, len(all_wind_levels)))
-color_map = {level: colors[i] for i, level in enumerate(all_wind_levels)}
-
-# 创建12个月份的图表
-for m in range(1, 13):
-    month_data = avg_wind[avg_wind['月'] == m].sort_values('天数', ascending=False)
-    
-    # 如果当月没有数据，跳过
-    if month_data.empty:
-        print(f"警告: {m}月没有数据，跳过")
-        continue
-        
-    # 创建图表和子图
-    fig, ax = plt.subplots(figsize=(10, 8), facecolor='#f8f9fa')
-    fig.subplots_adjust(top=0.85)
-    
-    # 设置背景
-    ax.set_facecolor('#f0f2f6')
-    
-    # 计算爆炸效果 - 突出显示最大部分
-    max_index = month_data['天数'].idxmax()
-    explode = [0.05 if i == max_index else 0 for i in month_data.index]
-    
-    # 获取颜色
-    colors = [color_map[lvl] for lvl in month_data['风力等级']]
-    
-    # 绘制饼图
-    wedges, texts, autotexts = ax.pie(
-        month_data['天数'],
-        labels=month_data['风力等级'],
-        autopct=lambda pct: f'{pct:.1f}%' if pct > 5 else '',  # 小百分比不显示标签
-        startangle=90,
-        counterclock=False,
-        colors=colors,
-        explode=explode,
-        wedgeprops={
-            'edgecolor': 'white',
-            'linewidth': 2,
-            'linestyle': '-',
-            'alpha': 0.95
-        },
-        textprops={
-            'fontsize': 12,
-            'color': '#333333',
-            'fontweight': 'bold'
-        },
-        pctdistance=0.85,
-        labeldistance=1.05
-    )
-    
-    # 美化百分比文本
-    for autotext in autotexts:
-        autotext.set_color('white')
-        autotext.set_fontsize(11)
-        autotext.set_fontweight('bold')
-    
-    # 添加中心圆，创建环形图效果
-    centre_circle = plt.Circle((0,0), 0.70, fc='white', edgecolor='#e0e0e0', linewidth=1.5)
-    ax.add_artist(centre_circle)
-    
-    # 添加标题和副标题
-    plt.title(f'{m}月风力等级分布', fontsize=22, fontweight='bold', pad=20)
-    plt.suptitle('近三年不同等级风力平均出现天数占比', fontsize=16, y=0.95, color='#555555')
-    
-    # 添加图例
-    total_days = month_data['天数'].sum()
-    legend_labels = [f"{lvl}级风: {days:.1f}天 ({days/total_days*100:.1f}%)" 
-                    for lvl, days in zip(month_data['风力等级'], month_data['天数'])]
-    
-    plt.legend(wedges, legend_labels,
-              title="风力等级说明",
-              loc="center left",
-              bbox_to_anchor=(1, 0.5),
-              fontsize=11,
-              frameon=True,
-              framealpha=0.9,
-              edgecolor='#cccccc',
-              shadow=True)
-    
-    # 添加脚注
-    plt.figtext(0.5, 0.01, f"数据统计周期: {wind_count['月份'].min()} 至 {wind_count['月份'].max()}", 
-               ha="center", fontsize=10, color='#777777')
-    
-    # 添加风力等级说明
-    plt.figtext(0.5, 0.06, "注: 颜色从浅到深表示风力强度增强", 
-               ha="center", fontsize=9, color='#555555', style='italic')
-    
-    # 保存和关闭
-    plt.tight_layout(rect=[0, 0.05, 1, 0.95])  # 为脚注留出空间
-    plt.savefig(f'wind_level_pie_{m:02d}.png', dpi=600, bbox_inches='tight', facecolor=fig.get_facecolor())
+    # 绘制折线图
+    plt.plot(month_labels, monthly_avg['平均气温'], 
+             marker='o', markersize=8, markerfacecolor='white', markeredgewidth=2,
+             color='#2c7bb6', linewidth=3, alpha=0.9, label='月平均气温')
+
+    # 美化标题和标签
+    plt.title('近三年月平均气温变化趋势', fontsize=22, pad=20, fontweight='bold')
+    plt.xlabel('月份', fontsize=16, labelpad=12)
+    plt.ylabel('平均气温 (℃)', fontsize=16, labelpad=12)
+
+    # 坐标轴美化
+    plt.xticks(rotation=45, fontsize=13)
+    plt.yticks(fontsize=13)
+    ax.xaxis.set_minor_locator(MultipleLocator(1))  # 添加次要刻度
+    ax.yaxis.set_minor_locator(MultipleLocator(1))
+    ax.tick_params(axis='both', which='both', length=6, width=1.5)
+
+    # 网格和边框处理
+    ax.grid(which='major', linestyle='-', linewidth=1.2, alpha=0.7)
+    ax.grid(which='minor', linestyle=':', linewidth=0.8, alpha=0.4)
+    for spine in ax.spines.values():
+        spine.set_visible(True)
+        spine.set_linewidth(1.8)
+        spine.set_color('#333333')
+
+    # 添加数据标签
+    for i, temp in enumerate(monthly_avg['平均气温']):
+        plt.annotate(f'{temp:.1f}℃', 
+                     (month_labels[i], temp),
+                     textcoords="offset points", 
+                     xytext=(0,10), 
+                     ha='center', 
+                     fontsize=11,
+                     color='#2c5a82')
+
+    # 图例和布局
+    plt.legend(fontsize=14, loc='best', frameon=True, shadow=True)
+    plt.tight_layout(pad=3.0)
+    with step('保存图片'):
+        plt.savefig(path, dpi=300, bbox_inches='tight')
     plt.close()
 
-# ========== 天气状况分布柱状图 ==========
-plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei']  # 更好的中文字体支持
-plt.rcParams['axes.unicode_minus'] = False
-
-# 读取数据
-weather_count = pd.read_csv('monthly_weather_days.csv', encoding='utf-8')
-
-# 提取月份数字
-weather_count['月'] = weather_count['月份'].str[5:7].astype(int)
-
-# 按天气类型和月份统计三年平均天数
-avg_weather = (
-    weather_count.groupby(['月', '天气类型'])['天数'].sum()
-    .reset_index()
-)
-avg_weather['天数'] = (avg_weather['天数'] / 3).round(2)
-
-
-# 创建输出目录
-output_dir = 'monthly_weather_charts'
-os.makedirs(output_dir, exist_ok=True)
-
-# 设置天气类型对应的专业配色
-weather_colors = {
-    # 晴天相关
-    '晴': '#FFD700',        # 金色
-    
-    # 多云/阴天相关
-    '多云': '#A9A9A9',      # 深灰色
-    '阴': '#778899',        # 浅灰色
-    
-    # 雨天相关（从浅到深）
-    '小雨': '#87CEEB',      # 浅蓝色
-    '小到中雨': '#5F9EA0',  # 卡其蓝
-    '中雨': '#1E90FF',      # 道奇蓝
-    '中到大雨': '#4169E1',  # 皇家蓝
-    '大雨': '#0000CD',      # 中蓝色
-    '大到暴雨': '#00008B',   # 深蓝色
-    '暴雨': '#191970',      # 午夜蓝
-    '大暴雨': '#000033',    # 极深蓝
-    
-    # 阵雨相关
-    '阵雨': '#6495ED',      # 矢车菊蓝
-    '雷阵雨': '#483D8B',    # 深板岩蓝
-    
-    # 雪天相关（从浅到深）
-    '小雪': '#F0F8FF',      # 爱丽丝蓝
-    '小到中雪': '#B0E0E6',  # 粉蓝
-    '中雪': '#ADD8E6',      # 浅蓝
-    '中到大雪': '#87CEEB',  # 天蓝
-    '大雪': '#4682B4',      # 钢蓝
-    
-    # 混合天气
-    '雨夹雪': '#B0C4DE'     # 亮钢蓝
-}
 
-# 创建12个月份的图表
-for month in range(1, 13):
-    # 获取当月数据
-    month_data = avg_weather[avg_weather['月'] == month]
-    
-    # 过滤掉天数为0的天气类型
-    month_data = month_data[month_data['天数'] > 0]
-    
-    # 如果当月没有数据，跳过
-    if month_data.empty:
-        print(f"警告: {month}月没有天气数据，跳过")
-        continue
-    
-    # 按天数降序排序
-    month_data = month_data.sort_values('天数', ascending=False)
-    
-    # 创建图表 - 增加高度以适应垂直柱形图
-    fig, ax = plt.subplots(figsize=(12, 10), facecolor='#f8f9fa')  # 增加高度到10
-    fig.subplots_adjust(top=0.92, bottom=0.22, left=0.1, right=0.95)  # 调整底部边距
-    
-    # 设置背景
+# ========== 一年中气温变化趋势图 ==========
+def plot_yearly_trend(avg_by_month, path):
+    plt.figure(figsize=(12, 6.5), facecolor='#f8f9fa')
+    ax = plt.gca()
     ax.set_facecolor('#f0f2f6')
-    
-    # 获取天气类型和天数
-    weather_types = month_data['天气类型'].tolist()
-    days = month_data['天数'].tolist()
-    
-    # 获取对应的颜色
-    colors = [weather_colors.get(wt, '#999999') for wt in weather_types]
-    
-    # 绘制垂直柱状图 (修改点1)
-    bars = ax.bar(
-        weather_types, 
-        days, 
-        width=0.7, 
-        color=colors,
-        edgecolor='white',
-        linewidth=1.5,
-        alpha=0.95,
-        zorder=3
-    )
-    
-    # 添加数据标签 (修改点2)
-    for bar in bars:
-        height = bar.get_height()
-        ax.text(
-            bar.get_x() + bar.get_width() / 2,
-            height + 0.05,  # 在柱子顶部上方显示
-            f'{height:.1f}天',
-            ha='center',
-            va='bottom',
-            fontsize=12,
-            fontweight='bold',
-            color='#333333'
-        )
-    
-    # 设置标题
-    plt.title(f'{month}月不同天气状况出现的平均天数（近三年）', 
-              fontsize=22, fontweight='bold', pad=20)
-    
-    # 设置坐标轴标签 (修改点3)
-    plt.ylabel('平均天数', fontsize=16, labelpad=12)
-    plt.xlabel('天气类型', fontsize=16, labelpad=12)
-    
-    # 设置y轴范围 (修改点4)
-    max_days = max(days) * 1.2  # 留出空间给标签
-    plt.ylim(0, max_days)
+
+    # 绘制高低气温区间填充
+    plt.fill_between(avg_by_month['月'], 
+                     avg_by_month['平均最低气温'], 
+                     avg_by_month['平均最高气温'], 
+                     color='#d1e5f0', alpha=0.8, label='温度区间')
+
+    # 绘制高低气温线
+    plt.plot(avg_by_month['月'], avg_by_month['平均最高气温'], 
+             marker='^', markersize=10, markerfacecolor='white', markeredgewidth=2,
+             color='#d7191c', linewidth=3, alpha=0.9, label='平均最高气温')
+    plt.plot(avg_by_month['月'], avg_by_month['平均最低气温'], 
+             marker='v', markersize=10, markerfacecolor='white', markeredgewidth=2,
+             color='#2c7bb6', linewidth=3, alpha=0.9, label='平均最低气温')
+
+    # 美化标题和标签
+    plt.title('一年中气温变化趋势（近三年平均）', fontsize=22, pad=20, fontweight='bold')
+    plt.xlabel('月份', fontsize=16, labelpad=12)
+    plt.ylabel('气温 (℃)', fontsize=16, labelpad=12)
+
+    # 坐标轴美化
+    plt.xticks(avg_by_month['月'], [f"{m}月" for m in avg_by_month['月']], fontsize=13)
     plt.yticks(fontsize=13)
-    
-    # 设置x轴标签旋转 (修改点5)
-    plt.xticks(rotation=30, ha='right', fontsize=14)
-    
-    # 添加网格 (修改点6)
-    ax.grid(axis='y', linestyle='--', linewidth=1.0, alpha=0.6)
-    ax.grid(axis='x', visible=False)
-    
-    # 美化边框
+    ax.xaxis.set_minor_locator(MultipleLocator(0.5))
+    ax.yaxis.set_minor_locator(MultipleLocator(1))
+    ax.tick_params(axis='both', which='both', length=6, width=1.5)
+
+    # 网格和边框处理
+    ax.grid(which='major', linestyle='-', linewidth=1.2, alpha=0.7)
+    ax.grid(which='minor', linestyle=':', linewidth=0.8, alpha=0.4)
     for spine in ax.spines.values():
         spine.set_visible(True)
         spine.set_linewidth(1.8)
         spine.set_color('#333333')
-    
-    # 添加数据来源和说明
-    source_text = f"数据统计周期: {weather_count['月份'].min()} 至 {weather_count['月份'].max()}"
-    note_text = f"注: 仅显示{month}月实际出现的天气类型"
-    
-    plt.figtext(0.5, 0.03, f"{source_text} | {note_text}", 
-               ha="center", fontsize=12, color='#666666')
-    
-    # 保存图像
-    plt.tight_layout(rect=[0, 0.05, 1, 0.95])
-    filename = os.path.join(output_dir, f'month_{month:02d}_weather_chart.png')
-    plt.savefig(filename, dpi=300, bbox_inches='tight', facecolor=fig.get_facecolor())
+
+    # 添加数据标签
+    for i, row in avg_by_month.iterrows():
+        plt.annotate(f'{row["平均最高气温"]:.1f}℃', 
+                     (row['月'], row['平均最高气温']), 
+                     textcoords="offset points", 
+                     xytext=(0,10), 
+                     ha='center', 
+                     fontsize=11,
+                     color='#a50f15')
+        plt.annotate(f'{row["平均最低气温"]:.1f}℃', 
+                     (row['月'], row['平均最低气温']), 
+                     textcoords="offset points", 
+                     xytext=(0,-15), 
+                     ha='center', 
+                     fontsize=11,
+                     color='#1a4f72')
+
+    # 图例和布局
+    plt.legend(fontsize=14, loc='best', frameon=True, shadow=True)
+    plt.tight_layout(pad=3.0)
+    with step('保存图片'):
+        plt.savefig(path, dpi=300, bbox_inches='tight')
     plt.close()
 
-print("所有图表生成完成！")
\ No newline at end of file
+
+# ========== 风力等级分布饼图 ==========
+class WindPieTemplate:
+    """风力等级环形图模板：图表、背景、中心圆、副标题和说明只创建一次，每个月只替换饼图、标题、图例和脚注"""
+
+    def __init__(self):
+        # 创建图表和子图
+        self.fig, self.ax = plt.subplots(figsize=(10, 8), facecolor='#f8f9fa')
+        self.fig.subplots_adjust(top=0.85)
+        self.layout = vars(self.fig.subplotpars).copy()
+
+        # 设置背景
+        self.ax.set_facecolor('#f0f2f6')
+
+        # 添加中心圆，创建环形图效果（画在扇形之上、文字之下）
+        centre_circle = plt.Circle((0,0), 0.70, fc='white', edgecolor='#e0e0e0', linewidth=1.5, zorder=2)
+        self.ax.add_artist(centre_circle)
+
+        # 添加标题和副标题
+        self.title = self.ax.set_title('', fontsize=22, fontweight='bold', pad=20)
+        self.fig.suptitle('近三年不同等级风力平均出现天数占比', fontsize=16, y=0.95, color='#555555')
+
+        # 添加脚注
+        self.footer = self.fig.text(0.5, 0.01, '', ha="center", fontsize=10, color='#777777')
+
+        # 添加风力等级说明
+        self.fig.text(0.5, 0.06, "注: 颜色从浅到深表示风力强度增强", 
+                      ha="center", fontsize=9, color='#555555', style='italic')
+        self.artists = []
+
+    def draw(self, m, month_data, color_map, period, path):
+        # 恢复初始布局，tight_layout 的结果不受上一个月的影响
+        self.fig.subplots_adjust(**self.layout)
+        for artist in self.artists:
+            artist.remove()
+
+        # 计算爆炸效果 - 突出显示最大部分
+        max_index = month_data['天数'].idxmax()
+        explode = [0.05 if i == max_index else 0 for i in month_data.index]
+
+        # 获取颜色
+        colors = [color_map[lvl] for lvl in month_data['风力等级']]
+
+        # 绘制饼图
+        wedges, texts, autotexts = self.ax.pie(
+            month_data['天数'],
+            labels=month_data['风力等级'],
+            autopct=lambda pct: f'{pct:.1f}%' if pct > 5 else '',  # 小百分比不显示标签
+            startangle=90,
+            counterclock=False,
+            colors=colors,
+            explode=explode,
+            wedgeprops={
+                'edgecolor': 'white',
+                'linewidth': 2,
+                'linestyle': '-',
+                'alpha': 0.95
+            },
+            textprops={
+                'fontsize': 12,
+                'color': '#333333',
+                'fontweight': 'bold'
+            },
+            pctdistance=0.85,
+            labeldistance=1.05
+        )
+        self.artists = [*wedges, *texts, *autotexts]
+
+        # 美化百分比文本
+        for autotext in autotexts:
+            autotext.set_color('white')
+            autotext.set_fontsize(11)
+            autotext.set_fontweight('bold')
+
+        self.title.set_text(f'{m}月风力等级分布')
+
+        # 添加图例（替换上一个月的图例）
+        total_days = month_data['天数'].sum()
+        legend_labels = [f"{lvl}级风: {days:.1f}天 ({days/total_days*100:.1f}%)" 
+                        for lvl, days in zip(month_data['风力等级'], month_data['天数'])]
+
+        self.ax.legend(wedges, legend_labels,
+                       title="风力等级说明",
+                       loc="center left",
+                       bbox_to_anchor=(1, 0.5),
+                       fontsize=11,
+                       frameon=True,
+                       framealpha=0.9,
+                       edgecolor='#cccccc',
+                       shadow=True)
+
+        self.footer.set_text(f"数据统计周期: {period}")
+
+        # 保存
+        self.fig.tight_layout(rect=[0, 0.05, 1, 0.95])  # 为脚注留出空间
+        with step('保存图片'):
+            self.fig.savefig(path, dpi=600, bbox_inches='tight', facecolor=self.fig.get_facecolor())
+
+
+# ========== 天气状况分布柱状图 ==========
+class WeatherBarTemplate:
+    """天气状况柱状图模板：图表、背景、坐标轴标签、网格和边框只创建一次，每个月只替换柱子、数据标签、刻度、标题和脚注"""
+
+    def __init__(self):
+        # 创建图表 - 增加高度以适应垂直柱形图
+        self.fig, self.ax = plt.subplots(figsize=(12, 10), facecolor='#f8f9fa')  # 增加高度到10
+        self.fig.subplots_adjust(top=0.92, bottom=0.22, left=0.1, right=0.95)  # 调整底部边距
+        self.layout = vars(self.fig.subplotpars).copy()
+        ax = self.ax
+
+        # 设置背景
+        ax.set_facecolor('#f0f2f6')
+
+        # 设置标题
+        self.title = ax.set_title('', fontsize=22, fontweight='bold', pad=20)
+
+        # 设置坐标轴标签
+        ax.set_ylabel('平均天数', fontsize=16, labelpad=12)
+        ax.set_xlabel('天气类型', fontsize=16, labelpad=12)
+        ax.tick_params(axis='y', labelsize=13)
+
+        # 添加网格
+        ax.grid(axis='y', linestyle='--', linewidth=1.0, alpha=0.6)
+        ax.grid(axis='x', visible=False)
+
+        # 美化边框
+        for spine in ax.spines.values():
+            spine.set_visible(True)
+            spine.set_linewidth(1.8)
+            spine.set_color('#333333')
+
+        # 添加数据来源和说明
+        self.footer = self.fig.text(0.5, 0.03, '', ha="center", fontsize=12, color='#666666')
+        self.artists = []
+
+    def draw(self, month, month_data, period, path):
+        ax = self.ax
+        self.fig.subplots_adjust(**self.layout)
+        for artist in self.artists:
+            artist.remove()
+
+        # 获取天气类型和天数
+        weather_types = month_data['天气类型'].tolist()
+        days = month_data['天数'].tolist()
+
+        # 获取对应的颜色
+        colors = [weather_colors.get(wt, '#999999') for wt in weather_types]
+
+        # 绘制垂直柱状图，用数字位置而不是分类坐标，各月的天气类型互不影响
+        positions = list(range(len(weather_types)))
+        bars = ax.bar(
+            positions, 
+            days, 
+            width=0.7, 
+            color=colors,
+            edgecolor='white',
+            linewidth=1.5,
+            alpha=0.95,
+            zorder=3
+        )
+        self.artists = list(bars)
+
+        # 添加数据标签
+        for bar in bars:
+            height = bar.get_height()
+            self.artists.append(ax.text(
+                bar.get_x() + bar.get_width() / 2,
+                height + 0.05,  # 在柱子顶部上方显示
+                f'{height:.1f}天',
+                ha='center',
+                va='bottom',
+                fontsize=12,
+                fontweight='bold',
+                color='#333333'
+            ))
+
+        self.title.set_text(f'{month}月不同天气状况出现的平均天数（近三年）')
+
+        # 按本月的柱子重新计算x轴范围，设置y轴范围
+        ax.relim()
+        ax.autoscale_view(scalex=True, scaley=False)
+        max_days = max(days) * 1.2  # 留出空间给标签
+        ax.set_ylim(0, max_days)
+
+        # 设置x轴标签旋转
+        ax.set_xticks(positions, weather_types, rotation=30, ha='right', fontsize=14)
+
+        source_text = f"数据统计周期: {period}"
+        note_text = f"注: 仅显示{month}月实际出现的天气类型"
+        self.footer.set_text(f"{source_text} | {note_text}")
+
+        # 保存图像
+        self.fig.tight_layout(rect=[0, 0.05, 1, 0.95])
+        with step('保存图片'):
+            self.fig.savefig(path, dpi=300, bbox_inches='tight', facecolor=self.fig.get_facecolor())
+
+
+# 每个进程中每种图表只创建一次模板
+_templates = {}
+
+
+def get_template(cls):
+    if cls not in _templates:
+        _templates[cls] = cls()
+    return _templates[cls]
+
+
+def plot_wind_pie(m, month_data, color_map, period, path):
+    get_template(WindPieTemplate).draw(m, month_data, color_map, period, path)
+
+
+def plot_weather_bar(month, month_data, period, path):
+    get_template(WeatherBarTemplate).draw(month, month_data, period, path)
+
+
+plot_wind_pie.template = WindPieTemplate
+plot_weather_bar.template = WeatherBarTemplate
+
+
+def build_jobs(monthly_avg, wind_count, weather_count, cube, city=CITY):
+    """整理每张图的数据，返回 [(绘图函数, 参数)] 任务列表
+
+    多年平均从气候立方体中查询，每个月按实际有数据的年数求平均。
+    """
+    jobs = [(plot_monthly_trend, {'monthly_avg': monthly_avg[['月份', '平均气温']],
+                                  'path': 'monthly_avg_temp_trend.png'})]
+
+    avg_by_month = pd.DataFrame({
+        '月': range(1, 13),
+        '平均最高气温': [cube.lookup(city, m, '气温', '平均最高气温')[0] for m in range(1, 13)],
+        '平均最低气温': [cube.lookup(city, m, '气温', '平均最低气温')[0] for m in range(1, 13)],
+    }).dropna()
+    jobs.append((plot_yearly_trend, {'avg_by_month': avg_by_month,
+                                     'path': 'yearly_month_high_low_temp_trend.png'}))
+
+    # 每个月各风力等级的多年平均天数
+    avg_wind = {m: cube.month_frame(city, m, '风力等级').rename(columns={'名称': '风力等级', '平均值': '天数'})
+                for m in range(1, 13)}
+
+    # 获取所有出现过的风力等级并排序
+    all_wind_levels = sorted({level for frame in avg_wind.values() for level in frame.loc[frame['天数'] > 0, '风力等级']},
+                             key=wind_level_key)
+
+    # 创建风力等级到颜色的映射
+    # 使用从浅蓝到深红的渐变表示风力强度
+    colors = plt.cm.YlGnBu(np.linspace(0.2, 0.8, len(all_wind_levels)))
+    color_map = {level: colors[i] for i, level in enumerate(all_wind_levels)}
+    wind_period = period_text(wind_count['月份'])
+
+    for m in range(1, 13):
+        month_data = avg_wind[m]
+        month_data = month_data[month_data['天数'] > 0][['风力等级', '天数']].sort_values('天数', ascending=False)
+        if month_data.empty:
+            print(f"警告: {m}月没有数据，跳过")
+            continue
+        jobs.append((plot_wind_pie, {'m': m, 'month_data': month_data, 'color_map': color_map,
+                                     'period': wind_period,
+                                     'path': os.path.join(WIND_CHART_DIR, f'wind_level_pie_{m:02d}.png')}))
+
+    weather_period = period_text(weather_count['月份'])
+
+    for month in range(1, 13):
+        # 每种天气类型的多年平均天数，过滤掉天数为0的天气类型
+        month_data = cube.month_frame(city, month, '天气类型').rename(columns={'名称': '天气类型', '平均值': '天数'})
+        month_data['天数'] = month_data['天数'].round(2)
+        month_data = month_data[month_data['天数'] > 0][['天气类型', '天数']]
+        if month_data.empty:
+            print(f"警告: {month}月没有天气数据，跳过")
+            continue
+        month_data = month_data.sort_values('天数', ascending=False)
+        jobs.append((plot_weather_bar, {'month': month, 'month_data': month_data, 'period': weather_period,
+                                        'path': os.path.join(WEATHER_CHART_DIR,
+                                                             f'month_{month:02d}_weather_chart.png')}))
+    return jobs
+
+
+def _feed(h, value):
+    """把一个绘图参数写入哈希，数据表按内容哈希"""
+    if isinstance(value, pd.DataFrame):
+        h.update(repr([(col, str(dtype)) for col, dtype in value.dtypes.items()]).encode('utf-8'))
+        h.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, dict):
+        for key in sorted(value, key=str):
+            h.update(repr(key).encode('utf-8'))
+            _feed(h, value[key])
+    elif isinstance(value, np.ndarray):
+        h.update(value.tobytes())
+    else:
+        h.update(repr(value).encode('utf-8'))
+
+
+def fingerprint(job):
+    """一张图的指纹：绘图函数及其模板的源码（包含DPI等设置）、全局样式、天气类型配色和这张图用到的数据切片"""
+    func, kwargs = job
+    h = hashlib.sha256()
+    h.update(inspect.getsource(func).encode('utf-8'))
+    if hasattr(func, 'template'):
+        h.update(inspect.getsource(func.template).encode('utf-8'))
+    h.update(repr((STYLE, FONT_SETTINGS, sorted(weather_colors.items()), matplotlib.__version__)).encode('utf-8'))
+    _feed(h, {key: value for key, value in kwargs.items() if key != 'path'})
+    return h.hexdigest()
+
+
+def load_manifest(path=RENDER_MANIFEST):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=RENDER_MANIFEST):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def stale_jobs(jobs, manifest):
+    """返回指纹有变化或文件不存在、需要重新渲染的任务及其指纹"""
+    stale = []
+    for job in jobs:
+        fp = fingerprint(job)
+        path = job[1]['path']
+        if manifest.get(path) != fp or not os.path.exists(path):
+            stale.append((job, fp))
+    return stale
+
+
+def run_job(job):
+    func, kwargs = job
+    # 进程池中渲染时各张图的记录留在工作进程里，报告中只有主进程的总用时和子进程CPU时间
+    with step(os.path.basename(kwargs['path'])):
+        func(**kwargs)
+    return kwargs['path']
+
+
+def render(jobs, workers=1):
+    """渲染全部图表，workers 为1时在当前进程中依次渲染，否则使用进程池"""
+    # 输出目录在渲染前才创建，build_jobs 只整理数据，不写文件
+    for directory in {os.path.dirname(kwargs['path']) for _, kwargs in jobs} - {''}:
+        os.makedirs(directory, exist_ok=True)
+    if workers <= 1:
+        setup_style()
+        return [run_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=setup_style) as pool:
+        return list(pool.map(run_job, jobs))
+
+
+def main(workers=1, city=CITY, force=False):
+    with step('读取统计表') as s:
+        monthly_avg, wind_count, weather_count = load_tables(city)
+        s['rows'] = len(monthly_avg) + len(wind_count) + len(weather_count)
+    # 用读到的统计表更新气候立方体，只有数据变化的月份会被重新合计
+    with step('更新气候立方体'):
+        cube = ClimatologyCube.load(CLIMATOLOGY_FILE)
+        if cube.update(monthly_avg.assign(城市=city), wind_count.assign(城市=city), weather_count.assign(城市=city)) \
+                or not os.path.exists(CLIMATOLOGY_FILE):
+            cube.save(CLIMATOLOGY_FILE)
+    with step('整理绘图数据') as s:
+        jobs = build_jobs(monthly_avg, wind_count, weather_count, cube, city)
+        manifest = {} if force else load_manifest()
+        stale = stale_jobs(jobs, manifest)
+        s['rows'] = len(jobs)
+    if not stale:
+        print(f"共 {len(jobs)} 张图表，数据和样式都没有变化，无需重新渲染")
+        return
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(stale))
+    with step('渲染图表', rows=len(stale)):
+        paths = render([job for job, _ in stale], workers)
+    # 渲染成功后才记录指纹，中途失败的图表下次会重新渲染
+    manifest.update({job[1]['path']: fp for job, fp in stale})
+    save_manifest(manifest)
+    print(f"所有图表生成完成！重新渲染 {len(paths)} 张，跳过未变化的 {len(jobs) - len(paths)} 张，使用 {workers} 个进程")
+
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="绘制天气统计图表")
+    parser.add_argument("--workers", type=int, default=1, help="并行渲染的进程数，0 表示使用全部CPU核心")
+    parser.add_argument("--city", default=CITY, help="绘制的城市")
+    parser.add_argument("--force", action="store_true", help="忽略指纹，重新渲染全部图表")
+    parser.add_argument("--profile", action="store_true", help="记录各步骤的用时和内存，写出JSON报告")
+    args = parser.parse_args(argv)
+    profiling.enable('draw', args.profile)
+    main(args.workers, args.city, args.force)
+
+
+if __name__ == "__main__":
+    cli()
\ No newline at end of file
@@ -0,0 +1,24 @@
+import pandas as pd
+
+# 原始字段解析：对整列一次性处理，结果与最初 analyse.py 中的逐行写法一致（逐行版本保留在
+# bench_fields.py 中作参照和校验）；天气类型的计数见 weather_types.py
+
+
+def split_temps(temp):
+    """把 '5℃/-3℃' 拆成最高气温、最低气温两列
+
+    与逐行的 extract_temps（bench_fields.py）相同：不是恰好两段或任意一段不是数字时，两列都为NaN。
+    """
+    parts = temp.str.replace('℃', '', regex=False).str.extract(r'^([^/]*)/([^/]*)\Z')
+    high = pd.to_numeric(parts[0].str.strip(), errors='coerce')
+    low = pd.to_numeric(parts[1].str.strip(), errors='coerce')
+    bad = high.isna() | low.isna()
+    return pd.DataFrame({
+        '最高气温': high.mask(bad).astype(float),
+        '最低气温': low.mask(bad).astype(float),
+    }, index=temp.index)
+
+
+def wind_levels(wind):
+    """提取风力等级，如 '北风3-4级/南风1-2级' 取第一个 '3-4级'，没有时为NaN"""
+    return wind.str.extract(r'(\d+-\d+级|\d+级)', expand=False)
\ No newline at end of file
@@ -1,221 +1,640 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib as mpl
-from statsmodels.tsa.statespace.sarimax import SARIMAX
-import matplotlib.dates as mdates
-
-# 设置全局样式
-plt.style.use('seaborn-whitegrid')
-mpl.rcParams['font.family'] = 'Microsoft YaHei'
-mpl.rcParams['axes.unicode_minus'] = False
-
-# 加载数据
-hist_data = pd.read_csv('monthly_avg_temp.csv')
-hist_data['日期'] = pd.to_datetime(hist_data['月份'], format='%Y-%m')
-hist_data.set_index('日期', inplace=True)
-
-new_data = pd.read_csv('2025_monthly_avg_temp.csv')
-new_data['日期'] = pd.to_datetime(new_data['月份'], format='%Y-%m')
-new_data.set_index('日期', inplace=True)
-
-# 准备训练数据
-train = hist_data['2022-01':'2024-12']['平均最高气温'].astype(float)
-
-# 训练模型
-model = SARIMAX(train, 
-                order=(1, 1, 1), 
-                seasonal_order=(1, 1, 1, 12),
-                enforce_stationarity=False,
-                enforce_invertibility=False)
-results = model.fit(disp=False)
-
-# 预测
-forecast = results.get_forecast(steps=6)
-pred_mean = forecast.predicted_mean
-pred_ci = forecast.conf_int()
-actual = new_data['2025-01':'2025-09']['平均最高气温']
-
-# 构造完整的月份索引
-all_months = pd.date_range('2023-01-01', '2025-07-01', freq='MS')
-
-# 补齐历史数据
-train_plot = train.copy()
-train_plot.index = pd.to_datetime(train_plot.index)
-train_plot = train_plot.reindex(all_months)
-
-# 补齐预测数据
-pred_mean_plot = pd.Series(np.nan, index=all_months)
-pred_mean_plot.loc[pred_mean.index] = pred_mean.values
-
-# 补齐真实数据
-actual_plot = pd.Series(np.nan, index=all_months)
-actual_plot.loc[actual.index] = actual.values
-
-# 绘图
-plt.figure(figsize=(12, 7), dpi=120)
-plt.title('2025年月度平均最高气温预测 vs 实际值', fontsize=20, fontweight='bold', pad=18)
-
-colors = ['#1f77b4', '#ff7f0e', '#2ca02c']
-
-train_plot.plot(
-    label='历史数据 (2023-2024)', 
-    color=colors[0], 
-    linewidth=2.5,
-    marker='o', 
-    markersize=7
-)
-
-pred_mean_plot.plot(
-    label='预测值 (2025)', 
-    color=colors[1], 
-    linewidth=2.5,
-    linestyle='--',
-    marker='s', 
-    markersize=7
-)
-
-actual_plot.plot(
-    label='真实值 (2025)', 
-    color=colors[2], 
-    linewidth=2.5,
-    marker='D', 
-    markersize=7
-)
-
-# 置信区间只在预测区间绘制
-if not pred_ci.empty:
-    plt.fill_between(
-        pred_ci.index, 
-        pred_ci.iloc[:, 0], 
-        pred_ci.iloc[:, 1], 
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+import warnings
+from tables import table_path, read_table, write_table
+import profiling
+from profiling import step
+
+# statsmodels 只在拟合模型时导入，matplotlib 只在绘图时导入，绘图样式在绘图之前才设置，导入本模块没有副作用
+
+CITY = 'dalian'
+METRIC = '平均最高气温'
+METRICS = ['平均气温', '平均最高气温', '平均最低气温']
+TRAIN_START = '2022-01-01'
+TRAIN_END = '2024-12-01'
+ORDER = (1, 1, 1)
+SEASONAL_ORDER = (1, 1, 1, 12)
+STEPS = 6
+
+# 拟合好的模型参数按 (训练数据, 模型设定) 的哈希保存在缓存目录中。训练数据没有变化时直接用缓存的参数
+# 重建结果（只做一次卡尔曼滤波，不再优化）；训练数据只是在末尾追加了几个月时，用之前模型的参数作为初始值重新拟合。
+MODEL_CACHE_DIR = 'model_cache'
+WARM_START_LOOKBACK = 12  # 往前最多找几个月的旧模型作为初始值
+
+FORECAST_COLUMNS = ['城市', '指标', '日期', '预测值', '下限', '上限', '模型']
+FORECAST_CHART_DIR = 'forecast_charts'
+
+
+def read_monthly(metrics, prefix='', start=None, end=None, cities=None, missing_ok=False):
+    """读取月平均气温表中的城市、月份和指定指标列，可按城市和月份范围筛选
+
+    missing_ok 为真时表不存在返回空表（用明确的数据来源运行 analyse.py 时不会写出 2025_ 表）。
+    """
+    path = table_path('monthly', prefix=prefix)
+    if missing_ok and not os.path.exists(path):
+        return pd.DataFrame({'城市': pd.Series(dtype=str), '月份': pd.Series(dtype='datetime64[ns]'),
+                             **{metric: pd.Series(dtype=float) for metric in metrics}})
+    filters = []
+    if cities:
+        filters.append(('城市', 'in', list(cities)))
+    if start:
+        filters.append(('月份', '>=', pd.Timestamp(start)))
+    if end:
+        filters.append(('月份', '<=', pd.Timestamp(end)))
+    return read_table(path, columns=['城市', '月份', *metrics],
+                      filters=filters or None)
+
+
+def monthly_series(df, city, metric):
+    """从 read_monthly 的结果中取出一个城市一个指标的序列，以日期为索引，频率为月初"""
+    data = df[df['城市'] == city].rename(columns={'月份': '日期'}).set_index('日期').sort_index()
+    return data[metric].asfreq('MS')
+
+
+def load_series(city=CITY, metric=METRIC):
+    """返回训练数据（2022-2024年）和2025年的实际值，加载时只读取用到的列和月份"""
+    hist_data = read_monthly([metric], start=TRAIN_START, end=TRAIN_END, cities=[city])
+    new_data = read_monthly([metric], prefix='2025_', cities=[city], missing_ok=True)
+
+    train = monthly_series(hist_data, city, metric).astype(float)
+    actual = monthly_series(new_data, city, metric)['2025-01':'2025-09']
+    return train, actual
+
+
+def spec_label(order=ORDER, seasonal_order=SEASONAL_ORDER):
+    p, d, q = order
+    P, D, Q, s = seasonal_order
+    return f'SARIMAX({p},{d},{q})({P},{D},{Q},{s})'
+
+
+def model_key(train, order=ORDER, seasonal_order=SEASONAL_ORDER):
+    """训练数据（含日期）和模型设定的哈希，作为缓存文件名"""
+    import statsmodels
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(train, index=True).values.tobytes())
+    h.update(repr((spec_label(order, seasonal_order), 'enforce=False', statsmodels.__version__)).encode('utf-8'))
+    return h.hexdigest()[:32]
+
+
+def model_path(train, order=ORDER, seasonal_order=SEASONAL_ORDER, cache_dir=MODEL_CACHE_DIR):
+    return os.path.join(cache_dir, f'{model_key(train, order, seasonal_order)}.json')
+
+
+def load_params(path):
+    with open(path, encoding='utf-8') as f:
+        return np.array(json.load(f)['params'])
+
+
+def save_params(results, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'params': results.params.tolist(),
+            'names': list(results.model.param_names),
+            'iterations': results.mle_retvals.get('iterations'),
+        }, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def warm_start_params(train, order=ORDER, seasonal_order=SEASONAL_ORDER, cache_dir=MODEL_CACHE_DIR):
+    """在缓存中找同一序列去掉最后几个月后拟合的模型，返回它的参数，找不到时返回None"""
+    for k in range(1, min(WARM_START_LOOKBACK, len(train) - 1) + 1):
+        path = model_path(train.iloc[:-k], order, seasonal_order, cache_dir)
+        if os.path.exists(path):
+            return load_params(path)
+    return None
+
+
+def fit_sarimax(train, order=ORDER, seasonal_order=SEASONAL_ORDER, cache_dir=MODEL_CACHE_DIR,
+                start_params=None):
+    """拟合SARIMAX模型，返回 (拟合结果, 来源)
+
+    来源为 '缓存'、'热启动' 或 '重新拟合'。cache_dir 为None时不读写缓存；
+    start_params 指定初始参数时不再到缓存中查找。
+    """
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+    model = SARIMAX(train, 
+                    order=order, 
+                    seasonal_order=seasonal_order,
+                    enforce_stationarity=False,
+                    enforce_invertibility=False)
+    path = None
+    if cache_dir is not None:
+        path = model_path(train, order, seasonal_order, cache_dir)
+        if os.path.exists(path):
+            return model.smooth(load_params(path)), '缓存'
+        if start_params is None:
+            start_params = warm_start_params(train, order, seasonal_order, cache_dir)
+
+    with step('拟合', rows=len(train)):
+        results = model.fit(start_params=start_params, disp=False)
+    if path is not None:
+        save_params(results, path)
+    return results, '热启动' if start_params is not None else '重新拟合'
+
+
+# ========== 阶数搜索 ==========
+# 在 (p,d,q)(P,D,Q,12) 网格上并行拟合候选模型，按AIC或BIC排序。每个拟合有超时：
+# 优化器每次迭代后检查耗时，超时就中止这个候选；不收敛或报错的候选记录原因，不影响其他候选。
+SEARCH_GRID = {
+    'p': (0, 1, 2), 'd': (0, 1), 'q': (0, 1, 2),
+    'P': (0, 1), 'D': (0, 1), 'Q': (0, 1),
+}
+FIT_TIMEOUT = 30  # 秒
+SEARCH_RESULT_FILE = 'order_search.csv'
+
+
+class FitTimeout(Exception):
+    pass
+
+
+def candidate_orders(grid=SEARCH_GRID, s=12):
+    """返回网格中全部 (order, seasonal_order) 组合"""
+    return [((p, d, q), (P, D, Q, s))
+            for p, d, q, P, D, Q in itertools.product(
+                grid['p'], grid['d'], grid['q'], grid['P'], grid['D'], grid['Q'])]
+
+
+def fit_candidate(train, order, seasonal_order, timeout=FIT_TIMEOUT):
+    """拟合一个候选模型，返回一行结果，失败、超时和不收敛都记录在结果中而不抛出异常"""
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+    from statsmodels.tools.sm_exceptions import ConvergenceWarning
+    started = time.perf_counter()
+
+    def check_timeout(params):
+        if time.perf_counter() - started > timeout:
+            raise FitTimeout(f'超过 {timeout} 秒')
+
+    row = {'模型': spec_label(order, seasonal_order), 'order': order, 'seasonal_order': seasonal_order,
+           'AIC': np.nan, 'BIC': np.nan, '对数似然': np.nan, '迭代次数': np.nan, '状态': '成功', '错误': ''}
+    try:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            model = SARIMAX(train, 
+                            order=order, 
+                            seasonal_order=seasonal_order,
+                            enforce_stationarity=False,
+                            enforce_invertibility=False)
+            results = model.fit(disp=False, callback=check_timeout)
+        row.update({'AIC': results.aic, 'BIC': results.bic, '对数似然': results.llf,
+                    '迭代次数': results.mle_retvals.get('iterations')})
+        if not results.mle_retvals.get('converged', True) or any(
+                issubclass(w.category, ConvergenceWarning) for w in caught):
+            row['状态'] = '未收敛'
+        elif not np.isfinite(results.aic):
+            row['状态'] = '失败'
+            row['错误'] = 'AIC不是有限值'
+    except FitTimeout as e:
+        row['状态'] = '超时'
+        row['错误'] = str(e)
+    except Exception as e:
+        row['状态'] = '失败'
+        row['错误'] = f'{type(e).__name__}: {e}'
+    row['耗时'] = round(time.perf_counter() - started, 3)
+    return row
+
+
+def _fit_candidate(args):
+    return fit_candidate(*args)
+
+
+def search_orders(train, candidates=None, workers=0, timeout=FIT_TIMEOUT, criterion='AIC'):
+    """并行拟合全部候选模型，返回按 criterion 从小到大排序的结果表
+
+    排在前面的是成功收敛的候选，其次是未收敛的，超时和失败的排在最后。workers 为0时使用全部CPU核心。
+    """
+    if candidates is None:
+        candidates = candidate_orders()
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    jobs = [(train, order, seasonal_order, timeout) for order, seasonal_order in candidates]
+    if workers == 1:
+        rows = [_fit_candidate(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(_fit_candidate, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+    table = pd.DataFrame(rows)
+    rank = table['状态'].map({'成功': 0, '未收敛': 1}).fillna(2)
+    table = (table.assign(_rank=rank)
+             .sort_values(['_rank', criterion, '模型'])
+             .drop(columns='_rank')
+             .reset_index(drop=True))
+    table.insert(0, '排名', np.arange(1, len(table) + 1))
+    return table
+
+
+def plot_series(train, pred_mean, actual):
+    """把历史、预测和实际值补齐到同一个月份索引上"""
+    # 构造完整的月份索引
+    all_months = pd.date_range('2023-01-01', '2025-07-01', freq='MS')
+
+    # 补齐历史数据
+    train_plot = train.copy()
+    train_plot.index = pd.to_datetime(train_plot.index)
+    train_plot = train_plot.reindex(all_months)
+
+    # 补齐预测数据
+    pred_mean_plot = pd.Series(np.nan, index=all_months)
+    pred_mean_plot.loc[pred_mean.index] = pred_mean.values
+
+    # 补齐真实数据
+    actual_plot = pd.Series(np.nan, index=all_months)
+    actual_plot.loc[actual.index] = actual.values
+    return all_months, train_plot, pred_mean_plot, actual_plot
+
+
+def plot_forecast(all_months, train_plot, pred_mean_plot, actual_plot, pred_ci, spec, metric=METRIC,
+                  path='temperature_forecast_chinese_main.png'):
+    import matplotlib.pyplot as plt
+    # 绘图
+    plt.figure(figsize=(12, 7), dpi=120)
+    plt.title(f'2025年月度{metric}预测 vs 实际值', fontsize=20, fontweight='bold', pad=18)
+
+    colors = ['#1f77b4', '#ff7f0e', '#2ca02c']
+
+    train_plot.plot(
+        label='历史数据 (2023-2024)', 
+        color=colors[0], 
+        linewidth=2.5,
+        marker='o', 
+        markersize=7
+    )
+
+    pred_mean_plot.plot(
+        label='预测值 (2025)', 
         color=colors[1], 
-        alpha=0.18,
-        label='95%置信区间'
+        linewidth=2.5,
+        linestyle='--',
+        marker='s', 
+        markersize=7
     )
 
-plt.ylabel('温度 (℃)', fontsize=14)
-plt.xlabel('月份', fontsize=14)
-plt.legend(loc='upper left', fontsize=12, frameon=True, framealpha=0.9)
-plt.xticks(all_months, [d.strftime('%Y-%m') for d in all_months], rotation=30, ha='right', fontsize=12)
-plt.yticks(fontsize=12)
-plt.grid(True, linestyle='--', alpha=0.7)
-plt.tight_layout(rect=[0, 0, 1, 0.97])
-
-plt.figtext(0.5, 0.01, 
-            '数据来源：2022-2025年月度气温数据 | SARIMAX(1,1,1)(1,1,1,12) | 置信水平：95%', 
-            ha='center', fontsize=11, color='#555555')
-
-# 标出预测值和真实值的数据点
-for i in range(len(all_months)):
-    month = all_months[i]
-    # 标注预测值
-    if not np.isnan(pred_mean_plot[month]):
-        plt.text(month, pred_mean_plot[month]+0.5, 
-                 f'{pred_mean_plot[month]:.2f}', 
-                 color=colors[1], fontsize=11, ha='center', va='bottom', fontweight='bold')
-    # 标注真实值
-    if not np.isnan(actual_plot[month]):
-        plt.text(month, actual_plot[month]-0.5, 
-                 f'{actual_plot[month]:.2f}', 
-                 color=colors[2], fontsize=11, ha='center', va='top', fontweight='bold')
-
-plt.savefig('temperature_forecast_chinese_main.png', dpi=300, bbox_inches='tight')
-plt.show()
-
-# =================================================================
-# 新增功能：从原始图中提取预测区间部分（2025年）
-# =================================================================
-# 创建新的图形，只显示预测区间部分
-plt.figure(figsize=(10, 6), dpi=120)
-plt.title('2025年月度平均最高气温预测', fontsize=18, fontweight='bold', pad=15)
-
-# 确定预测区间的时间范围
-forecast_start = pred_ci.index[0]
-forecast_end = pred_ci.index[-1]
-
-# 提取预测区间的数据
-pred_interval = pred_mean_plot.loc[forecast_start:forecast_end]
-actual_interval = actual_plot.loc[forecast_start:forecast_end]
-
-# 绘制预测区间
-
-
-# 绘制预测均值线
-pred_interval.plot(
-    color='#ff7f0e', 
-    linewidth=2.5,
-    linestyle='-',
-    marker='o', 
-    markersize=8,
-    label='预测均值'
-)
-
-plt.fill_between(
-    pred_ci.index, 
-    pred_ci.iloc[:, 0], 
-    pred_ci.iloc[:, 1], 
-    color='#1f77b4', 
-    alpha=0.18,
-    label='95% 预测区间'
-)
-
-# 绘制实际值（如果存在）
-if not actual_interval.isnull().all():
-    actual_interval.plot(
-        color='#2ca02c', 
+    actual_plot.plot(
+        label='真实值 (2025)', 
+        color=colors[2], 
         linewidth=2.5,
         marker='D', 
-        markersize=8,
-        label='实际值'
+        markersize=7
     )
 
-# 标注数据点
-for date in pred_ci.index:
-    # 标注预测值
-    if not np.isnan(pred_interval[date]):
-        plt.text(
-            date, 
-            pred_interval[date] + 0.3, 
-            f'{pred_interval[date]:.1f}℃', 
-            color='#ff7f0e', 
-            fontsize=11, 
-            ha='center', 
-            va='bottom', 
-            fontweight='bold',
-            bbox=dict(facecolor='white', alpha=0.7, edgecolor='none', boxstyle='round,pad=0.2')
+    # 置信区间只在预测区间绘制
+    if not pred_ci.empty:
+        plt.fill_between(
+            pred_ci.index, 
+            pred_ci.iloc[:, 0], 
+            pred_ci.iloc[:, 1], 
+            color=colors[1], 
+            alpha=0.18,
+            label='95%置信区间'
         )
-    
-    # 标注实际值（如果存在）
-    if not actual_interval.isnull().all() and not np.isnan(actual_interval[date]):
-        plt.text(
-            date, 
-            actual_interval[date] - 0.3, 
-            f'{actual_interval[date]:.1f}℃', 
+
+    plt.ylabel('温度 (℃)', fontsize=14)
+    plt.xlabel('月份', fontsize=14)
+    plt.legend(loc='upper left', fontsize=12, frameon=True, framealpha=0.9)
+    plt.xticks(all_months, [d.strftime('%Y-%m') for d in all_months], rotation=30, ha='right', fontsize=12)
+    plt.yticks(fontsize=12)
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.tight_layout(rect=[0, 0, 1, 0.97])
+
+    plt.figtext(0.5, 0.01, 
+                f'数据来源：2022-2025年月度气温数据 | {spec} | 置信水平：95%', 
+                ha='center', fontsize=11, color='#555555')
+
+    # 标出预测值和真实值的数据点
+    for i in range(len(all_months)):
+        month = all_months[i]
+        # 标注预测值
+        if not np.isnan(pred_mean_plot[month]):
+            plt.text(month, pred_mean_plot[month]+0.5, 
+                     f'{pred_mean_plot[month]:.2f}', 
+                     color=colors[1], fontsize=11, ha='center', va='bottom', fontweight='bold')
+        # 标注真实值
+        if not np.isnan(actual_plot[month]):
+            plt.text(month, actual_plot[month]-0.5, 
+                     f'{actual_plot[month]:.2f}', 
+                     color=colors[2], fontsize=11, ha='center', va='top', fontweight='bold')
+
+    with step('保存图片'):
+        plt.savefig(path, dpi=300, bbox_inches='tight')
+
+
+def plot_forecast_zoomed(pred_mean_plot, actual_plot, pred_ci, spec, metric=METRIC,
+                         path='prediction_interval_zoomed.png'):
+    import matplotlib.pyplot as plt
+    # =================================================================
+    # 新增功能：从原始图中提取预测区间部分（2025年）
+    # =================================================================
+    # 创建新的图形，只显示预测区间部分
+    plt.figure(figsize=(10, 6), dpi=120)
+    plt.title(f'2025年月度{metric}预测', fontsize=18, fontweight='bold', pad=15)
+
+    # 确定预测区间的时间范围
+    forecast_start = pred_ci.index[0]
+    forecast_end = pred_ci.index[-1]
+
+    # 提取预测区间的数据
+    pred_interval = pred_mean_plot.loc[forecast_start:forecast_end]
+    actual_interval = actual_plot.loc[forecast_start:forecast_end]
+
+    # 绘制预测区间
+
+
+    # 绘制预测均值线
+    pred_interval.plot(
+        color='#ff7f0e', 
+        linewidth=2.5,
+        linestyle='-',
+        marker='o', 
+        markersize=8,
+        label='预测均值'
+    )
+
+    plt.fill_between(
+        pred_ci.index, 
+        pred_ci.iloc[:, 0], 
+        pred_ci.iloc[:, 1], 
+        color='#1f77b4', 
+        alpha=0.18,
+        label='95% 预测区间'
+    )
+
+    # 绘制实际值（如果存在）
+    if not actual_interval.isnull().all():
+        actual_interval.plot(
             color='#2ca02c', 
-            fontsize=11, 
-            ha='center', 
-            va='top', 
-            fontweight='bold',
-            bbox=dict(facecolor='white', alpha=0.7, edgecolor='none', boxstyle='round,pad=0.2')
+            linewidth=2.5,
+            marker='D', 
+            markersize=8,
+            label='实际值'
         )
 
-# 设置坐标轴和网格
-plt.ylabel('温度 (℃)', fontsize=13)
-plt.xlabel('月份', fontsize=13)
-plt.xticks(pred_ci.index, [d.strftime('%Y-%m') for d in pred_ci.index], 
-           rotation=30, ha='right', fontsize=11)
-plt.yticks(fontsize=11)
-plt.grid(True, linestyle='--', alpha=0.7)
-
-# 添加图例
-plt.legend(loc='upper left', fontsize=11, frameon=True, framealpha=0.9)
-
-# 添加脚注
-plt.figtext(0.5, 0.01, 
-            '数据来源：2022-2025年月度气温数据 | SARIMAX(1,1,1)(1,1,1,12) | 置信水平：95%', 
-            ha='center', fontsize=10, color='#555555')
-
-plt.tight_layout(rect=[0, 0, 1, 0.97])
-plt.savefig('prediction_interval_zoomed.png', dpi=300, bbox_inches='tight')
-plt.show()
\ No newline at end of file
+    # 标注数据点
+    for date in pred_ci.index:
+        # 标注预测值
+        if not np.isnan(pred_interval[date]):
+            plt.text(
+                date, 
+                pred_interval[date] + 0.3, 
+                f'{pred_interval[date]:.1f}℃', 
+                color='#ff7f0e', 
+                fontsize=11, 
+                ha='center', 
+                va='bottom', 
+                fontweight='bold',
+                bbox=dict(facecolor='white', alpha=0.7, edgecolor='none', boxstyle='round,pad=0.2')
+            )
+
+        # 标注实际值（如果存在）
+        if not actual_interval.isnull().all() and not np.isnan(actual_interval[date]):
+            plt.text(
+                date, 
+                actual_interval[date] - 0.3, 
+                f'{actual_interval[date]:.1f}℃', 
+                color='#2ca02c', 
+                fontsize=11, 
+                ha='center', 
+                va='top', 
+                fontweight='bold',
+                bbox=dict(facecolor='white', alpha=0.7, edgecolor='none', boxstyle='round,pad=0.2')
+            )
+
+    # 设置坐标轴和网格
+    plt.ylabel('温度 (℃)', fontsize=13)
+    plt.xlabel('月份', fontsize=13)
+    plt.xticks(pred_ci.index, [d.strftime('%Y-%m') for d in pred_ci.index], 
+               rotation=30, ha='right', fontsize=11)
+    plt.yticks(fontsize=11)
+    plt.grid(True, linestyle='--', alpha=0.7)
+
+    # 添加图例
+    plt.legend(loc='upper left', fontsize=11, frameon=True, framealpha=0.9)
+
+    # 添加脚注
+    plt.figtext(0.5, 0.01, 
+                f'数据来源：2022-2025年月度气温数据 | {spec} | 置信水平：95%', 
+                ha='center', fontsize=10, color='#555555')
+
+    plt.tight_layout(rect=[0, 0, 1, 0.97])
+
+    with step('保存图片'):
+        plt.savefig(path, dpi=300, bbox_inches='tight')
+
+
+# ========== 批量预测 ==========
+# 对数据中每个城市的每个指标各拟合一个模型，在进程池中并行运行，全部预测值和置信区间写入一张表。
+# 绘图是单独的一步：读取这张表，为每条序列生成图表。
+def forecast_series(city, metric, train, order=ORDER, seasonal_order=SEASONAL_ORDER, steps=STEPS,
+                    cache_dir=MODEL_CACHE_DIR):
+    """拟合一条序列并预测，返回 城市, 指标, 日期, 预测值, 下限, 上限, 模型 格式的表"""
+    results, _ = fit_sarimax(train, order, seasonal_order, cache_dir=cache_dir)
+    forecast = results.get_forecast(steps=steps)
+    pred_ci = forecast.conf_int()
+    return pd.DataFrame({
+        '城市': city,
+        '指标': metric,
+        '日期': forecast.predicted_mean.index,
+        '预测值': forecast.predicted_mean.values,
+        '下限': pred_ci.iloc[:, 0].values,
+        '上限': pred_ci.iloc[:, 1].values,
+        '模型': spec_label(order, seasonal_order),
+    })
+
+
+def _forecast_job(args):
+    city, metric = args[:2]
+    try:
+        return city, metric, forecast_series(*args), ''
+    except Exception as e:
+        return city, metric, None, f'{type(e).__name__}: {e}'
+
+
+def run_batch(series, workers=0, order=ORDER, seasonal_order=SEASONAL_ORDER, steps=STEPS,
+              cache_dir=MODEL_CACHE_DIR):
+    """批量预测 {(城市, 指标): 训练序列}，返回 (预测结果表, [(城市, 指标, 错误)])"""
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    jobs = [(city, metric, train, order, seasonal_order, steps, cache_dir)
+            for (city, metric), train in series.items()]
+    if workers == 1:
+        outputs = [_forecast_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outputs = list(pool.map(_forecast_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    frames = [frame for _, _, frame, _ in outputs if frame is not None]
+    failures = [(city, metric, error) for city, metric, frame, error in outputs if frame is None]
+    table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=FORECAST_COLUMNS)
+    return table, failures
+
+
+def setup_style():
+    """设置全局绘图样式"""
+    import matplotlib as mpl
+    import matplotlib.pyplot as plt
+    plt.style.use('seaborn-v0_8-whitegrid')
+    mpl.rcParams['font.family'] = 'Microsoft YaHei'
+    mpl.rcParams['axes.unicode_minus'] = False
+
+
+def _init_plot_worker():
+    import matplotlib as mpl
+    mpl.use('Agg')
+    setup_style()
+
+
+def plot_batch_chart(train, pred_mean, pred_ci, actual, spec, metric, path, zoomed_path):
+    import matplotlib.pyplot as plt
+    all_months, train_plot, pred_mean_plot, actual_plot = plot_series(train, pred_mean, actual)
+    plot_forecast(all_months, train_plot, pred_mean_plot, actual_plot, pred_ci, spec, metric, path)
+    plt.close()
+    plot_forecast_zoomed(pred_mean_plot, actual_plot, pred_ci, spec, metric, zoomed_path)
+    plt.close()
+    return path
+
+
+def _plot_job(args):
+    return plot_batch_chart(*args)
+
+
+def plot_batch(table, workers=0, output_dir=FORECAST_CHART_DIR):
+    """按预测结果表为每条序列绘制预测图和预测区间图"""
+    cities = table['城市'].astype(str).unique().tolist()
+    metrics = table['指标'].astype(str).unique().tolist()
+    hist = read_monthly(metrics, start=TRAIN_START, end=TRAIN_END, cities=cities)
+    new = read_monthly(metrics, prefix='2025_', cities=cities, missing_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+
+    jobs = []
+    for (city, metric), group in table.groupby(['城市', '指标'], observed=True, sort=True):
+        city, metric = str(city), str(metric)
+        group = group.set_index('日期')
+        jobs.append((
+            monthly_series(hist, city, metric).astype(float),
+            group['预测值'].astype(float),
+            group[['下限', '上限']].astype(float),
+            monthly_series(new, city, metric)['2025-01':'2025-09'],
+            group['模型'].iloc[0],
+            metric,
+            os.path.join(output_dir, f'{city}_{metric}_forecast.png'),
+            os.path.join(output_dir, f'{city}_{metric}_zoomed.png'),
+        ))
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
+    if workers == 1:
+        _init_plot_worker()
+        return [_plot_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_plot_worker) as pool:
+        return list(pool.map(_plot_job, jobs))
+
+
+def main_batch(metrics=METRICS, cities=None, workers=0, cache_dir=MODEL_CACHE_DIR, forecast=True, charts=False):
+    path = table_path('forecast')
+    if forecast:
+        started = time.perf_counter()
+        with step('读取训练数据') as s:
+            hist = read_monthly(metrics, start=TRAIN_START, end=TRAIN_END, cities=cities)
+            series = {(city, metric): monthly_series(hist, city, metric).astype(float)
+                      for city in sorted(hist['城市'].astype(str).unique()) for metric in metrics}
+            s['rows'] = len(hist)
+        with step('批量预测', rows=len(series)):
+            table, failures = run_batch(series, workers, cache_dir=cache_dir)
+        with step('保存预测表', rows=len(table)):
+            write_table(table, path)
+        print(f"共 {len(series)} 条序列，预测成功 {len(series) - len(failures)} 条，"
+              f"用时 {time.perf_counter() - started:.1f} 秒，结果已保存到 {path}")
+        for city, metric, error in failures:
+            print(f"  {city} {metric}: {error}")
+    if charts:
+        table = read_table(path)
+        with step('批量绘图', rows=len(table)):
+            paths = plot_batch(table, workers)
+        print(f"已绘制 {len(paths)} 条序列的预测图，保存在 {FORECAST_CHART_DIR}")
+
+
+def main(city=CITY, metric=METRIC, cache_dir=MODEL_CACHE_DIR, search=False, workers=0,
+         timeout=FIT_TIMEOUT, criterion='AIC', show=False):
+    with step('读取数据') as s:
+        train, actual = load_series(city, metric)
+        s['rows'] = len(train) + len(actual)
+
+    order, seasonal_order = ORDER, SEASONAL_ORDER
+    if search:
+        started = time.perf_counter()
+        with step('阶数搜索') as s:
+            table = search_orders(train, workers=workers, timeout=timeout, criterion=criterion)
+            s['rows'] = len(table)
+        table.drop(columns=['order', 'seasonal_order']).to_csv(SEARCH_RESULT_FILE, index=False, encoding='utf-8-sig')
+        print(f"共 {len(table)} 个候选模型，用时 {time.perf_counter() - started:.1f} 秒，"
+              f"结果已保存到 {SEARCH_RESULT_FILE}")
+        print(table['状态'].value_counts().to_string())
+        print(table.head(10)[['排名', '模型', 'AIC', 'BIC', '迭代次数', '耗时', '状态']].to_string(index=False))
+        if table.loc[0, '状态'] == '成功':
+            order, seasonal_order = table.loc[0, 'order'], table.loc[0, 'seasonal_order']
+        else:
+            print(f"没有成功收敛的候选模型，使用默认的 {spec_label()}")
+    spec = spec_label(order, seasonal_order)
+
+    # 训练模型
+    with step('训练模型'):
+        results, source = fit_sarimax(train, order, seasonal_order, cache_dir=cache_dir)
+    if source == '缓存':
+        print(f"{spec}: 使用缓存的模型参数")
+    else:
+        print(f"{spec}: {source}，迭代 {results.mle_retvals.get('iterations')} 次")
+
+    # 预测
+    with step('预测', rows=STEPS):
+        forecast = results.get_forecast(steps=STEPS)
+        pred_mean = forecast.predicted_mean
+        pred_ci = forecast.conf_int()
+
+    import matplotlib.pyplot as plt
+    setup_style()
+    all_months, train_plot, pred_mean_plot, actual_plot = plot_series(train, pred_mean, actual)
+    # 图片总是保存到文件；只有指定 --show 时才打开窗口（会阻塞到窗口关闭）
+    plot_forecast(all_months, train_plot, pred_mean_plot, actual_plot, pred_ci, spec, metric)
+    if show:
+        plt.show()
+    plt.close()
+    plot_forecast_zoomed(pred_mean_plot, actual_plot, pred_ci, spec, metric)
+    if show:
+        plt.show()
+    plt.close()
+
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="SARIMAX月度气温预测")
+    parser.add_argument("--city", default=CITY, help="预测的城市")
+    parser.add_argument("--metric", default=METRIC, help="预测的指标")
+    parser.add_argument("--cache-dir", default=MODEL_CACHE_DIR, help="模型缓存目录")
+    parser.add_argument("--no-cache", action="store_true", help="不读写模型缓存，每次重新拟合")
+    parser.add_argument("--search", action="store_true", help="在阶数网格上搜索最优模型，代替固定的阶数")
+    parser.add_argument("--workers", type=int, default=0, help="阶数搜索、批量预测和批量绘图的进程数，0 表示使用全部CPU核心")
+    parser.add_argument("--timeout", type=float, default=FIT_TIMEOUT, help="单个候选模型的拟合超时（秒）")
+    parser.add_argument("--criterion", choices=['AIC', 'BIC'], default='AIC', help="选择模型的信息准则")
+    parser.add_argument("--batch", action="store_true", help="不绘图，批量预测全部城市的全部指标并保存为一张表")
+    parser.add_argument("--charts", action="store_true", help="根据批量预测结果表为每条序列绘图，可与 --batch 一起使用")
+    parser.add_argument("--cities", nargs="+", help="批量预测的城市，默认为数据中的全部城市")
+    parser.add_argument("--metrics", nargs="+", default=METRICS, help="批量预测的指标")
+    parser.add_argument("--show", action="store_true", help="单序列预测保存图片后再打开窗口显示")
+    parser.add_argument("--profile", action="store_true", help="记录各步骤的用时和内存，写出JSON报告")
+    args = parser.parse_args(argv)
+    profiling.enable('forecast', args.profile)
+    cache_dir = None if args.no_cache else args.cache_dir
+    if args.batch or args.charts:
+        main_batch(args.metrics, args.cities, args.workers, cache_dir, args.batch, args.charts)
+    else:
+        main(args.city, args.metric, cache_dir, args.search, args.workers, args.timeout, args.criterion, args.show)
+
+
+if __name__ == "__main__":
+    cli()
\ No newline at end of file
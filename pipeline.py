@@ -0,0 +1,251 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# 抓取 → 统计 → 绘图 / 预测 的流水线。每个阶段声明运行的脚本、读取的输入和写出的输出，
+# 依赖关系由 after 给出。阶段的指纹为命令和全部输入文件内容的哈希，与上次成功运行时相同
+# 且输出都存在时跳过该阶段；互不依赖的阶段（绘图和预测）同时运行。抓取要访问网站，只有指定
+# --pull 时才运行，并且每次都运行（网站上当月的数据一直在更新，没有本地输入可以比较）。输入文件按 (大小, 修改时间) 缓存内容哈希，没有变化时整条流水线只需检查文件状态。
+# 用法: python pipeline.py            # 运行有变化的阶段
+#       python pipeline.py --pull     # 先抓取新数据
+#       python pipeline.py --dry-run  # 只列出需要运行的阶段
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PIPELINE_STATE = 'pipeline_state.json'
+PIPELINE_LOG_DIR = 'pipeline_logs'
+
+# code 为阶段用到的源文件（相对于本文件所在目录），inputs 和 outputs 为工作目录中的数据文件或目录，
+# always 为真的阶段不检查指纹，每次都运行。
+# 文件名与 store.py、analyse.py、tables.py、draw.py、forecast.py 中的设置一致；
+# 这里不导入这些模块，检查指纹时不需要加载 pandas、matplotlib 和 statsmodels
+RAW_INPUTS = ['weather_data', 'dalian_weather_2022_2024.csv', 'dalian_weather_2025_1_6.csv']
+ANALYSE_OUTPUTS = ['daily_avg_temp.parquet', 'monthly_avg_temp.parquet', 'monthly_wind_level_days.parquet',
+                   'monthly_weather_days.parquet', '2025_monthly_avg_temp.parquet']
+STAGES = {
+    'pull': {
+        'command': ['data_pull.py'],
+        'code': ['data_pull.py', 'store.py', 'profiling.py'],
+        'inputs': [],
+        'outputs': ['weather_data'],
+        'after': [],
+        'always': True,
+    },
+    'analyse': {
+        'command': ['analyse.py'],
+        'code': ['analyse.py', 'store.py', 'tables.py', 'fields.py', 'weather_types.py', 'profiling.py'],
+        'inputs': RAW_INPUTS,
+        'outputs': ANALYSE_OUTPUTS,
+        'after': ['pull'],
+    },
+    'draw': {
+        'command': ['draw.py'],
+        'code': ['draw.py', 'tables.py', 'climatology.py', 'weather_types.py', 'profiling.py'],
+        'inputs': ['monthly_avg_temp.parquet', 'monthly_wind_level_days.parquet', 'monthly_weather_days.parquet'],
+        'outputs': ['render_manifest.json', 'monthly_avg_temp_trend.png', 'yearly_month_high_low_temp_trend.png',
+                    'monthly_weather_charts'],
+        'after': ['analyse'],
+    },
+    'forecast': {
+        'command': ['forecast.py', '--batch', '--charts'],
+        'code': ['forecast.py', 'tables.py', 'profiling.py'],
+        'inputs': ['monthly_avg_temp.parquet', '2025_monthly_avg_temp.parquet'],
+        'outputs': ['monthly_forecast.parquet', 'forecast_charts'],
+        'after': ['analyse'],
+    },
+}
+DEFAULT_STAGES = ['analyse', 'draw', 'forecast']
+
+
+def input_files(paths):
+    """展开输入路径：目录递归列出其中的文件（跳过写了一半的 .tmp），不存在的路径原样保留"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files += [os.path.join(root, name) for name in sorted(names) if not name.endswith('.tmp')]
+        else:
+            files.append(path)
+    return files
+
+
+def file_digest(path, hash_cache):
+    """文件内容的哈希；大小和修改时间与缓存中相同时直接使用缓存的哈希"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return 'missing'
+    cached = hash_cache.get(path)
+    if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+        return cached[2]
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    digest = h.hexdigest()
+    hash_cache[path] = [st.st_size, st.st_mtime_ns, digest]
+    return digest
+
+
+def fingerprint(stage, hash_cache):
+    """命令、源文件和全部输入文件的路径、内容组成的指纹"""
+    h = hashlib.sha256(json.dumps(stage['command']).encode())
+    for name in stage['code']:
+        h.update(f'{name}\0{file_digest(os.path.join(SCRIPT_DIR, name), hash_cache)}\0'.encode())
+    for path in input_files(stage['inputs']):
+        h.update(f'{path}\0{file_digest(path, hash_cache)}\0'.encode())
+    return h.hexdigest()
+
+
+def load_state(path=PIPELINE_STATE):
+    if not os.path.exists(path):
+        return {'stages': {}, 'hashes': {}}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state, path=PIPELINE_STATE):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def is_fresh(name, stage, state):
+    """指纹与上次成功运行时相同且声明的输出都存在；always 为真的阶段总是需要运行"""
+    if stage.get('always'):
+        return False
+    previous = state['stages'].get(name, {}).get('fingerprint')
+    return (previous == fingerprint(stage, state['hashes'])
+            and all(os.path.exists(path) for path in stage['outputs']))
+
+
+def run_stage(name, stage, log_dir=PIPELINE_LOG_DIR):
+    """在子进程中运行一个阶段，输出写入日志文件，返回 (返回码, 用时)"""
+    os.makedirs(log_dir, exist_ok=True)
+    started = time.perf_counter()
+    script, *args = stage['command']
+    with open(os.path.join(log_dir, f'{name}.log'), 'w', encoding='utf-8') as log:
+        returncode = subprocess.call([sys.executable, os.path.join(SCRIPT_DIR, script), *args],
+                                     stdout=log, stderr=subprocess.STDOUT, env={**os.environ, 'MPLBACKEND': 'Agg'})
+    return returncode, time.perf_counter() - started
+
+
+def log_tail(name, lines=20, log_dir=PIPELINE_LOG_DIR):
+    with open(os.path.join(log_dir, f'{name}.log'), encoding='utf-8', errors='replace') as f:
+        return ''.join(f.readlines()[-lines:])
+
+
+def plan(selected, stages=STAGES):
+    """按依赖顺序排列选中的阶段；依赖中没有被选中的阶段视为已完成（使用磁盘上已有的输出）"""
+    order, visiting = [], set()
+
+    def visit(name):
+        if name in order:
+            return
+        if name in visiting:
+            raise ValueError(f'阶段之间存在循环依赖: {name}')
+        visiting.add(name)
+        for dep in stages[name]['after']:
+            visit(dep)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in selected:
+        visit(name)
+    return [name for name in order if name in selected]
+
+
+def run_pipeline(selected, force=False, dry_run=False, workers=0, stages=STAGES, state_path=PIPELINE_STATE):
+    """运行选中的阶段，返回 {阶段: 结果}，结果为 运行/跳过/失败/未运行"""
+    order = plan(selected, stages)
+    state = load_state(state_path)
+    results = {}
+    if workers <= 0:
+        workers = len(order) or 1
+
+    def ready(name):
+        deps = [dep for dep in stages[name]['after'] if dep in order]
+        return all(results.get(dep) in ('运行', '跳过') for dep in deps)
+
+    def blocked(name):
+        return any(results.get(dep) in ('失败', '未运行') for dep in stages[name]['after'] if dep in order)
+
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while len(results) < len(order):
+            for name in order:
+                if name in results or name in running.values():
+                    continue
+                if blocked(name):
+                    results[name] = '未运行'
+                    print(f"[{name}] 上游阶段失败，不运行")
+                elif ready(name):
+                    stage = stages[name]
+                    # 指纹在上游阶段完成之后计算，读到的是上游刚写出的文件；
+                    # 只列出阶段时上游并没有真正运行，上游需要运行的阶段也算作需要运行
+                    upstream = dry_run and any(results.get(dep) == '运行' for dep in stage['after'])
+                    if not force and not upstream and is_fresh(name, stage, state):
+                        results[name] = '跳过'
+                        print(f"[{name}] 输入没有变化，跳过")
+                    elif dry_run:
+                        results[name] = '运行'
+                        print(f"[{name}] 需要运行: python {' '.join(stage['command'])}")
+                    else:
+                        print(f"[{name}] 开始运行: python {' '.join(stage['command'])}")
+                        # 记录运行前的指纹：阶段运行期间输入又发生变化时，下次还会重新运行
+                        state['stages'].setdefault(name, {})['pending'] = fingerprint(stage, state['hashes'])
+                        running[pool.submit(run_stage, name, stage)] = name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                returncode, elapsed = future.result()
+                entry = state['stages'][name]
+                pending = entry.pop('pending')
+                if returncode == 0:
+                    results[name] = '运行'
+                    entry.update(fingerprint=pending, finished=time.strftime('%Y-%m-%d %H:%M:%S'),
+                                 seconds=round(elapsed, 2))
+                    print(f"[{name}] 完成，用时 {elapsed:.1f} 秒")
+                else:
+                    results[name] = '失败'
+                    entry.pop('fingerprint', None)
+                    print(f"[{name}] 失败（返回码 {returncode}），日志末尾:\n{log_tail(name)}")
+                save_state(state, state_path)
+    if not dry_run:
+        save_state(state, state_path)
+    return results
+
+
+def main(stages=DEFAULT_STAGES, pull=False, force=False, dry_run=False, workers=0):
+    selected = (['pull'] if pull else []) + [name for name in stages if name != 'pull']
+    started = time.perf_counter()
+    results = run_pipeline(selected, force, dry_run, workers)
+    summary = '，'.join(f'{name} {result}' for name, result in results.items())
+    print(f"流水线结束，用时 {time.perf_counter() - started:.2f} 秒：{summary}")
+    return 1 if '失败' in results.values() else 0
+
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="按依赖关系运行抓取、统计、绘图和预测，跳过输入没有变化的阶段")
+    parser.add_argument("stages", nargs="*", help="运行的阶段（analyse、draw、forecast），默认为全部")
+    parser.add_argument("--pull", action="store_true", help="先运行抓取阶段（访问网站）")
+    parser.add_argument("--force", action="store_true", help="忽略指纹，重新运行选中的全部阶段")
+    parser.add_argument("--dry-run", action="store_true", help="只列出需要运行的阶段，不实际运行")
+    parser.add_argument("--workers", type=int, default=0, help="同时运行的阶段数，0 表示不限制")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.stages if name not in STAGES or name == 'pull']
+    if unknown:
+        parser.error(f"未知的阶段: {', '.join(unknown)}（抓取阶段用 --pull 指定）")
+    return main(args.stages or DEFAULT_STAGES, args.pull, args.force, args.dry_run, args.workers)
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
\ No newline at end of file
@@ -0,0 +1,126 @@
+import atexit
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource  # 只有类Unix系统有
+except ImportError:
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# 分步骤的性能记录：每个命名步骤的墙钟时间、CPU时间、峰值内存和处理的行数。进程峰值内存只增不减，
+# 因此每个步骤另外记录这个步骤把峰值抬高了多少（0 表示没有超过之前的峰值）。
+# 设置环境变量 WEATHER_PROFILE=1 或在脚本中使用 --profile 打开；关闭时 step 几乎没有开销。
+# 打开时在进程退出前把本次运行的全部步骤写成一个JSON报告，保存在 profile_reports 目录中，
+# 可以按时间比较同一个脚本各次运行的结果。
+# 用法:
+#     with step('读取原始数据') as s:
+#         raw = load_raw(sources)
+#         s['rows'] = len(raw)
+
+PROFILE_ENV = 'WEATHER_PROFILE'
+PROFILE_DIR = 'profile_reports'
+
+_state = {'enabled': os.environ.get(PROFILE_ENV, '') not in ('', '0'), 'script': None, 'started': None}
+_steps = []
+_stack = []
+
+
+def peak_rss_mb():
+    """当前进程到目前为止的峰值内存（MB），取不到时为None"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 以KB为单位，macOS 以字节为单位
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return round(getattr(info, 'peak_wset', info.rss) / (1024 * 1024), 1)
+    return None
+
+
+def children_cpu():
+    """已结束的子进程（如进程池中的工作进程）累计的CPU时间"""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def enabled():
+    return _state['enabled']
+
+
+def enable(script, flag=True, output_dir=PROFILE_DIR):
+    """打开记录（flag 为真或设置了环境变量时），进程退出时写出 script 的报告"""
+    if flag:
+        _state['enabled'] = True
+        # 子进程（进程池、流水线中的各个阶段）继承环境变量，同样打开记录
+        os.environ[PROFILE_ENV] = '1'
+    if _state['enabled'] and _state['script'] is None:
+        _state['script'] = script
+        _state['started'] = time.time()
+        atexit.register(write_report, output_dir)
+
+
+@contextmanager
+def step(name, rows=None):
+    """记录一个步骤；嵌套的步骤名称用 / 连接，如 '预测/拟合'。可以在块内设置 s['rows']"""
+    record = {'rows': rows}
+    if not _state['enabled']:
+        yield record
+        return
+    _stack.append(name)
+    full_name = '/'.join(_stack)
+    wall, cpu, child_cpu, peak = time.perf_counter(), time.process_time(), children_cpu(), peak_rss_mb()
+    try:
+        yield record
+    finally:
+        _stack.pop()
+        end_peak = peak_rss_mb()
+        _steps.append({
+            'name': full_name,
+            'wall_seconds': round(time.perf_counter() - wall, 4),
+            'cpu_seconds': round(time.process_time() - cpu, 4),
+            'child_cpu_seconds': round(children_cpu() - child_cpu, 4),
+            'process_peak_rss_mb': end_peak,
+            'peak_rss_increase_mb': None if end_peak is None else round(end_peak - peak, 1),
+            'rows': record['rows'],
+        })
+
+
+def report():
+    """本次运行的报告内容"""
+    return {
+        'script': _state['script'],
+        'argv': sys.argv[1:],
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(_state['started'] or time.time())),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pid': os.getpid(),
+        'total_wall_seconds': round(time.time() - (_state['started'] or time.time()), 4),
+        'total_cpu_seconds': round(time.process_time() + children_cpu(), 4),
+        'peak_rss_mb': peak_rss_mb(),
+        'steps': _steps,
+    }
+
+
+def write_report(output_dir=PROFILE_DIR):
+    """写出JSON报告，文件名为 脚本_时间_进程号.json，返回文件路径"""
+    if not _steps:
+        return None
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.strftime('%Y%m%d_%H%M%S', time.localtime(_state['started'] or time.time()))
+    path = os.path.join(output_dir, f"{_state['script'] or 'run'}_{started}_{os.getpid()}.json")
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report(), f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+    print(f"性能报告已保存到 {path}")
+    return path
\ No newline at end of file
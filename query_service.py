@@ -0,0 +1,352 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import traceback
+import warnings
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+import pandas as pd
+from climatology import ClimatologyCube, TEMP_KEYS, KINDS
+from tables import table_path, read_table
+
+# 本地查询服务：把 analyse.py 输出的逐日、逐月统计表按 (城市, 日期) 建立内存索引，
+# 以HTTP/JSON回答区间查询和多年平均查询；图表按需用 draw.py 的绘图函数渲染，
+# 渲染结果放在按字节数淘汰的LRU缓存中。统计表文件有变化时下一个请求会自动重新加载。
+# 只监听本机地址，不依赖任何外部服务。
+# 用法: python query_service.py --port 8765
+#   GET /cities
+#   GET /daily?city=dalian&start=2024-01-01&end=2024-01-31
+#   GET /monthly?city=dalian&start=2023-01&end=2023-12
+#   GET /climatology?city=dalian&month=3&kind=气温
+#   GET /charts?city=dalian
+#   GET /chart?city=dalian&name=wind_level_pie_07
+#   GET /stats
+
+HOST = '127.0.0.1'
+PORT = 8765
+CHART_CACHE_MB = 64
+
+
+class SeriesIndex:
+    """按城市分组、按日期排序的数组，区间查询用二分查找"""
+
+    def __init__(self, df, date_col, columns):
+        self.columns = columns
+        self.series = {}
+        df = df.sort_values(['城市', date_col])
+        for city, group in df.groupby('城市', observed=True, sort=True):
+            self.series[str(city)] = (group[date_col].to_numpy(dtype='datetime64[ns]'),
+                                      group[columns].to_numpy(dtype=float))
+
+    def cities(self):
+        return list(self.series)
+
+    def range(self, city, start=None, end=None):
+        """返回 [start, end] 之间（含两端）的 (日期, 值)，城市不存在时抛出 KeyError"""
+        dates, values = self.series[city]
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(start, 'ns'), 'left')
+        hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(end, 'ns'), 'right')
+        return dates[lo:hi], values[lo:hi]
+
+
+class LRUCache:
+    """按总字节数限制大小的LRU缓存，超过上限时淘汰最久没有使用的项"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """放入缓存；单项超过上限时不缓存"""
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.items:
+                self.size -= len(self.items.pop(key))
+            self.items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, old = self.items.popitem(last=False)
+                self.size -= len(old)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+
+    def stats(self):
+        return {'条数': len(self.items), '字节数': self.size, '上限字节数': self.max_bytes,
+                '命中': self.hits, '未命中': self.misses, '淘汰': self.evictions}
+
+
+class WeatherData:
+    """统计表的内存索引、多年平均立方体和图表缓存"""
+
+    def __init__(self, prefix='', output_dir='.', cache_bytes=CHART_CACHE_MB * 1024 * 1024):
+        self.paths = {name: table_path(name, prefix, output_dir) for name in ('daily', 'monthly', 'wind', 'weather')}
+        self.charts = LRUCache(cache_bytes)
+        self.load_lock = threading.Lock()
+        self.render_lock = threading.Lock()  # matplotlib 不是线程安全的，同一时间只渲染一张图
+        self.signature = None
+        self.refresh()
+
+    def file_signature(self):
+        return tuple((path, os.stat(path).st_mtime_ns) if os.path.exists(path) else (path, None)
+                     for path in self.paths.values())
+
+    def refresh(self):
+        """统计表文件有变化时重新加载，返回是否重新加载"""
+        signature = self.file_signature()
+        if signature == self.signature:
+            return False
+        with self.load_lock:
+            if signature == self.signature:
+                return False
+            started = time.perf_counter()
+            # 只有月度气温表是必需的：带前缀的统计（如 2025_）只写出月度气温表
+            monthly = read_table(self.paths['monthly'])
+            wind, weather, daily = (read_table(self.paths[name]) if os.path.exists(self.paths[name]) else None
+                                    for name in ('wind', 'weather', 'daily'))
+            if daily is None:
+                daily = pd.DataFrame({'城市': [], '日期': pd.Series(dtype='datetime64[ns]'), '平均气温': []})
+            cube = ClimatologyCube()
+            cube.update(monthly, wind, weather)
+            # 先建好全部索引再一起替换，正在处理的请求仍然使用旧的索引
+            self.daily = SeriesIndex(daily, '日期', ['平均气温'])
+            self.monthly = SeriesIndex(monthly, '月份', TEMP_KEYS)
+            self.cube = cube
+            self.tables = {'monthly': monthly, 'wind': wind, 'weather': weather}
+            self.chart_jobs = {}
+            self.charts.clear()
+            self.signature = signature
+            print(f"已加载统计表：{len(self.monthly.cities())} 个城市、{len(daily)} 天，"
+                  f"用时 {time.perf_counter() - started:.2f} 秒")
+            return True
+
+    def table(self, name):
+        """可选的统计表，文件不存在时抛出 KeyError（返回404）"""
+        if self.tables[name] is None:
+            raise KeyError(f'统计表 {self.paths[name]}')
+        return self.tables[name]
+
+    def chart_names(self, city):
+        return list(self._jobs(city))
+
+    def _jobs(self, city):
+        """某个城市的全部绘图任务 {图表名: (绘图函数, 参数)}，第一次用到时才导入 draw（和 matplotlib）"""
+        jobs = self.chart_jobs.get(city)
+        if jobs is None:
+            import draw
+            if city not in self.monthly.series:
+                raise KeyError(city)
+            # 与 draw.py 按城市筛选读取的结果一致：去掉城市列并重新编号，绘图函数按位置取行
+            monthly, wind, weather = (table[table['城市'] == city].drop(columns='城市').reset_index(drop=True)
+                                      for table in map(self.table, ('monthly', 'wind', 'weather')))
+            jobs = {os.path.splitext(os.path.basename(kwargs['path']))[0]: (func, kwargs)
+                    for func, kwargs in draw.build_jobs(monthly, wind, weather, self.cube, city)}
+            self.chart_jobs[city] = jobs
+        return jobs
+
+    def chart(self, city, name):
+        """返回 (PNG字节, 是否命中缓存)；图表名与 draw.py 输出的文件名相同（不含扩展名）"""
+        key = (self.signature, city, name)
+        png = self.charts.get(key)
+        if png is not None:
+            return png, True
+        with self.render_lock:
+            import draw
+            func, kwargs = self._jobs(city)[name]
+            draw.setup_style()
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, 'chart.png')
+                func(**{**kwargs, 'path': path})
+                with open(path, 'rb') as f:
+                    png = f.read()
+        self.charts.put(key, png)
+        return png, False
+
+
+def require(params, name):
+    """必需的查询参数，缺少时抛出 ValueError（返回400）"""
+    if not params.get(name):
+        raise ValueError(f'缺少参数: {name}')
+    return params[name]
+
+
+def month_arg(value):
+    month = int(value)
+    if not 1 <= month <= 12:
+        raise ValueError('month 应为1-12')
+    return month
+
+
+def number(value):
+    """保留两位小数，NaN 转为 None（JSON中为 null）"""
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def records(dates, values, columns, date_format):
+    labels = pd.DatetimeIndex(dates).strftime(date_format)
+    return [{'日期': label, **{col: number(v) for col, v in zip(columns, row)}} for label, row in zip(labels, values)]
+
+
+def summary(values, columns):
+    """每列的平均、最高、最低和有数据的条数"""
+    if not len(values):
+        return {}
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # 整列都是NaN
+        return {col: {'平均': number(np.nanmean(values[:, i])), '最高': number(np.nanmax(values[:, i])),
+                      '最低': number(np.nanmin(values[:, i])), '条数': int((~np.isnan(values[:, i])).sum())}
+                for i, col in enumerate(columns)}
+
+
+def query_range(index, params, date_format):
+    """区间查询；月度表的 月份 为每月1日，因此 end=2023-12 包含12月"""
+    city = require(params, 'city')
+    start, end = params.get('start'), params.get('end')
+    dates, values = index.range(city, pd.Timestamp(start) if start else None, pd.Timestamp(end) if end else None)
+    columns = index.columns
+    if params.get('metric'):
+        if params['metric'] not in columns:
+            raise ValueError(f"metric 应为 {', '.join(columns)} 之一")
+        i = columns.index(params['metric'])
+        columns, values = [params['metric']], values[:, [i]]
+    return {'城市': city, '条数': len(dates), '汇总': summary(values, columns),
+            '数据': records(dates, values, columns, date_format)}
+
+
+def query_climatology(data, params):
+    city, month = require(params, 'city'), month_arg(require(params, 'month'))
+    if city not in data.cube.city_index:
+        raise KeyError(city)
+    kind = params.get('kind', '气温')
+    if kind not in KINDS:
+        raise ValueError(f"kind 应为 {', '.join(KINDS)} 之一")
+    if kind != '气温':
+        data.table({'风力等级': 'wind', '天气类型': 'weather'}[kind])
+    if params.get('name'):
+        mean, n = data.cube.lookup(city, month, kind, params['name'])
+        return {'城市': city, '月': month, '类别': kind, '名称': params['name'],
+                '平均值': None if np.isnan(mean) else round(float(mean), 2), '年数': n}
+    frame = data.cube.month_frame(city, month, kind)
+    frame = frame[frame['年数'] > 0]
+    return {'城市': city, '月': month, '类别': kind,
+            '数据': [{'名称': row.名称, '平均值': round(float(row.平均值), 2), '年数': int(row.年数)}
+                   for row in frame.itertuples(index=False)]}
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    data = None  # make_server 中设置
+
+    def send_json(self, status, body, started):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('X-Elapsed-Ms', f'{(time.perf_counter() - started) * 1000:.2f}')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_internal_error(self, error, started):
+        """其他错误也要回复500，不能直接断开连接"""
+        traceback.print_exc()
+        self.send_json(500, {'错误': f'{type(error).__name__}: {error}'}, started)
+
+    def do_GET(self):
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        data = self.data
+        try:
+            data.refresh()
+        except Exception as e:
+            # 统计表读取失败（如写了一半）时继续使用已加载的数据，下一个请求再重新读取
+            self.send_internal_error(e, started)
+            return
+        try:
+            if url.path == '/cities':
+                self.send_json(200, {'城市': data.monthly.cities()}, started)
+            elif url.path == '/daily':
+                self.send_json(200, query_range(data.daily, params, '%Y-%m-%d'), started)
+            elif url.path == '/monthly':
+                self.send_json(200, query_range(data.monthly, params, '%Y-%m'), started)
+            elif url.path == '/climatology':
+                self.send_json(200, query_climatology(data, params), started)
+            elif url.path == '/charts':
+                city = require(params, 'city')
+                self.send_json(200, {'城市': city, '图表': data.chart_names(city)}, started)
+            elif url.path == '/chart':
+                png, hit = data.chart(require(params, 'city'), require(params, 'name'))
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(png)))
+                self.send_header('X-Cache', 'HIT' if hit else 'MISS')
+                self.send_header('X-Elapsed-Ms', f'{(time.perf_counter() - started) * 1000:.2f}')
+                self.end_headers()
+                self.wfile.write(png)
+            elif url.path == '/stats':
+                self.send_json(200, {'图表缓存': data.charts.stats()}, started)
+            else:
+                self.send_json(404, {'错误': f'未知的路径: {url.path}'}, started)
+        except KeyError as e:
+            # 城市或图表名不存在
+            self.send_json(404, {'错误': f'没有数据: {e.args[0]}'}, started)
+        except ValueError as e:
+            self.send_json(400, {'错误': str(e)}, started)
+        except Exception as e:
+            self.send_internal_error(e, started)
+
+    def log_message(self, format, *args):
+        pass  # 不逐条打印请求
+
+
+def make_server(host=HOST, port=PORT, prefix='', output_dir='.', cache_mb=CHART_CACHE_MB):
+    """创建服务（port 为0时随机选择空闲端口），调用 serve_forever 开始处理请求"""
+    handler = type('Handler', (QueryHandler,), {'data': WeatherData(prefix, output_dir, int(cache_mb * 1024 * 1024))})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(host=HOST, port=PORT, prefix='', output_dir='.', cache_mb=CHART_CACHE_MB):
+    server = make_server(host, port, prefix, output_dir, cache_mb)
+    print(f"查询服务已启动: http://{server.server_address[0]}:{server.server_address[1]}/cities")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="统计结果的本地HTTP/JSON查询服务")
+    parser.add_argument("--host", default=HOST, help="监听地址，默认只监听本机")
+    parser.add_argument("--port", type=int, default=PORT, help="端口")
+    parser.add_argument("--prefix", default='', help="统计表文件名前缀，如 2025_")
+    parser.add_argument("--output-dir", default='.', help="统计表所在目录")
+    parser.add_argument("--cache-mb", type=float, default=CHART_CACHE_MB, help="图表缓存的大小上限（MB）")
+    args = parser.parse_args(argv)
+    main(args.host, args.port, args.prefix, args.output_dir, args.cache_mb)
+
+
+if __name__ == "__main__":
+    cli()
\ No newline at end of file
@@ -0,0 +1,66 @@
+import pandas as pd
+import os
+
+# 抓取结果按 城市/年/月 分区存放，每个月一个文件：weather_data/dalian/2024/01.csv
+STORE_DIR = "weather_data"
+
+
+def partition_path(city, ym, root=STORE_DIR):
+    return os.path.join(root, city, ym[:4], f"{ym[4:]}.csv")
+
+
+def write_csv_atomic(df, path, encoding="utf-8"):
+    """先写同目录下的临时文件再用 os.replace 原子替换，进程在任何时刻崩溃都不会留下写了一半的文件"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    df.to_csv(tmp_path, index=False, encoding=encoding)
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_partition(df, city, ym, root=STORE_DIR):
+    """写入一个月份分区"""
+    return write_csv_atomic(df, partition_path(city, ym, root))
+
+
+def list_partitions(root=STORE_DIR, cities=None, start=None, end=None):
+    """列出分区，返回按 (城市, YYYYMM) 排序的 [(city, ym, path)]，start/end 为 YYYYMM（含）"""
+    if not os.path.isdir(root):
+        return []
+    partitions = []
+    for city in sorted(os.listdir(root)):
+        if cities is not None and city not in cities:
+            continue
+        city_dir = os.path.join(root, city)
+        if not os.path.isdir(city_dir):
+            continue
+        for year in sorted(os.listdir(city_dir)):
+            year_dir = os.path.join(city_dir, year)
+            if not os.path.isdir(year_dir):
+                continue
+            for name in sorted(os.listdir(year_dir)):
+                if not name.endswith(".csv"):
+                    continue
+                ym = year + name[:-4]
+                if (start and ym < start) or (end and ym > end):
+                    continue
+                partitions.append((city, ym, os.path.join(year_dir, name)))
+    return partitions
+
+
+def read_partition(path):
+    return pd.read_csv(path, encoding="utf-8", dtype={"月份": str})
+
+
+def iter_partitions(root=STORE_DIR, cities=None, start=None, end=None):
+    """逐个月份读取分区，内存中一次只有一个月的数据"""
+    for city, ym, path in list_partitions(root, cities, start, end):
+        yield city, ym, read_partition(path)
+
+
+def read_partitions(root=STORE_DIR, cities=None, start=None, end=None):
+    """读取并合并多个分区，没有匹配的分区时返回空表"""
+    frames = [df for _, _, df in iter_partitions(root, cities, start, end)]
+    if not frames:
+        return pd.DataFrame(columns=["日期", "天气状况", "气温", "风力风向", "月份", "城市"])
+    return pd.concat(frames, ignore_index=True)
\ No newline at end of file
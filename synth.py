@@ -0,0 +1,150 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from store import STORE_DIR, write_partition
+
+# 合成原始天气数据，格式与抓取结果完全相同：日期为 2024年01月01日，气温为 5℃/-3℃，
+# 风力风向和天气状况都是 白天/夜晚 两段，月份为 YYYYMM。每个城市有自己的年平均气温、
+# 季节振幅和昼夜温差，逐日气温带有自相关的扰动；降水类型随气温变化（冷时下雪、夏天雷阵雨）。
+# 同一个种子和城市序号总是生成相同的数据，不依赖网络，可用于基准测试和分享示例。
+# 用法: python synth.py --cities 10 --years 3 --output-dir bench_data
+
+START_YEAR = 2022
+YEARS = 3
+DIRECTIONS = ['北风', '东北风', '东风', '东南风', '南风', '西南风', '西风', '西北风']
+WIND_LEVELS = ['1-2级', '3级', '3-4级', '4-5级', '5-6级']
+WIND_LEVEL_P = [0.35, 0.12, 0.33, 0.15, 0.05]
+DRY_WEATHER = ['晴', '多云', '阴', '霾']
+DRY_WEATHER_P = [0.4, 0.35, 0.18, 0.07]
+# 按日平均气温区间选择降水类型：(上限, 类型, 概率)
+WET_WEATHER = [
+    (0, ['小雪', '中雪', '雨夹雪'], [0.6, 0.25, 0.15]),
+    (6, ['雨夹雪', '小雪', '小雨'], [0.4, 0.3, 0.3]),
+    (20, ['小雨', '中雨', '阵雨'], [0.55, 0.25, 0.2]),
+    (np.inf, ['雷阵雨', '阵雨', '小雨', '中雨', '大雨'], [0.35, 0.2, 0.2, 0.15, 0.1]),
+]
+
+
+def city_names(n):
+    """第一个城市为各脚本默认的 dalian（气候参数同样是随机的），之后为 city001、city002……"""
+    return ['dalian' if i == 0 else f'city{i:03d}' for i in range(n)]
+
+
+def pick(rng, choices, p, n):
+    return np.asarray(choices, dtype=object)[rng.choice(len(choices), n, p=p)]
+
+
+def weather_types(rng, avg_temp, wet_p):
+    """每天一种天气类型：先按概率决定是否降水，再按气温选择降水类型"""
+    n = len(avg_temp)
+    result = pick(rng, DRY_WEATHER, DRY_WEATHER_P, n)
+    wet = rng.random(n) < wet_p
+    lower = -np.inf
+    for upper, choices, p in WET_WEATHER:
+        mask = wet & (avg_temp >= lower) & (avg_temp < upper)
+        result[mask] = pick(rng, choices, p, mask.sum())
+        lower = upper
+    return result
+
+
+def generate_city(city, index=0, start_year=START_YEAR, years=YEARS, seed=0, bad_rate=0.0):
+    """生成一个城市连续 years 年的逐日原始数据，列为 日期, 天气状况, 气温, 风力风向, 月份, 城市
+
+    bad_rate 为气温写成 '--' 的行所占比例，用来模拟页面上的缺测。
+    """
+    rng = np.random.default_rng([seed, index])
+    dates = pd.date_range(f'{start_year}-01-01', f'{start_year + years - 1}-12-31', freq='D')
+    n = len(dates)
+
+    # 气候参数：年平均气温、季节振幅、昼夜温差
+    mean = rng.uniform(4, 20)
+    amplitude = rng.uniform(6, 18)
+    diurnal = rng.uniform(5, 11)
+    season = np.sin(2 * np.pi * (dates.dayofyear.to_numpy() - 105) / 365.25)
+
+    # 自相关的逐日扰动
+    shocks = rng.normal(0, 2.0, n)
+    anomaly = np.empty(n)
+    anomaly[0] = shocks[0]
+    for t in range(1, n):
+        anomaly[t] = 0.7 * anomaly[t - 1] + shocks[t]
+    avg = mean + amplitude * season + anomaly
+    spread = np.clip(diurnal + rng.normal(0, 1.5, n), 1, None)
+    high = np.round(avg + spread / 2).astype(int)
+    low = np.round(avg - spread / 2).astype(int)
+    low = np.minimum(low, high - 1)
+
+    # 夏季降水多；夜晚有一半的日子与白天天气相同
+    wet_p = 0.25 + 0.15 * season
+    day = weather_types(rng, avg, wet_p)
+    night = np.where(rng.random(n) < 0.5, day, weather_types(rng, avg - spread / 2, wet_p))
+
+    day_dir = pick(rng, DIRECTIONS, None, n)
+    night_dir = np.where(rng.random(n) < 0.7, day_dir, pick(rng, DIRECTIONS, None, n))
+    day_level = pick(rng, WIND_LEVELS, WIND_LEVEL_P, n)
+    night_level = pick(rng, WIND_LEVELS, WIND_LEVEL_P, n)
+    wind = pd.Series(day_dir + day_level + '/' + night_dir + night_level)
+    calm = rng.random(n) < 0.02
+    wind[calm] = '微风/微风'
+
+    temp = pd.Series([f'{h}℃/{l}℃' for h, l in zip(high, low)])
+    if bad_rate:
+        temp[rng.random(n) < bad_rate] = '--'
+
+    return pd.DataFrame({
+        '日期': dates.strftime('%Y年%m月%d日'),
+        '天气状况': day + '/' + night,
+        '气温': temp,
+        '风力风向': wind,
+        '月份': dates.strftime('%Y%m'),
+        '城市': city,
+    })
+
+
+def write_store(cities, start_year=START_YEAR, years=YEARS, seed=0, root=STORE_DIR, bad_rate=0.0):
+    """按 data_pull.py 的分区格式写出，返回写出的行数"""
+    rows = 0
+    for i, city in enumerate(cities):
+        df = generate_city(city, i, start_year, years, seed, bad_rate)
+        for ym, month in df.groupby('月份', sort=True):
+            write_partition(month.reset_index(drop=True), city, ym, root)
+        rows += len(df)
+    return rows
+
+
+def write_csv_files(cities, start_year=START_YEAR, years=YEARS, seed=0, output_dir='.', bad_rate=0.0):
+    """按原来的单文件格式写出（没有城市列，城市取自文件名），返回文件路径列表"""
+    paths = []
+    for i, city in enumerate(cities):
+        df = generate_city(city, i, start_year, years, seed, bad_rate).drop(columns='城市')
+        path = os.path.join(output_dir, f'{city}_weather_{start_year}_{start_year + years - 1}.csv')
+        os.makedirs(output_dir, exist_ok=True)
+        df.to_csv(path, index=False, encoding='utf-8')
+        paths.append(path)
+    return paths
+
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="生成与抓取结果格式相同的合成天气数据")
+    parser.add_argument("--cities", type=int, default=1, help="城市个数")
+    parser.add_argument("--years", type=int, default=YEARS, help="每个城市的年数")
+    parser.add_argument("--start-year", type=int, default=START_YEAR, help="起始年份")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--bad-rate", type=float, default=0.0, help="气温缺测（'--'）的行所占比例")
+    parser.add_argument("--format", choices=['store', 'csv'], default='store',
+                        help="store 为按 城市/年/月 分区，csv 为每个城市一个文件")
+    parser.add_argument("--output-dir", default='.', help="输出目录")
+    args = parser.parse_args(argv)
+    cities = city_names(args.cities)
+    if args.format == 'store':
+        root = os.path.join(args.output_dir, STORE_DIR)
+        rows = write_store(cities, args.start_year, args.years, args.seed, root, args.bad_rate)
+        print(f"已生成 {len(cities)} 个城市、{args.years} 年共 {rows} 行数据，保存在 {root}")
+    else:
+        paths = write_csv_files(cities, args.start_year, args.years, args.seed, args.output_dir, args.bad_rate)
+        print(f"已生成 {len(paths)} 个文件: {', '.join(paths)}")
+
+
+if __name__ == "__main__":
+    cli()
\ No newline at end of file
@@ -0,0 +1,99 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import os
+
+# 各阶段之间交接的统计结果。默认保存为带类型的Parquet文件：日期为datetime，
+# 城市、风力等级、天气类型为分类，气温为float32；读取时可以只取部分列并按条件筛选行。
+# CSV（utf-8-sig）只作为可选的输出格式。
+TABLES = {
+    'daily': 'daily_avg_temp',
+    'monthly': 'monthly_avg_temp',
+    'wind': 'monthly_wind_level_days',
+    'weather': 'monthly_weather_days',
+    'forecast': 'monthly_forecast',
+    'baseline': 'baseline_forecast',
+}
+CATEGORY_COLUMNS = ['城市', '风力等级', '天气类型', '指标']
+DATE_COLUMNS = {'日期': None, '月份': '%Y-%m', '起点': None}
+
+
+def table_path(name, prefix='', output_dir='.', fmt='parquet'):
+    return os.path.join(output_dir, f'{prefix}{TABLES[name]}.{fmt}')
+
+
+def to_typed(df):
+    """把统计结果转换为保存用的列类型"""
+    df = df.copy()
+    for col in df.columns:
+        if col in DATE_COLUMNS:
+            df[col] = pd.to_datetime(df[col], format=DATE_COLUMNS[col]).astype('datetime64[ns]')
+        elif col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype(str).astype('category')
+        elif col == '天数':
+            df[col] = df[col].astype('int32')
+        elif df[col].dtype.kind == 'f':
+            df[col] = df[col].astype('float32')
+    return df
+
+
+def arrow_table(df):
+    """转换为Arrow表，分类列统一用int32索引，分批追加写入时各批的结构保持一致"""
+    table = pa.Table.from_pandas(to_typed(df), preserve_index=False)
+    fields = [
+        pa.field(field.name, pa.dictionary(pa.int32(), pa.string()))
+        if pa.types.is_dictionary(field.type) else field
+        for field in table.schema
+    ]
+    return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+
+
+def write_table(df, path):
+    """原子写入一张表，按扩展名选择Parquet或CSV"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    if path.endswith('.csv'):
+        df.to_csv(tmp_path, index=False, encoding='utf-8-sig')
+    else:
+        pq.write_table(arrow_table(df), tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_table(path, columns=None, filters=None):
+    """读取Parquet表
+
+    columns 只读取需要的列；filters 为 pyarrow 的筛选条件，例如
+    [('城市', '==', 'dalian'), ('月份', '>=', pd.Timestamp('2022-01-01'))]，不满足条件的行组不会被读取。
+    """
+    return pd.read_parquet(path, columns=columns, filters=filters)
+
+
+class TableAppender:
+    """分批追加写入一张表（Parquet或CSV），全部写完调用 close 后才替换目标文件"""
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        self.writer = None
+        self.batches = 0
+
+    def write(self, df):
+        if self.batches == 0:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if self.path.endswith('.csv'):
+            # 第一批写入带BOM的表头，之后追加的批次不能再写BOM
+            first = self.batches == 0
+            df.to_csv(self.tmp_path, mode='w' if first else 'a', header=first, index=False,
+                      encoding='utf-8-sig' if first else 'utf-8')
+        else:
+            table = arrow_table(df)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.tmp_path, table.schema)
+            self.writer.write_table(table)
+        self.batches += 1
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.batches:
+            os.replace(self.tmp_path, self.path)
\ No newline at end of file
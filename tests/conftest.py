@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 各脚本是仓库根目录下的独立模块，测试时从根目录导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
\ No newline at end of file
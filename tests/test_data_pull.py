@@ -0,0 +1,178 @@
+import asyncio
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pandas as pd
+import pytest
+import data_pull
+from data_pull import run_jobs, month_url, cache_path, load_cached_page, save_cached_page
+from store import partition_path, read_partition
+
+# 用本机的 http.server 代替天气网站，检查并发抓取、页面缓存和中断后继续抓取
+
+PAGE = """<html><body><div class="wrap">
+<table class="weather-table">
+<tr><td>日期</td><td>天气状况</td><td>气温</td><td>风力风向(夜间/白天)</td></tr>
+{rows}
+</table></div></body></html>"""
+ROW = "<tr><td>{year}年{month}月{day:02d}日</td><td>晴 /多云</td><td>5℃ / -3℃</td><td>北风 3-4级/北风 1-2级</td></tr>"
+NO_TABLE = "<html><body><div id='app'></div></body></html>"
+
+
+def month_page(ym, days=3):
+    return PAGE.format(rows="\n".join(ROW.format(year=ym[:4], month=ym[4:], day=day) for day in range(1, days + 1)))
+
+
+class FakeSite:
+    """按 /lishi/<城市>/month/<YYYYMM>.html 返回天气页面，记录请求和同时处理的请求数"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.errors = {}      # 路径 -> 返回的HTTP状态码
+        self.no_table = set()  # 这些路径返回没有天气表格的页面
+        self.requests = []
+        self.active = self.max_active = 0
+        self.lock = threading.Lock()
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with site.lock:
+                    site.requests.append(self.path)
+                    site.active += 1
+                    site.max_active = max(site.max_active, site.active)
+                try:
+                    time.sleep(site.delay)
+                    if self.path in site.errors:
+                        self.send_error(site.errors[self.path])
+                        return
+                    if self.path in site.no_table:
+                        body = NO_TABLE
+                    else:
+                        body = month_page(self.path.rsplit("/", 1)[-1][:6])
+                    payload = body.encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                finally:
+                    with site.lock:
+                        site.active -= 1
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/lishi/"
+
+    def path(self, city, ym):
+        return month_url("/lishi/", city, ym)
+
+
+@pytest.fixture
+def site():
+    site = FakeSite()
+    thread = threading.Thread(target=site.server.serve_forever, daemon=True)
+    thread.start()
+    yield site
+    site.server.shutdown()
+    site.server.server_close()
+
+
+def jobs_for(site, cities, months):
+    return [(city, ym, month_url(site.base_url, city, ym)) for city in cities for ym in months]
+
+
+def test_run_jobs_pools_requests(site, tmp_path):
+    site.delay = 0.2
+    jobs = jobs_for(site, ["dalian", "beijing"], ["202401", "202402", "202403"])
+    started = time.monotonic()
+    status = asyncio.run(run_jobs(jobs, rate=100, concurrency=3, retries=0,
+                                  cache_dir=tmp_path / "cache", store_dir=tmp_path / "store"))
+    elapsed = time.monotonic() - started
+
+    assert {key: st["状态"] for key, st in status.items()} == {(city, ym): "ok" for city, ym, _ in jobs}
+    assert len(site.requests) == len(jobs)
+    # 同时进行的请求数不超过 concurrency，且确实是并发而不是逐个等待
+    assert 1 < site.max_active <= 3
+    assert elapsed < len(jobs) * site.delay
+    for city, ym, _ in jobs:
+        df = read_partition(partition_path(city, ym, tmp_path / "store"))
+        assert len(df) == 3
+        assert df["天气状况"].tolist() == ["晴/多云"] * 3
+        assert (df["月份"] == ym).all() and (df["城市"] == city).all()
+        assert os.path.exists(cache_path(city, ym, tmp_path / "cache"))
+
+
+def test_run_jobs_reports_failures_and_missing_tables(site, tmp_path):
+    site.errors[site.path("dalian", "202402")] = 500
+    site.errors[site.path("dalian", "202403")] = 404
+    site.no_table.add(site.path("dalian", "202404"))
+    jobs = jobs_for(site, ["dalian"], ["202401", "202402", "202403", "202404"])
+    status = asyncio.run(run_jobs(jobs, rate=100, concurrency=2, retries=0,
+                                  cache_dir=tmp_path / "cache", store_dir=tmp_path / "store"))
+
+    states = {ym: st["状态"] for (_, ym), st in status.items()}
+    assert states == {"202401": "ok", "202402": "failed", "202403": "failed", "202404": "no_table"}
+    assert "500" in status[("dalian", "202402")]["错误"]
+    # 只有解析成功的页面写入缓存和分区
+    written = [ym for ym in states if os.path.exists(partition_path("dalian", ym, tmp_path / "store"))]
+    cached = [ym for ym in states if os.path.exists(cache_path("dalian", ym, tmp_path / "cache"))]
+    assert written == cached == ["202401"]
+
+
+def test_run_jobs_retries_server_errors(site, tmp_path, monkeypatch):
+    monkeypatch.setattr(data_pull, "BACKOFF", 0.01)
+    path = site.path("dalian", "202401")
+    site.errors[path] = 503
+
+    def recover():
+        # 第一次请求返回503之后恢复正常
+        while path not in site.requests:
+            time.sleep(0.01)
+        site.errors.pop(path)
+
+    thread = threading.Thread(target=recover)
+    thread.start()
+    status = asyncio.run(run_jobs(jobs_for(site, ["dalian"], ["202401"]), rate=100, retries=2,
+                                  cache_dir=tmp_path / "cache", store_dir=tmp_path / "store"))
+    thread.join()
+    assert status[("dalian", "202401")]["状态"] == "ok"
+    assert status[("dalian", "202401")]["尝试次数"] == 2
+
+
+def test_cached_page_only_counts_after_month_end(tmp_path):
+    save_cached_page("dalian", "202401", "<html></html>", tmp_path)
+    assert load_cached_page("dalian", "202401", tmp_path) == "<html></html>"
+    # 月中抓取的页面不完整，不作为缓存使用
+    path = cache_path("dalian", "202401", tmp_path)
+    mid_month = pd.Timestamp("2024-01-15").timestamp()
+    os.utime(path, (mid_month, mid_month))
+    assert load_cached_page("dalian", "202401", tmp_path) is None
+    assert load_cached_page("dalian", "209912", tmp_path) is None
+
+
+def test_main_resumes_from_cache(site, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # 状态报告写在当前目录
+    months = ["202401", "202402", "202403"]
+    failed = site.path("dalian", "202402")
+    site.errors[failed] = 500
+    options = dict(base_url=site.base_url, rate=100, retries=0, cache_dir="cache", store_dir="store")
+
+    data_pull.main(["dalian"], "202401", "202403", **options)
+    report = pd.read_csv(data_pull.STATUS_FILE, dtype={"月份": str})
+    assert report.set_index("月份")["状态"].to_dict() == {"202401": "ok", "202402": "failed", "202403": "ok"}
+    assert sorted(site.requests) == sorted(site.path("dalian", ym) for ym in months)
+
+    # 第二次运行只请求上次失败的月份；分区丢失的月份从缓存补写，不重新请求
+    site.errors.clear()
+    site.requests.clear()
+    os.remove(partition_path("dalian", "202401", "store"))
+    data_pull.main(["dalian"], "202401", "202403", **options)
+    report = pd.read_csv(data_pull.STATUS_FILE, dtype={"月份": str})
+    assert report.set_index("月份")["状态"].to_dict() == {"202401": "cached", "202402": "ok", "202403": "cached"}
+    assert site.requests == [failed]
+    for ym in months:
+        assert len(read_partition(partition_path("dalian", ym, "store"))) == 3
\ No newline at end of file
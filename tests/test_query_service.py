@@ -0,0 +1,176 @@
+import json
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+import pytest
+import analyse
+import synth
+from query_service import make_server, LRUCache
+
+# 在随机端口启动查询服务，检查各接口的200/400/404响应和图表缓存按字节数淘汰
+
+CITIES = ['dalian', 'city001']
+
+
+@pytest.fixture(scope='module')
+def output_dir(tmp_path_factory):
+    """两个城市两年的合成数据，统计表写入临时目录"""
+    root = tmp_path_factory.mktemp('query_service')
+    synth.write_store(CITIES, start_year=2022, years=2, root=root / 'weather_data')
+    result = analyse.analyse([str(root / 'weather_data')])
+    analyse.write_outputs(result, str(root))
+    return root
+
+
+def start(output_dir, **kwargs):
+    server = make_server(port=0, output_dir=str(output_dir), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def stop(server):
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope='module')
+def server(output_dir):
+    server = start(output_dir)
+    yield server
+    stop(server)
+
+
+def get(server, path, **params):
+    """返回 (状态码, 响应头, 内容)，JSON响应解析为对象"""
+    url = f'http://127.0.0.1:{server.server_address[1]}{path}'
+    if params:
+        url += '?' + urllib.parse.urlencode(params)
+    try:
+        with urllib.request.urlopen(url, timeout=60) as resp:
+            status, headers, body = resp.status, resp.headers, resp.read()
+    except urllib.error.HTTPError as e:
+        status, headers, body = e.code, e.headers, e.read()
+    if headers['Content-Type'].startswith('application/json'):
+        body = json.loads(body)
+    return status, headers, body
+
+
+def test_cities(server):
+    status, _, body = get(server, '/cities')
+    assert status == 200
+    assert sorted(body['城市']) == sorted(CITIES)
+
+
+def test_daily(server):
+    status, _, body = get(server, '/daily', city='dalian', start='2022-01-01', end='2022-01-31')
+    assert status == 200
+    assert body['条数'] == 31
+    assert body['数据'][0]['日期'] == '2022-01-01' and body['数据'][-1]['日期'] == '2022-01-31'
+    assert body['汇总']['平均气温']['条数'] <= 31
+
+    assert get(server, '/daily')[0] == 400
+    assert get(server, '/daily', city='dalian', metric='湿度')[0] == 400
+    assert get(server, '/daily', city='nowhere')[0] == 404
+
+
+def test_monthly(server):
+    status, _, body = get(server, '/monthly', city='city001', start='2023-01', end='2023-12', metric='平均最高气温')
+    assert status == 200
+    assert body['条数'] == 12
+    assert body['数据'][-1]['日期'] == '2023-12'
+    assert list(body['汇总']) == ['平均最高气温']
+
+    assert get(server, '/monthly', start='2023-01')[0] == 400
+    assert get(server, '/monthly', city='nowhere')[0] == 404
+
+
+def test_climatology(server):
+    status, _, body = get(server, '/climatology', city='dalian', month=3)
+    assert status == 200
+    assert {row['名称'] for row in body['数据']} == {'平均气温', '平均最高气温', '平均最低气温'}
+    assert all(row['年数'] == 2 for row in body['数据'])
+
+    status, _, body = get(server, '/climatology', city='dalian', month=7, kind='风力等级')
+    assert status == 200 and body['数据']
+
+    assert get(server, '/climatology', city='dalian')[0] == 400
+    assert get(server, '/climatology', city='dalian', month=13)[0] == 400
+    assert get(server, '/climatology', city='dalian', month=3, kind='湿度')[0] == 400
+    assert get(server, '/climatology', city='nowhere', month=3)[0] == 404
+
+
+def test_charts_and_chart(server):
+    status, _, body = get(server, '/charts', city='dalian')
+    assert status == 200 and body['图表']
+    name = body['图表'][0]
+
+    status, headers, png = get(server, '/chart', city='dalian', name=name)
+    assert status == 200
+    assert headers['Content-Type'] == 'image/png' and png.startswith(b'\x89PNG')
+    assert headers['X-Cache'] == 'MISS'
+    status, headers, again = get(server, '/chart', city='dalian', name=name)
+    assert headers['X-Cache'] == 'HIT' and again == png
+
+    assert get(server, '/charts')[0] == 400
+    assert get(server, '/charts', city='nowhere')[0] == 404
+    assert get(server, '/chart', city='dalian')[0] == 400
+    assert get(server, '/chart', city='dalian', name='no_such_chart')[0] == 404
+    assert get(server, '/chart', city='nowhere', name=name)[0] == 404
+
+
+def test_stats_and_unknown_path(server):
+    status, _, body = get(server, '/stats')
+    assert status == 200 and '图表缓存' in body
+    assert get(server, '/nothing')[0] == 404
+
+
+def test_optional_tables_missing(tmp_path):
+    """只有月度气温表时（如 2025_ 前缀的输出），依赖其他表的查询返回404而不是500"""
+    synth.write_store(['dalian'], start_year=2022, years=1, root=tmp_path / 'weather_data')
+    result = analyse.analyse([str(tmp_path / 'weather_data')])
+    analyse.write_outputs(result, str(tmp_path), prefix='2025_', tables=['monthly'])
+    server = start(tmp_path, prefix='2025_')
+    try:
+        assert get(server, '/monthly', city='dalian')[0] == 200
+        assert get(server, '/climatology', city='dalian', month=1)[0] == 200
+        assert get(server, '/daily', city='dalian')[0] == 404
+        assert get(server, '/climatology', city='dalian', month=1, kind='天气类型')[0] == 404
+        assert get(server, '/charts', city='dalian')[0] == 404
+    finally:
+        stop(server)
+
+
+def test_chart_cache_evicts_by_bytes(server, output_dir):
+    _, _, body = get(server, '/charts', city='dalian')
+    first, second = body['图表'][:2]
+    sizes = [len(get(server, '/chart', city='dalian', name=name)[2]) for name in (first, second)]
+
+    # 上限只够放下较大的一张图，放入第二张时淘汰第一张
+    small = start(output_dir, cache_mb=max(sizes) / 1024 / 1024)
+    try:
+        assert get(small, '/chart', city='dalian', name=first)[1]['X-Cache'] == 'MISS'
+        assert get(small, '/chart', city='dalian', name=first)[1]['X-Cache'] == 'HIT'
+        assert get(small, '/chart', city='dalian', name=second)[1]['X-Cache'] == 'MISS'
+        stats = get(small, '/stats')[2]['图表缓存']
+        assert stats['条数'] == 1 and stats['淘汰'] == 1
+        assert stats['字节数'] == sizes[1] <= stats['上限字节数']
+        assert get(small, '/chart', city='dalian', name=first)[1]['X-Cache'] == 'MISS'
+    finally:
+        stop(small)
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(10)
+    cache.put('a', b'xxxx')
+    cache.put('b', b'xxxx')
+    assert cache.get('a') == b'xxxx'  # a 变为最近使用
+    cache.put('c', b'xxxx')
+    assert cache.get('b') is None
+    assert set(cache.items) == {'a', 'c'} and cache.size == 8
+    cache.put('a', b'xxxxxx')  # 替换已有的项按新大小计算
+    assert cache.size == 10 and cache.evictions == 1
+    cache.put('big', b'x' * 11)  # 单项超过上限时不缓存
+    assert cache.get('big') is None and cache.size == 10
+    stats = cache.stats()
+    assert (stats['命中'], stats['未命中'], stats['淘汰']) == (1, 2, 1)
\ No newline at end of file
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+# 设置天气类型对应的专业配色
+weather_colors = {
+    # 晴天相关
+    '晴': '#FFD700',        # 金色
+    
+    # 多云/阴天相关
+    '多云': '#A9A9A9',      # 深灰色
+    '阴': '#778899',        # 浅灰色
+    
+    # 雨天相关（从浅到深）
+    '小雨': '#87CEEB',      # 浅蓝色
+    '小到中雨': '#5F9EA0',  # 卡其蓝
+    '中雨': '#1E90FF',      # 道奇蓝
+    '中到大雨': '#4169E1',  # 皇家蓝
+    '大雨': '#0000CD',      # 中蓝色
+    '大到暴雨': '#00008B',   # 深蓝色
+    '暴雨': '#191970',      # 午夜蓝
+    '大暴雨': '#000033',    # 极深蓝
+    
+    # 阵雨相关
+    '阵雨': '#6495ED',      # 矢车菊蓝
+    '雷阵雨': '#483D8B',    # 深板岩蓝
+    
+    # 雪天相关（从浅到深）
+    '小雪': '#F0F8FF',      # 爱丽丝蓝
+    '小到中雪': '#B0E0E6',  # 粉蓝
+    '中雪': '#ADD8E6',      # 浅蓝
+    '中到大雪': '#87CEEB',  # 天蓝
+    '大雪': '#4682B4',      # 钢蓝
+    
+    # 混合天气
+    '雨夹雪': '#B0C4DE'     # 亮钢蓝
+}
+
+# 天气类型编码的固定词表：draw.py 配色表中的类型依次编号，不在其中的类型按出现顺序追加在后面
+WEATHER_TYPES = list(weather_colors)
+
+
+def encode_weather(weather, vocab=None):
+    """把天气状况字典编码为整数矩阵
+
+    '晴/多云' 按 '/' 拆开后每段对应一列，返回 (codes, vocab)：codes 为 (行数, 段数) 的int16矩阵，
+    值为该段在 vocab 中的位置，缺失的段为 -1。vocab 默认从 WEATHER_TYPES 开始，
+    遇到词表外的类型时追加到末尾（传入的 vocab 会被原地扩展）。
+    """
+    vocab = list(WEATHER_TYPES) if vocab is None else vocab
+    parts = weather.dropna().astype(str).str.split('/', expand=True)
+    codes = np.full((len(weather), max(parts.shape[1], 1)), -1, dtype=np.int16)
+    if parts.empty:
+        return codes, vocab
+
+    # 只对不重复的类型查词表，再按位置映射回每个单元格
+    values = parts.to_numpy(dtype=object).ravel()
+    present = pd.notna(values)
+    local_codes, uniques = pd.factorize(values[present])
+    index = {name: i for i, name in enumerate(vocab)}
+    for name in uniques:
+        if name not in index:
+            index[name] = len(vocab)
+            vocab.append(name)
+    mapping = np.array([index[name] for name in uniques], dtype=np.int16)
+
+    flat = np.full(values.shape, -1, dtype=np.int16)
+    flat[present] = mapping[local_codes]
+    rows = weather.index.get_indexer(parts.index)
+    codes[rows, :parts.shape[1]] = flat.reshape(parts.shape)
+    return codes, vocab
+
+
+def count_weather_days(group_idx, codes, n_groups, n_types):
+    """按组统计每种天气类型出现的天数，返回 (n_groups, n_types) 的计数矩阵
+
+    同一天白天和夜晚（或更多段）相同的类型只算一次：某段的编码与同一行前面任意一段相同时不计数。
+    """
+    counts = np.zeros(n_groups * n_types, dtype=np.int64)
+    for j in range(codes.shape[1]):
+        column = codes[:, j]
+        valid = column >= 0
+        for i in range(j):
+            valid &= column != codes[:, i]
+        counts += np.bincount(group_idx[valid] * n_types + column[valid], minlength=n_groups * n_types)
+    return counts.reshape(n_groups, n_types)
\ No newline at end of file